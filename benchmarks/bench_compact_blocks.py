@@ -0,0 +1,62 @@
+"""Бенчмарк компактной ретрансляции блоков: байты в сети и время восстановления.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_compact_blocks --block-txs 10000 --pool 100000 --overlap 1.0 0.99 0.9 0.5
+"""
+import argparse
+import time
+
+from dag.dag_block import DAGBlock
+from network import compact
+from network.framing import KIND_BLOCK_TXS, KIND_BLOCKS, KIND_COMPACT_BLOCKS, \
+    KIND_GET_BLOCK_TXS, encode_frame
+from transactions.transaction import Transaction
+
+
+def run(block_txs: int, pool_size: int, overlaps):
+    txs = [Transaction(f"sender{i}", f"receiver{i}", 1.0) for i in range(block_txs)]
+    for tx in txs:
+        tx.add_signature("sphincs", b"\x01" * 64)
+    block = DAGBlock(0, txs, "miner", [])
+    block.add_signature("sphincs", b"\x02" * 64)
+    others = [Transaction(f"other{i}", "bob", 1.0) for i in range(max(0, pool_size - block_txs))]
+
+    full_bytes = len(encode_frame(KIND_BLOCKS, [block.to_bytes()]))
+    print(f"block: {block_txs} txs, full block frame: {full_bytes} bytes")
+    print(f"{'overlap':>8} {'wire_bytes':>11} {'ratio':>7} {'missing':>8} {'rebuild_ms':>11}")
+    for overlap in overlaps:
+        known = int(block_txs * overlap)
+        pool = others + txs[:known]
+
+        announce = compact.CompactBlock.from_block(block)
+        wire = len(encode_frame(KIND_COMPACT_BLOCKS, [announce.to_bytes()]))
+
+        start = time.perf_counter()
+        received = compact.CompactBlock.from_bytes(announce.to_bytes())
+        rebuilt, pending = compact.reconstruct(received, pool)
+        missing = pending.missing
+        if rebuilt is None:
+            request = compact.encode_tx_request(block.hash, missing)
+            wire += len(encode_frame(KIND_GET_BLOCK_TXS, [request]))
+            response = compact.encode_tx_response(block.hash, [txs[i] for i in missing])
+            wire += len(encode_frame(KIND_BLOCK_TXS, [response]))
+            _, sent = compact.decode_tx_response(response)
+            rebuilt = pending.fill(sent)
+        rebuild_ms = (time.perf_counter() - start) * 1e3
+        assert rebuilt is not None and rebuilt.hash == block.hash
+
+        print(f"{overlap:>8.2f} {wire:>11} {full_bytes / wire:>7.1f} {len(missing):>8} "
+              f"{rebuild_ms:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--block-txs", type=int, default=10_000)
+    parser.add_argument("--pool", type=int, default=100_000)
+    parser.add_argument("--overlap", type=float, nargs="+", default=[1.0, 0.99, 0.9, 0.5])
+    args = parser.parse_args()
+    run(args.block_txs, args.pool, args.overlap)
+
+
+if __name__ == "__main__":
+    main()
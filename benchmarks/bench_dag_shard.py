@@ -0,0 +1,43 @@
+"""Бенчмарк вставки блоков в DAGShard.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_dag_shard --blocks 1000000
+"""
+import argparse
+import statistics
+import time
+
+from dag.dag_block import DAGBlock
+from dag.dag_shard import DAGShard
+
+
+def run(block_count: int, window: int):
+    shard = DAGShard(shard_id=0)
+    latencies = []
+    print(f"{'blocks':>10} {'mean_us':>10} {'p99_us':>10}")
+
+    for i in range(1, block_count + 1):
+        block = DAGBlock(shard_id=0, transactions=[], miner=f"miner{i % 16}",
+                         previous_hashes=shard.select_parents())
+        start = time.perf_counter()
+        shard.add_block(block)
+        latencies.append(time.perf_counter() - start)
+
+        if i % window == 0:
+            latencies.sort()
+            mean_us = statistics.fmean(latencies) * 1e6
+            p99_us = latencies[int(len(latencies) * 0.99)] * 1e6
+            print(f"{i:>10} {mean_us:>10.2f} {p99_us:>10.2f}")
+            latencies.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=1_000_000)
+    parser.add_argument("--window", type=int, default=100_000)
+    args = parser.parse_args()
+    run(args.blocks, args.window)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Бенчмарк gossip-рассылки блоков между локальными пирами через loopback.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_gossip --peers 16 --blocks 2000 --degree 3
+"""
+import argparse
+import random
+import threading
+import time
+
+from dag.dag_block import DAGBlock
+from network.p2p import P2PNetwork
+
+
+def _percentile(values, q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def run(peer_count: int, block_count: int, degree: int):
+    nodes = [P2PNetwork(0) for _ in range(peer_count)]
+    arrivals = {}  # hash -> времена получения на пирах
+    lock = threading.Lock()
+
+    def on_blocks(blocks):
+        now = time.perf_counter()
+        with lock:
+            for block in blocks:
+                arrivals.setdefault(block.hash, []).append(now)
+
+    for node in nodes:
+        node.on_blocks = on_blocks
+        node.start()
+    # Связный граф: кольцо плюс случайные рёбра до заданной степени
+    rng = random.Random(0)
+    for i, node in enumerate(nodes):
+        targets = {(i + 1) % peer_count}
+        while len(targets) < min(degree, peer_count - 1):
+            target = rng.randrange(peer_count)
+            if target != i:
+                targets.add(target)
+        for target in targets:
+            node.connect("127.0.0.1", nodes[target].port)
+    time.sleep(0.2)
+
+    sent = {}
+    start = time.perf_counter()
+    for i in range(block_count):
+        block = DAGBlock(0, [], f"miner{i}", [])
+        sent[block.hash] = time.perf_counter()
+        nodes[i % peer_count].broadcast_block(block)
+
+    expected = peer_count - 1
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        with lock:
+            if len(arrivals) == block_count and all(len(t) >= expected for t in arrivals.values()):
+                break
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    with lock:
+        full = sorted(max(times) - sent[h] for h, times in arrivals.items()
+                      if len(times) >= expected)
+    duplicates = sum(node.get_stats()["duplicates"] for node in nodes)
+    frames = sum(node.get_stats()["frames_sent"] for node in nodes)
+    items = sum(node.get_stats()["items_sent"] for node in nodes)
+    for node in nodes:
+        node.stop()
+
+    print(f"peers={peer_count} blocks={block_count} degree={degree} elapsed={elapsed:.2f}s")
+    print(f"fully propagated: {len(full)}/{block_count}, duplicates suppressed: {duplicates}, "
+          f"items/frame: {items / max(1, frames):.1f}")
+    if full:
+        print(f"fan-out latency ms: p50={_percentile(full, 0.5) * 1e3:.2f} "
+              f"p95={_percentile(full, 0.95) * 1e3:.2f} p99={_percentile(full, 0.99) * 1e3:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--peers", type=int, default=16)
+    parser.add_argument("--blocks", type=int, default=2_000)
+    parser.add_argument("--degree", type=int, default=3)
+    args = parser.parse_args()
+    run(args.peers, args.blocks, args.degree)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Бенчмарк построения дерева Меркла и доказательств включения.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_merkle --leaves 10000 100000 1000000 --workers 1 4
+"""
+import argparse
+import hashlib
+import time
+
+from dag.merkle import MerkleTree
+
+
+def run(leaf_counts, workers_list, proofs: int):
+    print(f"{'leaves':>10} {'workers':>8} {'build_ms':>10} {'proof_us':>10} {'verify_us':>10}")
+    for count in leaf_counts:
+        leaves = [hashlib.sha3_256(i.to_bytes(8, "big")).hexdigest() for i in range(count)]
+        sample = leaves[::max(1, count // proofs)][:proofs]
+        for workers in workers_list:
+            start = time.perf_counter()
+            tree = MerkleTree(leaves, workers=workers)
+            build_ms = (time.perf_counter() - start) * 1e3
+
+            tree.get_proof(sample[0])  # Индекс листьев строится при первом запросе
+            start = time.perf_counter()
+            built = [tree.get_proof(leaf) for leaf in sample]
+            proof_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+            start = time.perf_counter()
+            for leaf, proof in zip(sample, built):
+                assert MerkleTree.verify_proof(leaf, proof, tree.root)
+            verify_us = (time.perf_counter() - start) / len(sample) * 1e6
+            print(f"{count:>10} {workers:>8} {build_ms:>10.1f} {proof_us:>10.2f} {verify_us:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--leaves", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--proofs", type=int, default=1_000)
+    args = parser.parse_args()
+    run(args.leaves, args.workers, args.proofs)
+
+
+if __name__ == "__main__":
+    main()
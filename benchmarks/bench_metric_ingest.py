@@ -0,0 +1,42 @@
+"""Бенчмарк записи метрик репутации: синхронное применение против очереди приёма.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_metric_ingest --validators 100 1000 --metrics 100000
+"""
+import argparse
+import time
+
+from consensys.reputation import ReputationSystem
+
+
+def run(validator_counts, metrics: int, queue_size: int):
+    print(f"{'validators':>10} {'mode':>6} {'record_us':>10} {'drain_ms':>10} "
+          f"{'merged':>8} {'dropped':>8}")
+    for count in validator_counts:
+        for mode in ("sync", "queue"):
+            reputation = ReputationSystem(ingest_queue_size=queue_size if mode == "queue" else 0)
+            start = time.perf_counter()
+            for i in range(metrics):
+                # Как на пути производства блока: метрика качества блока
+                reputation.record_block_quality(f"val{i % count}", f"block{i}", True, 0.05)
+            record_us = (time.perf_counter() - start) / metrics * 1e6
+
+            start = time.perf_counter()
+            reputation.flush_metrics()
+            drain_ms = (time.perf_counter() - start) * 1e3
+            stats = reputation.ingest.get_stats() if reputation.ingest else {}
+            print(f"{count:>10} {mode:>6} {record_us:>10.2f} {drain_ms:>10.1f} "
+                  f"{stats.get('merged', 0):>8} {stats.get('dropped', 0):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--validators", type=int, nargs="+", default=[100, 1_000])
+    parser.add_argument("--metrics", type=int, default=100_000)
+    parser.add_argument("--queue-size", type=int, default=65_536)
+    args = parser.parse_args()
+    run(args.validators, args.metrics, args.queue_size)
+
+
+if __name__ == "__main__":
+    main()
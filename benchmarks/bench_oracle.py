@@ -0,0 +1,58 @@
+"""Бенчмарк клиента оракулов на локальном сервере фикстур: холодный и тёплый кэш.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_oracle --validators 100 1000 --latency 0.05 --concurrency 8 32
+"""
+import argparse
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from consensys.oracles import FixtureOracleServer, OracleClient, QualityOracle
+
+
+def run(validator_counts, latency: float, concurrency_list, callers: int):
+    print(f"{'validators':>10} {'concurrency':>11} {'cold_ms':>10} {'warm_us':>10} "
+          f"{'requests':>9} {'coalesced':>10}")
+    for count in validator_counts:
+        users = [f"user{i}" for i in range(count)]
+        addresses = [f"val{i}" for i in range(count)]
+        commits = {user: [{"stats": {"additions": 10, "deletions": 2}}] for user in users}
+        forum = {hashlib.sha256(address.encode()).hexdigest()[:16]:
+                 {"posts_count": 10, "helpful_answers": 5, "reputation_score": 80.0}
+                 for address in addresses}
+        for concurrency in concurrency_list:
+            server = FixtureOracleServer(commits, forum, latency=latency).start()
+            oracle = QualityOracle(OracleClient(server.backend(), timeout=30.0,
+                                                max_concurrency=concurrency))
+            # Каждого валидатора одновременно запрашивают несколько вызывающих
+            jobs = [(address, user) for address, user in zip(addresses, users)] * callers
+            with ThreadPoolExecutor(64) as pool:
+                start = time.perf_counter()
+                list(pool.map(lambda job: oracle.fetch_validator_metrics(*job, wait=30.0), jobs))
+                cold_ms = (time.perf_counter() - start) * 1e3
+
+            start = time.perf_counter()
+            for address, user in zip(addresses, users):
+                oracle.fetch_validator_metrics(address, user)
+            warm_us = (time.perf_counter() - start) / count * 1e6
+
+            stats = oracle.client.get_stats()
+            print(f"{count:>10} {concurrency:>11} {cold_ms:>10.1f} {warm_us:>10.1f} "
+                  f"{server.requests:>9} {stats['coalesced']:>10}")
+            oracle.client.close()
+            server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--validators", type=int, nargs="+", default=[100, 1_000])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--callers", type=int, default=2)
+    args = parser.parse_args()
+    run(args.validators, args.latency, args.concurrency, args.callers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Бенчмарк пропускной способности WriteAheadLog (групповой коммит).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_wal --records 500000 --threads 4
+"""
+import argparse
+import tempfile
+import threading
+import time
+
+from storage.wal import WriteAheadLog
+from transactions.transaction import Transaction
+
+
+def run(record_count: int, thread_count: int, flush_interval: float):
+    payload = Transaction("alice", "bob", 1.0).to_bytes()
+    per_thread = record_count // thread_count
+
+    with tempfile.TemporaryDirectory() as directory:
+        wal = WriteAheadLog(directory, flush_interval=flush_interval)
+
+        def writer():
+            for _ in range(per_thread):
+                wal.append(1, payload)
+
+        threads = [threading.Thread(target=writer) for _ in range(thread_count)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        appended = time.perf_counter() - start
+        wal.wait_durable(wal.last_lsn)
+        durable = time.perf_counter() - start
+        wal.close()
+
+    total = per_thread * thread_count
+    print(f"records: {total}, payload: {len(payload)} B, threads: {thread_count}")
+    print(f"append:  {total / appended:,.0f} records/s")
+    print(f"durable: {total / durable:,.0f} records/s (fsync included)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=500_000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--flush-interval", type=float, default=0.005)
+    args = parser.parse_args()
+    run(args.records, args.threads, args.flush_interval)
+
+
+if __name__ == "__main__":
+    main()
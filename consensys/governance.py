@@ -105,7 +105,7 @@ class Governance:
         if proposal.proposal_type == ProposalType.REPUTATION_WEIGHTS:
             # Изменение весов метрик в репутационной системе
             new_weights = proposal.parameters.get("metric_weights", {})
-            self.validator_manager.reputation_system.metric_weights.update(new_weights)
+            self.validator_manager.reputation_system.set_metric_weights(new_weights)
             print(f"Updated reputation weights: {new_weights}")
         
         elif proposal.proposal_type == ProposalType.VALIDATOR_SLASHING:
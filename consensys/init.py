@@ -1,11 +1,15 @@
 from .validator import ValidatorManager, Validator
 from .reputation import ReputationSystem, QualityMetric, MetricType
-from .oracles import QualityOracle, GitHubOracle, CommunityOracle
+from .oracles import (QualityOracle, GitHubOracle, CommunityOracle, OracleBackend,
+                      HTTPOracleBackend, OracleClient, FixtureOracleServer)
 from .governance import Governance, GovernanceProposal, ProposalType
+from .schedule import AliasTable, LeaderSchedule, epoch_seed
 
 __all__ = [
     'ValidatorManager', 'Validator',
     'ReputationSystem', 'QualityMetric', 'MetricType', 
-    'QualityOracle', 'GitHubOracle', 'CommunityOracle',
-    'Governance', 'GovernanceProposal', 'ProposalType'
+    'QualityOracle', 'GitHubOracle', 'CommunityOracle', 'OracleBackend',
+    'HTTPOracleBackend', 'OracleClient', 'FixtureOracleServer',
+    'Governance', 'GovernanceProposal', 'ProposalType',
+    'AliasTable', 'LeaderSchedule', 'epoch_seed'
 ]
@@ -0,0 +1,99 @@
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, List, Tuple
+
+
+class MetricIngestQueue:
+    """Ограниченная очередь приёма метрик репутации с фоновой агрегацией.
+
+    put() только кладёт (адрес, метрика) в кольцевой буфер и никогда не
+    ждёт: при переполнении наблюдение отбрасывается и учитывается в
+    счётчике dropped. Фоновый поток раз в flush_interval (или при
+    накоплении batch_size записей) забирает пачку и передаёт её в apply
+    одним вызовом; слияние повторных наблюдений делает apply.
+    """
+
+    def __init__(self, apply: Callable[[List[Tuple[str, object]]], int],
+                 capacity: int = 65_536, batch_size: int = 4_096,
+                 flush_interval: float = 0.05):
+        self.apply = apply  # Применяет пачку, возвращает число слитых наблюдений
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.lock = threading.Lock()
+        self._ready = threading.Condition(self.lock)
+        self._apply_lock = threading.Lock()
+        self._buffer: Deque[Tuple[str, object]] = deque()
+        self.stats = {
+            "enqueued": 0,
+            "dropped": 0,
+            "applied": 0,
+            "merged": 0,
+            "batches": 0,
+            "apply_errors": 0,
+        }
+
+        self.running = True
+        self._worker = threading.Thread(target=self._drain_loop, daemon=True)
+        self._worker.start()
+
+    def put(self, address: str, metric) -> bool:
+        """Ставит наблюдение в очередь; False, если буфер полон и оно отброшено"""
+        with self.lock:
+            if len(self._buffer) >= self.capacity:
+                self.stats["dropped"] += 1
+                return False
+            self._buffer.append((address, metric))
+            self.stats["enqueued"] += 1
+            if len(self._buffer) >= self.batch_size:
+                self._ready.notify()
+        return True
+
+    def flush(self):
+        """Синхронно применяет всё накопленное"""
+        with self._apply_lock:
+            while self._apply_batch():
+                pass
+
+    def close(self):
+        self.running = False
+        with self.lock:
+            self._ready.notify_all()
+        self._worker.join()
+        self.flush()
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return dict(self.stats, depth=len(self._buffer), capacity=self.capacity)
+
+    def _drain_loop(self):
+        while self.running:
+            with self.lock:
+                if len(self._buffer) < self.batch_size:
+                    self._ready.wait(self.flush_interval)
+            with self._apply_lock:
+                while self._apply_batch():
+                    pass
+
+    def _apply_batch(self) -> bool:
+        """Забирает и применяет одну пачку (вызывается под _apply_lock); False, если пусто"""
+        with self.lock:
+            if not self._buffer:
+                return False
+            buffer = self._buffer
+            batch = [buffer.popleft() for _ in range(min(len(buffer), self.batch_size))]
+
+        try:
+            merged = self.apply(batch)
+        except Exception as e:
+            print(f"Metric ingest error: {e}")
+            with self.lock:
+                self.stats["apply_errors"] += 1
+            return True
+
+        with self.lock:
+            self.stats["applied"] += len(batch)
+            self.stats["merged"] += merged
+            self.stats["batches"] += 1
+        return True
@@ -0,0 +1,160 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Hashable, Iterator, List, Tuple
+
+
+class MetricSeries:
+    """История одного типа метрики одного валидатора в колонках.
+
+    Свежие наблюдения хранятся сырыми в типизированных массивах
+    (timestamp, value, код источника), отсортированных по времени.
+    Наблюдения старше raw_ttl сворачиваются в бакеты по rollup_seconds
+    (сумма и число), бакеты старше rollup_ttl удаляются.
+    """
+    __slots__ = ("timestamps", "values", "sources", "bucket_starts", "bucket_sums",
+                 "bucket_counts", "appends_since_compaction")
+
+    def __init__(self):
+        self.timestamps = array("d")
+        self.values = array("d")
+        self.sources = array("H")
+        self.bucket_starts = array("d")
+        self.bucket_sums = array("d")
+        self.bucket_counts = array("Q")
+        self.appends_since_compaction = 0
+
+    def append(self, timestamp: float, value: float, source: int):
+        timestamps = self.timestamps
+        if not timestamps or timestamp >= timestamps[-1]:
+            timestamps.append(timestamp)
+            self.values.append(value)
+            self.sources.append(source)
+        else:
+            # Запись не по порядку (доигрывание журнала)
+            position = bisect_right(timestamps, timestamp)
+            timestamps.insert(position, timestamp)
+            self.values.insert(position, value)
+            self.sources.insert(position, source)
+        self.appends_since_compaction += 1
+
+    def window(self, since: float) -> Tuple[array, array]:
+        """Сырые timestamp и value начиная с since (срезы массивов)"""
+        start = bisect_left(self.timestamps, since)
+        return self.timestamps[start:], self.values[start:]
+
+    def compact(self, raw_cutoff: float, rollup_cutoff: float, rollup_seconds: float,
+                max_raw: int):
+        """Сворачивает сырые данные старше raw_cutoff (и сверх max_raw) в бакеты"""
+        self.appends_since_compaction = 0
+        cut = max(bisect_left(self.timestamps, raw_cutoff), len(self.timestamps) - max_raw)
+        if cut > 0:
+            starts, sums, counts = self.bucket_starts, self.bucket_sums, self.bucket_counts
+            for i in range(cut):
+                bucket = self.timestamps[i] - self.timestamps[i] % rollup_seconds
+                if starts and starts[-1] == bucket:
+                    sums[-1] += self.values[i]
+                    counts[-1] += 1
+                elif not starts or bucket > starts[-1]:
+                    starts.append(bucket)
+                    sums.append(self.values[i])
+                    counts.append(1)
+                else:
+                    # Бакет старше последнего (поздняя запись): вставка по месту
+                    position = bisect_left(starts, bucket)
+                    if position < len(starts) and starts[position] == bucket:
+                        sums[position] += self.values[i]
+                        counts[position] += 1
+                    else:
+                        starts.insert(position, bucket)
+                        sums.insert(position, self.values[i])
+                        counts.insert(position, 1)
+            del self.timestamps[:cut]
+            del self.values[:cut]
+            del self.sources[:cut]
+
+        expired = bisect_left(self.bucket_starts, rollup_cutoff)
+        if expired:
+            del self.bucket_starts[:expired]
+            del self.bucket_sums[:expired]
+            del self.bucket_counts[:expired]
+
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (
+            self.timestamps, self.values, self.sources,
+            self.bucket_starts, self.bucket_sums, self.bucket_counts))
+
+
+class MetricHistoryStore:
+    """Ограниченная колоночная история метрик: валидатор -> тип метрики -> MetricSeries.
+
+    Сжатие запускается не чаще раза в compaction_interval записей в ряд,
+    поэтому удаление префиксов массивов амортизировано. Объём памяти
+    ограничен скоростью поступления за raw_ttl (не более max_raw строк на
+    ряд) плюс rollup_ttl / rollup_seconds бакетов.
+    """
+
+    def __init__(self, raw_ttl: float = 24 * 3600, rollup_seconds: float = 3600,
+                 rollup_ttl: float = 30 * 24 * 3600, max_raw: int = 100_000,
+                 compaction_interval: int = 256):
+        self.raw_ttl = raw_ttl
+        self.rollup_seconds = rollup_seconds
+        self.rollup_ttl = rollup_ttl
+        self.max_raw = max_raw
+        self.compaction_interval = compaction_interval
+        self._series: Dict[str, Dict[Hashable, MetricSeries]] = {}
+        self._source_codes: Dict[str, int] = {}
+        self._source_names: List[str] = []
+
+    def append(self, address: str, metric_type: Hashable, value: float, timestamp: float,
+               source: str, now: float):
+        series = self._series.setdefault(address, {}).get(metric_type)
+        if series is None:
+            series = self._series[address][metric_type] = MetricSeries()
+        series.append(timestamp, value, self._source_code(source))
+        if (series.appends_since_compaction >= self.compaction_interval
+                or len(series.timestamps) > self.max_raw):
+            self._compact(series, now)
+
+    def window(self, address: str, metric_type: Hashable, since: float) -> Tuple[array, array]:
+        """Сырые (timestamps, values) ряда начиная с since"""
+        series = self._series.get(address, {}).get(metric_type)
+        if series is None:
+            return array("d"), array("d")
+        return series.window(since)
+
+    def rollups(self, address: str, metric_type: Hashable) -> Tuple[array, array, array]:
+        """Свёрнутые бакеты ряда: (начало бакета, сумма, число)"""
+        series = self._series.get(address, {}).get(metric_type)
+        if series is None:
+            return array("d"), array("d"), array("Q")
+        return series.bucket_starts, series.bucket_sums, series.bucket_counts
+
+    def iter_raw(self, address: str) -> Iterator[Tuple[Hashable, float, float, str]]:
+        """Сырые строки валидатора: (тип, value, timestamp, источник)"""
+        names = self._source_names
+        for metric_type, series in self._series.get(address, {}).items():
+            for timestamp, value, source in zip(series.timestamps, series.values, series.sources):
+                yield metric_type, value, timestamp, names[source]
+
+    def addresses(self) -> List[str]:
+        return list(self._series)
+
+    def compact_all(self, now: float):
+        for by_type in self._series.values():
+            for series in by_type.values():
+                self._compact(series, now)
+
+    def nbytes(self) -> int:
+        return sum(series.nbytes() for by_type in self._series.values()
+                   for series in by_type.values())
+
+    def _compact(self, series: MetricSeries, now: float):
+        series.compact(now - self.raw_ttl, now - self.rollup_ttl, self.rollup_seconds,
+                       self.max_raw)
+
+    def _source_code(self, source: str) -> int:
+        code = self._source_codes.get(source)
+        if code is None:
+            code = self._source_codes[source] = len(self._source_names)
+            self._source_names.append(source)
+        return code
@@ -0,0 +1,399 @@
+import abc
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class OracleBackend(abc.ABC):
+    """Источник внешних метрик валидаторов.
+
+    Вызовы блокирующие и должны завершаться (или падать) не позже timeout
+    секунд; кэширование, слияние запросов и ограничение параллелизма
+    делает OracleClient.
+    """
+
+    @abc.abstractmethod
+    def get_contributions(self, github_username: str, repo_owner: str, repo_name: str,
+                          timeout: float) -> Dict:
+        """Сводка коммитов: commit_count, lines_added, lines_removed, last_commit"""
+
+    @abc.abstractmethod
+    def get_forum_activity(self, user_identifier: str, timeout: float) -> Dict:
+        """Активность на форуме: posts_count, helpful_answers, reputation_score"""
+
+
+def _get_json(url: str, timeout: float, headers: Optional[Dict[str, str]] = None):
+    request = urllib.request.Request(url, headers=headers or {})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+class GitHubOracle:
+    def __init__(self, api_token: Optional[str] = None, base_url: str = "https://api.github.com"):
+        self.api_token = api_token
+        self.base_url = base_url
+
+    def get_contributions(self, github_username: str, repo_owner: str, repo_name: str,
+                          timeout: float) -> Dict:
+        """Получает данные о contributions из GitHub"""
+        headers = {}
+        if self.api_token:
+            headers["Authorization"] = f"token {self.api_token}"
+
+        query = urllib.parse.urlencode({"author": github_username})
+        commits = _get_json(f"{self.base_url}/repos/{repo_owner}/{repo_name}/commits?{query}",
+                            timeout, headers)
+        return {
+            "commit_count": len(commits),
+            "lines_added": sum(c.get('stats', {}).get('additions', 0) for c in commits),
+            "lines_removed": sum(c.get('stats', {}).get('deletions', 0) for c in commits),
+            "last_commit": commits[0].get('commit', {}).get('author', {}).get('date') if commits else None
+        }
+
+
+class CommunityOracle:
+    def __init__(self, forum_api_url: str):
+        self.forum_api_url = forum_api_url
+
+    def get_forum_activity(self, user_identifier: str, timeout: float) -> Dict:
+        """Получает активность на форумах"""
+        data = _get_json(f"{self.forum_api_url}/users/{urllib.parse.quote(user_identifier)}",
+                         timeout)
+        return {
+            "posts_count": data.get("posts_count", 0),
+            "helpful_answers": data.get("helpful_answers", 0),
+            "reputation_score": data.get("reputation_score", 0.0)
+        }
+
+
+class HTTPOracleBackend(OracleBackend):
+    """Бэкенд поверх HTTP API GitHub и форума"""
+
+    def __init__(self, api_token: Optional[str] = None,
+                 github_api_url: str = "https://api.github.com",
+                 forum_api_url: str = "https://forum.quantumchain.com/api"):
+        self.github_oracle = GitHubOracle(api_token, github_api_url)
+        self.community_oracle = CommunityOracle(forum_api_url)
+
+    def get_contributions(self, github_username: str, repo_owner: str, repo_name: str,
+                          timeout: float) -> Dict:
+        return self.github_oracle.get_contributions(github_username, repo_owner, repo_name,
+                                                    timeout)
+
+    def get_forum_activity(self, user_identifier: str, timeout: float) -> Dict:
+        return self.community_oracle.get_forum_activity(user_identifier, timeout)
+
+
+class FixtureOracleServer:
+    """Локальный HTTP-сервер с фикстурами в форме API GitHub и форума.
+
+    Нужен для офлайн-тестов и бенчмарков: backend() возвращает обычный
+    HTTPOracleBackend, направленный на этот сервер. latency добавляет
+    задержку к каждому ответу, requests считает обработанные запросы.
+    """
+
+    def __init__(self, commits: Optional[Dict[str, List[Dict]]] = None,
+                 forum: Optional[Dict[str, Dict]] = None, latency: float = 0.0):
+        self.commits = commits or {}  # github_username -> список коммитов
+        self.forum = forum or {}  # идентификатор на форуме -> активность
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FixtureOracleServer":
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fixture._count()
+                if fixture.latency:
+                    time.sleep(fixture.latency)
+                parsed = urllib.parse.urlparse(self.path)
+                parts = parsed.path.strip("/").split("/")
+                if len(parts) == 4 and parts[0] == "repos" and parts[3] == "commits":
+                    author = urllib.parse.parse_qs(parsed.query).get("author", [""])[0]
+                    body = fixture.commits.get(author, [])
+                elif len(parts) == 2 and parts[0] == "users" and parts[1] in fixture.forum:
+                    body = fixture.forum[parts[1]]
+                else:
+                    self.send_error(404)
+                    return
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def backend(self) -> HTTPOracleBackend:
+        return HTTPOracleBackend(github_api_url=self.url, forum_api_url=self.url)
+
+    def _count(self):
+        with self._lock:
+            self.requests += 1
+
+
+class OracleClient:
+    """Асинхронный клиент оракулов: кэш с TTL, слияние запросов, ограничение параллелизма.
+
+    Ответы кэшируются в памяти и (если задан cache_path) на диске, поэтому
+    после перезапуска узла данные доступны без сети. Свежая запись (моложе
+    ttl) отдаётся сразу; устаревшая, но моложе max_stale, тоже отдаётся
+    сразу, а в фоне запускается её обновление. Одновременные запросы
+    одного ключа сливаются в один вызов бэкенда. Вызовы бэкенда идут в
+    пуле из max_concurrency потоков и ограничены timeout; при ошибке или
+    таймауте возвращается None (или устаревшая запись, если она есть).
+    Ошибка запоминается на failure_ttl секунд: в это время ключ не
+    запрашивается повторно. Изменения кэша сбрасываются на диск не чаще
+    раза в save_interval секунд отдельным потоком-писателем.
+    Цикл событий работает в собственном потоке.
+    """
+
+    def __init__(self, backend: OracleBackend, ttl: float = 3600, max_stale: float = 7 * 24 * 3600,
+                 timeout: float = 5.0, max_concurrency: int = 8,
+                 cache_path: Optional[str] = None, failure_ttl: float = 60.0,
+                 save_interval: float = 1.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.failure_ttl = failure_ttl
+        self.save_interval = save_interval
+
+        self._cache: Dict[str, Tuple[float, Dict]] = {}  # ключ -> (время получения, ответ)
+        self._failures: Dict[str, float] = {}  # ключ -> время последней ошибки
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix="oracle")
+        # Единственный писатель кэша: сохранения не занимают пул бэкенда и не гоняются
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="oracle-cache")
+        self._save_handle: Optional[asyncio.TimerHandle] = None  # Отложенное сохранение
+        if cache_path and os.path.exists(cache_path):
+            self._load_cache()
+
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "backend_calls": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "failure_hits": 0,
+            "cache_saves": 0,
+        }
+
+        ready = threading.Event()
+        self.loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self._semaphore = asyncio.Semaphore(max_concurrency)
+            ready.set()
+            self.loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+
+    def submit(self, coroutine) -> concurrent.futures.Future:
+        """Запускает корутину в цикле клиента (из любого потока)"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    async def fetch(self, key: str, call: Callable[[float], Dict]) -> Optional[Dict]:
+        """Ответ для ключа из кэша или от бэкенда; call(timeout) - блокирующий запрос"""
+        entry = self._cache.get(key)
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age < self.ttl:
+                self._count("hits")
+                return entry[1]
+            if age < self.max_stale:
+                # Отдаём устаревшее сразу, обновляем в фоне
+                self._count("stale_hits")
+                if not self._recently_failed(key):
+                    self._refresh(key, call)
+                return entry[1]
+        if self._recently_failed(key):
+            self._count("failure_hits")
+            return None
+        self._count("misses")
+        value = await self._refresh(key, call)
+        if value is None and entry is not None:
+            return entry[1]
+        return value
+
+    def close(self):
+        if self.cache_path:
+            # Отложенное сохранение выполняем сразу и дожидаемся записи
+            self.submit(self._flush_pending()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._executor.shutdown(wait=False)
+        self._writer.shutdown(wait=True)
+
+    def get_stats(self) -> Dict:
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats["cached"] = len(self._cache)
+        stats["inflight"] = len(self._inflight)
+        return stats
+
+    def _count(self, key: str, amount: int = 1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def _refresh(self, key: str, call: Callable[[float], Dict]) -> asyncio.Future:
+        """Запрос к бэкенду, общий для всех одновременно ждущих этот ключ"""
+        task = self._inflight.get(key)
+        if task is not None:
+            self._count("coalesced")
+            return task
+        task = self._inflight[key] = asyncio.ensure_future(self._load(key, call))
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _load(self, key: str, call: Callable[[float], Dict]) -> Optional[Dict]:
+        async with self._semaphore:
+            self._count("backend_calls")
+            try:
+                # Поток бэкенда не прерывается: его ограничивает собственный timeout запроса
+                value = await asyncio.wait_for(
+                    self.loop.run_in_executor(self._executor, call, self.timeout), self.timeout)
+            except asyncio.TimeoutError:
+                self._count("timeouts")
+                self._failures[key] = time.time()
+                return None
+            except Exception as e:
+                print(f"Oracle error ({key}): {e}")
+                self._count("errors")
+                self._failures[key] = time.time()
+                return None
+        self._cache[key] = (time.time(), value)
+        self._failures.pop(key, None)
+        if self.cache_path and self._save_handle is None:
+            # Все изменения за save_interval уходят на диск одной записью
+            self._save_handle = self.loop.call_later(self.save_interval, self._flush_cache)
+        return value
+
+    def _recently_failed(self, key: str) -> bool:
+        failed_at = self._failures.get(key)
+        if failed_at is None:
+            return False
+        if time.time() - failed_at < self.failure_ttl:
+            return True
+        del self._failures[key]
+        return False
+
+    async def _flush_pending(self):
+        self._flush_cache()
+
+    def _flush_cache(self):
+        """Передаёт снимок кэша писателю, если есть несохранённые изменения (в цикле событий)"""
+        if self._save_handle is None:
+            return
+        self._save_handle.cancel()
+        self._save_handle = None
+        self._writer.submit(self._save_cache, dict(self._cache))
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                self._cache = {key: (fetched_at, value)
+                               for key, (fetched_at, value) in json.load(f).items()}
+        except (json.JSONDecodeError, IOError, ValueError) as e:
+            print(f"Oracle cache load error: {e}")
+
+    def _save_cache(self, cache: Dict[str, Tuple[float, Dict]]):
+        """Атомарно записывает кэш на диск (в потоке писателя, не в цикле событий)"""
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except (IOError, TypeError, ValueError) as e:
+            print(f"Oracle cache save error: {e}")
+            return
+        self._count("cache_saves")
+
+
+class QualityOracle:
+    """Внешние метрики валидатора (GitHub, форум) через кэширующий OracleClient"""
+
+    def __init__(self, client: Optional[OracleClient] = None, repo_owner: str = "quantum-chain",
+                 repo_name: str = "core"):
+        self.client = client if client is not None else OracleClient(HTTPOracleBackend())
+        self.repo_owner = repo_owner
+        self.repo_name = repo_name
+
+    def fetch_validator_metrics(self, validator_address: str, github_username: Optional[str] = None,
+                                wait: Optional[float] = None) -> Dict:
+        """Собирает метрики из внешних источников, ожидая не дольше wait секунд.
+
+        Недоступные метрики в ответ не входят; запросы, не уложившиеся в
+        wait, продолжаются в фоне и попадут в кэш.
+        """
+        wait = self.client.timeout if wait is None else wait
+        return self.client.submit(self._collect(validator_address, github_username, wait)).result()
+
+    def fetch_validator_metrics_async(self, validator_address: str,
+                                      github_username: Optional[str],
+                                      callback: Callable[[Dict], None]):
+        """Собирает метрики в фоне и передаёт их в callback (в потоке клиента)"""
+        def deliver(future: concurrent.futures.Future):
+            try:
+                callback(future.result())
+            except Exception as e:
+                print(f"Oracle callback error: {e}")
+
+        self.client.submit(
+            self._collect(validator_address, github_username, None)).add_done_callback(deliver)
+
+    async def _collect(self, validator_address: str, github_username: Optional[str],
+                       wait: Optional[float]) -> Dict:
+        backend = self.client.backend
+        pending = {}
+
+        if github_username:
+            # GitHub contributions
+            owner, repo = self.repo_owner, self.repo_name
+            pending["github_contributions"] = asyncio.ensure_future(self.client.fetch(
+                f"github:{owner}/{repo}/{github_username}",
+                lambda timeout: backend.get_contributions(github_username, owner, repo, timeout)))
+
+        # Forum activity (используем хэш адреса как идентификатор)
+        forum_id = hashlib.sha256(validator_address.encode()).hexdigest()[:16]
+        pending["forum_activity"] = asyncio.ensure_future(self.client.fetch(
+            f"forum:{forum_id}", lambda timeout: backend.get_forum_activity(forum_id, timeout)))
+
+        # Не уложившиеся в wait запросы продолжаются в фоне и заполнят кэш
+        await asyncio.wait(pending.values(), timeout=wait)
+        return {name: task.result() for name, task in pending.items()
+                if task.done() and task.result() is not None}
@@ -1,9 +1,15 @@
+import heapq
+import threading
 import time
+from array import array
 from collections import defaultdict, deque
-from typing import Dict, List, Tuple
-import statistics
+from itertools import repeat
+from operator import add, itemgetter, mul
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
+from .metric_queue import MetricIngestQueue
+from .metric_store import MetricHistoryStore
 
 class MetricType(Enum):
     UPTIME = "uptime"
@@ -21,12 +27,132 @@ class QualityMetric:
     timestamp: float
     source: str  # "system", "oracle", "voting"
 
+class SlidingWindow:
+    """Скользящее окно со средним: бакеты по времени с текущими суммой и числом.
+
+    Запись и чтение - O(1) амортизированно: устаревшие бакеты отбрасываются
+    с головы, сумма и число поддерживаются инкрементально. Граница окна
+    округляется до бакета.
+    """
+    __slots__ = ("window", "bucket_seconds", "buckets", "total", "count")
+
+    def __init__(self, window: float, bucket_seconds: float):
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self.buckets: Deque[List] = deque()  # [номер бакета, сумма, число] по возрастанию
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value: float, timestamp: float, now: float, count: int = 1):
+        """Добавляет count наблюдений с суммой value в бакет timestamp"""
+        bucket_id = int(timestamp // self.bucket_seconds)
+        if bucket_id < self._oldest_live(now):
+            return
+        buckets = self.buckets
+        if not buckets or bucket_id > buckets[-1][0]:
+            buckets.append([bucket_id, value, count])
+        elif bucket_id == buckets[-1][0]:
+            buckets[-1][1] += value
+            buckets[-1][2] += count
+        else:
+            # Запись не по порядку (доигрывание журнала): окно ограничено, поиск короткий
+            for i in range(len(buckets) - 1, -1, -1):
+                if buckets[i][0] == bucket_id:
+                    buckets[i][1] += value
+                    buckets[i][2] += count
+                    break
+                if buckets[i][0] < bucket_id:
+                    buckets.insert(i + 1, [bucket_id, value, count])
+                    break
+            else:
+                buckets.appendleft([bucket_id, value, count])
+        self.total += value
+        self.count += count
+        self.expire(now)
+
+    def expire(self, now: float):
+        oldest = self._oldest_live(now)
+        buckets = self.buckets
+        while buckets and buckets[0][0] < oldest:
+            _, total, count = buckets.popleft()
+            self.total -= total
+            self.count -= count
+        if not buckets:
+            self.total = 0.0  # Сбрасываем накопленную ошибку округления
+
+    def mean(self, now: float) -> Optional[float]:
+        self.expire(now)
+        return self.total / self.count if self.count else None
+
+    def _oldest_live(self, now: float) -> int:
+        return int((now - self.window) // self.bucket_seconds)
+
+
+class CountWindow:
+    """Последние maxlen отметок 0/1 с текущей суммой (доля за O(1))"""
+    __slots__ = ("values", "ones")
+
+    def __init__(self, maxlen: int):
+        self.values: Deque[int] = deque(maxlen=maxlen)
+        self.ones = 0
+
+    def append(self, value: int):
+        if len(self.values) == self.values.maxlen:
+            self.ones -= self.values[0]
+        self.values.append(value)
+        self.ones += value
+
+    def ratio(self) -> float:
+        return self.ones / len(self.values) if self.values else 0.0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
 class ReputationSystem:
-    def __init__(self):
-        self.validator_metrics = defaultdict(list)
+    """Репутация валидаторов по метрикам качества.
+
+    Для каждого валидатора и типа метрики поддерживается скользящее окно
+    за score_window секунд (SlidingWindow), поэтому запись метрики и
+    чтение score не зависят от длины истории. История метрик хранится
+    в колонках (MetricHistoryStore): сырые наблюдения за score_window, но
+    не более max_history на валидатора и тип, более старые свёрнуты в
+    часовые бакеты и удаляются через rollup_ttl секунд.
+
+    В пакетном режиме (batch_scoring) запись метрики не пересчитывает
+    score: все score пересчитываются разом в recalculate_all (по такту)
+    по колонкам средних (валидаторы x типы метрик). Колонки сохраняются,
+    поэтому смена весов через set_metric_weights - одна свёртка колонок
+    без обхода окон.
+
+    С ingest_queue_size > 0 add_metric не блокирует вызывающего: метрика
+    ставится в MetricIngestQueue, а фоновый поток применяет пачки,
+    сливая наблюдения одного валидатора, типа и бакета окна в одно
+    обновление окна и один пересчёт score на валидатора.
+    """
+
+    def __init__(self, journal=None, score_window: float = 24 * 3600,
+                 bucket_seconds: float = 300, max_history: int = 10_000,
+                 rollup_ttl: float = 30 * 24 * 3600, batch_scoring: bool = False,
+                 ingest_queue_size: int = 0):
+        self.journal = journal  # storage.StateJournal для восстановления после сбоя
+        self.score_window = score_window
+        self.bucket_seconds = bucket_seconds
+        self.lock = threading.Lock()
+        self.metric_history = MetricHistoryStore(raw_ttl=score_window, rollup_ttl=rollup_ttl,
+                                                 max_raw=max_history)
         self.validator_scores = defaultdict(float)
-        self.uptime_history = defaultdict(lambda: deque(maxlen=1000))
+        self.uptime_history = defaultdict(lambda: CountWindow(1000))
         self.voting_records = defaultdict(list)
+        self._windows: Dict[str, Dict[MetricType, SlidingWindow]] = {}
+        self.batch_scoring = batch_scoring
+        # Колонки последнего пакетного пересчёта: адреса строк и (средние, наличие) по типам
+        self._rows: List[str] = []
+        self._columns: Dict[MetricType, Tuple[array, array]] = {}
+        self.ingest = (MetricIngestQueue(self._apply_metrics, capacity=ingest_queue_size)
+                       if ingest_queue_size else None)
+        # Вызывается с (адрес, новый score) после каждого пересчёта, вне блокировки
+        self.score_listener: Optional[Callable[[str, float], None]] = None
         
         # Веса метрик (можно настраивать через governance)
         self.metric_weights = {
@@ -39,17 +165,102 @@ class ReputationSystem:
         }
     
     def add_metric(self, validator_address: str, metric: QualityMetric):
-        """Добавляет метрику для валидатора"""
-        self.validator_metrics[validator_address].append(metric)
-        self._recalculate_score(validator_address)
+        """Добавляет метрику для валидатора (через очередь приёма, если она включена)"""
+        if self.ingest is not None:
+            self.ingest.put(validator_address, metric)
+        else:
+            self._apply_metrics([(validator_address, metric)])
+    
+    def flush_metrics(self):
+        """Синхронно применяет метрики, ожидающие в очереди приёма"""
+        if self.ingest is not None:
+            self.ingest.flush()
+    
+    def _apply_metrics(self, items: List[Tuple[str, QualityMetric]]) -> int:
+        """Применяет пачку метрик; возвращает число наблюдений, слитых с соседними"""
+        now = time.time()
+        # (адрес, тип, бакет окна) -> [сумма, число, последний timestamp]
+        groups: Dict[Tuple[str, MetricType, int], List] = {}
+        with self.lock:
+            for address, metric in items:
+                self.metric_history.append(address, metric.metric_type, metric.value,
+                                           metric.timestamp, metric.source, now)
+                key = (address, metric.metric_type, int(metric.timestamp // self.bucket_seconds))
+                group = groups.get(key)
+                if group is None:
+                    groups[key] = [metric.value, 1, metric.timestamp]
+                else:
+                    group[0] += metric.value
+                    group[1] += 1
+                    group[2] = max(group[2], metric.timestamp)
+            
+            for (address, metric_type, _), (total, count, timestamp) in groups.items():
+                windows = self._windows.get(address)
+                if windows is None:
+                    windows = self._windows[address] = {
+                        metric_type: SlidingWindow(self.score_window, self.bucket_seconds)
+                        for metric_type in MetricType
+                    }
+                windows[metric_type].add(total, timestamp, now, count)
+            
+            scores = {}
+            if not self.batch_scoring:
+                for address, _, _ in groups:
+                    if address not in scores:
+                        scores[address] = self._recalculate_score(address, now)
+        if self.journal is not None:
+            for address, metric in items:
+                self.journal.log_metric(address, metric)
+        self._notify(scores)
+        return len(items) - len(groups)
+    
+    def create_metric(self, metric_type: MetricType, value: float, source: str,
+                      timestamp: float = None) -> QualityMetric:
+        """Создаёт метрику с текущим весом её типа"""
+        return QualityMetric(
+            metric_type=metric_type,
+            value=value,
+            weight=self.metric_weights[metric_type],
+            timestamp=time.time() if timestamp is None else timestamp,
+            source=source
+        )
+    
+    def restore_metric(self, validator_address: str, metric_type: str, value: float,
+                       timestamp: float, source: str):
+        """Восстанавливает метрику из журнала/снапшота"""
+        metric = self.create_metric(MetricType(metric_type), value, source, timestamp)
+        self._apply_metrics([(validator_address, metric)])  # Мимо очереди: порядок доигрывания
+    
+    def snapshot_metrics(self) -> Dict[str, List[QualityMetric]]:
+        """Сырая история метрик по валидаторам (для снапшота; свёрнутые бакеты не входят)"""
+        with self.lock:
+            return {
+                address: [
+                    QualityMetric(metric_type, value, self.metric_weights[metric_type],
+                                  timestamp, source)
+                    for metric_type, value, timestamp, source
+                    in self.metric_history.iter_raw(address)
+                ]
+                for address in self.metric_history.addresses()
+            }
+    
+    def _get_recent_metrics(self, validator_address: str,
+                            window: Optional[float] = None) -> Dict[MetricType, Tuple[array, array]]:
+        """Сырые (timestamps, values) по типам метрик за последние window секунд"""
+        since = time.time() - (self.score_window if window is None else window)
+        with self.lock:
+            return {metric_type: self.metric_history.window(validator_address, metric_type, since)
+                    for metric_type in MetricType}
     
     def record_uptime(self, validator_address: str, is_online: bool):
         """Записывает аптайм валидатора"""
-        self.uptime_history[validator_address].append(1 if is_online else 0)
+        with self.lock:
+            history = self.uptime_history[validator_address]
+            history.append(1 if is_online else 0)
+            uptime = history.ratio()
         
-        # Рассчитываем аптайм за последние 24 часа
-        if len(self.uptime_history[validator_address]) > 0:
-            uptime = sum(self.uptime_history[validator_address]) / len(self.uptime_history[validator_address])
+        # Аптайм по последним отметкам (текущая сумма, без пересчёта)
+        if len(history) > 0:
             metric = QualityMetric(
                 metric_type=MetricType.UPTIME,
                 value=uptime,
@@ -132,43 +343,105 @@ class ReputationSystem:
         )
         self.add_metric(validator_address, metric)
     
-    def _recalculate_score(self, validator_address: str):
-        """Пересчитывает общий score валидатора"""
-        recent_metrics = self._get_recent_metrics(validator_address, hours=24)
-        
-        if not recent_metrics:
-            self.validator_scores[validator_address] = 0.0
-            return
-        
+    def _recalculate_score(self, validator_address: str, now: float) -> float:
+        """Пересчитывает общий score валидатора по окнам типов метрик (O(число типов))"""
+        windows = self._windows.get(validator_address)
         weighted_sum = 0.0
         total_weight = 0.0
+        if windows is not None:
+            for metric_type, window in windows.items():
+                avg_value = window.mean(now)
+                if avg_value is not None:
+                    weighted_sum += avg_value * self.metric_weights[metric_type]
+                    total_weight += self.metric_weights[metric_type]
         
-        for metric_type in MetricType:
-            type_metrics = [m for m in recent_metrics if m.metric_type == metric_type]
-            if type_metrics:
-                # Берем среднее по метрикам этого типа
-                avg_value = statistics.mean([m.value for m in type_metrics])
-                weighted_sum += avg_value * self.metric_weights[metric_type]
-                total_weight += self.metric_weights[metric_type]
+        score = weighted_sum / total_weight if total_weight > 0 else 0.0
+        self.validator_scores[validator_address] = score
+        return score
+    
+    def get_validator_score(self, validator_address: str) -> float:
+        """Возвращает текущий score валидатора (с учётом устаревания метрик)"""
+        with self.lock:
+            if validator_address not in self._windows:
+                return 0.0
+            previous = self.validator_scores[validator_address]
+            score = self._recalculate_score(validator_address, time.time())
+        # Score мог измениться из-за устаревания метрик
+        if score != previous and self.score_listener is not None:
+            self.score_listener(validator_address, score)
+        return score
+    
+    def recalculate_all(self, now: float = None) -> Dict[str, float]:
+        """Пакетный пересчёт score всех валидаторов; возвращает изменившиеся score.
+
+        Заодно сжимает историю метрик: ряды, в которые давно не писали,
+        иначе не сворачивались бы в бакеты и не освобождали память.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self.metric_history.compact_all(now)
+            self._refresh_columns_locked(now)
+            changed = self._combine_columns_locked()
+        self._notify(changed)
+        return changed
+    
+    def set_metric_weights(self, weights: Dict) -> Dict[str, float]:
+        """Меняет веса метрик (governance) и пересчитывает score всех валидаторов.
         
-        if total_weight > 0:
-            self.validator_scores[validator_address] = weighted_sum / total_weight
-        else:
-            self.validator_scores[validator_address] = 0.0
+        В пакетном режиме score сворачиваются из колонок последнего такта,
+        иначе колонки сначала обновляются по текущим окнам.
+        """
+        with self.lock:
+            for metric_type, weight in weights.items():
+                self.metric_weights[MetricType(metric_type)] = weight
+            if not self.batch_scoring or not self._columns:
+                self._refresh_columns_locked(time.time())
+            changed = self._combine_columns_locked()
+        self._notify(changed)
+        return changed
     
-    def _get_recent_metrics(self, validator_address: str, hours: int = 24) -> List[QualityMetric]:
-        """Возвращает метрики за последние N часов"""
-        cutoff_time = time.time() - (hours * 3600)
-        return [
-            metric for metric in self.validator_metrics[validator_address]
-            if metric.timestamp >= cutoff_time
-        ]
+    def _refresh_columns_locked(self, now: float):
+        """Собирает средние окон в колонки: по массиву средних и наличия на тип метрики"""
+        rows = list(self._windows)
+        columns = {}
+        for metric_type in MetricType:
+            means = array("d", bytes(8 * len(rows)))
+            present = array("d", bytes(8 * len(rows)))
+            for row, address in enumerate(rows):
+                mean = self._windows[address][metric_type].mean(now)
+                if mean is not None:
+                    means[row] = mean
+                    present[row] = 1.0
+            columns[metric_type] = (means, present)
+        self._rows = rows
+        self._columns = columns
     
-    def get_validator_score(self, validator_address: str) -> float:
-        """Возвращает текущий score валидатора"""
-        return self.validator_scores.get(validator_address, 0.0)
+    def _combine_columns_locked(self) -> Dict[str, float]:
+        """Score = сумма(вес * среднее) / сумма(вес * наличие) поколоночно"""
+        weighted_sum = [0.0] * len(self._rows)
+        total_weight = [0.0] * len(self._rows)
+        for metric_type, (means, present) in self._columns.items():
+            weight = self.metric_weights[metric_type]
+            if weight:
+                weighted_sum = list(map(add, weighted_sum, map(mul, means, repeat(weight))))
+                total_weight = list(map(add, total_weight, map(mul, present, repeat(weight))))
+        
+        changed = {}
+        scores = self.validator_scores
+        for address, numerator, denominator in zip(self._rows, weighted_sum, total_weight):
+            score = numerator / denominator if denominator > 0 else 0.0
+            if scores.get(address) != score:
+                scores[address] = score
+                changed[address] = score
+        return changed
+    
+    def _notify(self, changed: Dict[str, float]):
+        if self.score_listener is not None:
+            for address, score in changed.items():
+                self.score_listener(address, score)
     
     def get_top_validators(self, count: int = 10) -> List[Tuple[str, float]]:
-        """Возвращает топ валидаторов по репутации"""
-        scored_validators = [(addr, score) for addr, score in self.validator_scores.items()]
-        return sorted(scored_validators, key=lambda x: x[1], reverse=True)[:count]
+        """Возвращает топ валидаторов по репутации (частичная сортировка, O(n log count))"""
+        with self.lock:
+            scored_validators = list(self.validator_scores.items())
+        return heapq.nlargest(count, scored_validators, key=itemgetter(1))
@@ -0,0 +1,107 @@
+import hashlib
+import struct
+from typing import Dict, List, Sequence, Tuple
+
+_SLOT_KEY = struct.Struct(">QHQ")  # epoch, shard_id, slot
+_DRAW = struct.Struct(">QQ")
+
+
+class AliasTable:
+    """Таблица псевдонимов Воуза: выборка с весами за O(1).
+
+    Построение O(n); каждая выборка - один индекс и одно сравнение.
+    """
+
+    def __init__(self, weights: Sequence[float]):
+        n = len(weights)
+        if n == 0:
+            raise ValueError("AliasTable needs at least one weight")
+        total = float(sum(weights))
+        if total <= 0:
+            # Все веса нулевые: равномерное распределение
+            weights = [1.0] * n
+            total = float(n)
+
+        scaled = [w * n / total for w in weights]
+        self.prob = [0.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Остатки из-за округления - вероятность 1
+        for i in large + small:
+            self.prob[i] = 1.0
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+    def sample(self, column: int, coin: float) -> int:
+        """Выборка по столбцу (любое целое) и монете из [0, 1)"""
+        column %= len(self.prob)
+        return column if coin < self.prob[column] else self.alias[column]
+
+
+class LeaderSchedule:
+    """Расписание лидеров на эпоху: слот каждого шарда -> валидатор.
+
+    Жребий слота - sha3_256(seed, epoch, shard, slot), поэтому расписание
+    определяется только seed, списком валидаторов и весами: узлы, у
+    которых они совпадают, получают одно и то же расписание. Поиск
+    лидера - индекс в массиве.
+    """
+
+    def __init__(self, epoch: int, seed: bytes, validators: Sequence, weights: Sequence[float],
+                 shard_count: int, slots_per_epoch: int):
+        self.epoch = epoch
+        self.seed = seed
+        self.shard_count = shard_count
+        self.slots_per_epoch = slots_per_epoch
+        self.first_slot = epoch * slots_per_epoch
+
+        table = AliasTable(weights)
+        self.slots: List[List] = []
+        for shard_id in range(shard_count):
+            shard_slots = []
+            for offset in range(slots_per_epoch):
+                column, coin = self._draw(shard_id, self.first_slot + offset)
+                shard_slots.append(validators[table.sample(column, coin)])
+            self.slots.append(shard_slots)
+
+    def _draw(self, shard_id: int, slot: int) -> Tuple[int, float]:
+        digest = hashlib.sha3_256(self.seed + _SLOT_KEY.pack(self.epoch, shard_id, slot)).digest()
+        column, coin = _DRAW.unpack_from(digest)
+        return column, coin / 2.0 ** 64
+
+    def covers(self, slot: int) -> bool:
+        return self.first_slot <= slot < self.first_slot + self.slots_per_epoch
+
+    def leader(self, shard_id: int, slot: int):
+        """Лидер слота; slot должен принадлежать эпохе расписания"""
+        return self.slots[shard_id][slot - self.first_slot]
+
+    def slot_counts(self) -> Dict[str, int]:
+        """Число слотов эпохи у каждого валидатора (по всем шардам)"""
+        counts: Dict[str, int] = {}
+        for shard_slots in self.slots:
+            for validator in shard_slots:
+                counts[validator.address] = counts.get(validator.address, 0) + 1
+        return counts
+
+
+def epoch_seed(shards: Sequence, epoch: int, slots_per_epoch: int, finality_depth: int) -> bytes:
+    """Seed расписания эпохи: хэши финализированных блоков шардов на фиксированной высоте.
+
+    Высота зависит только от номера эпохи (epoch * slots_per_epoch -
+    finality_depth), поэтому узлы с разной высотой вершины получают один
+    и тот же seed. Шард, не дошедший до этой высоты, даёт пустую строку.
+    """
+    height = epoch * slots_per_epoch - finality_depth
+    hashes = [(shard.get_finalized_hash(height) if height >= 0 else None) or ""
+              for shard in shards]
+    return hashlib.sha3_256("".join(hashes).encode()).digest()
@@ -1,7 +1,9 @@
+import heapq
 import time
 from typing import List, Optional, Dict, Tuple
 from dataclasses import dataclass
 from .reputation import ReputationSystem, MetricType
+from .schedule import LeaderSchedule
 from .oracles import QualityOracle
 import threading
 
@@ -17,13 +19,35 @@ class Validator:
     is_active: bool = True
 
 class ValidatorManager:
-    def __init__(self, min_stake: int):
+    """Реестр валидаторов и выбор лидера DPoQS.
+
+    Валидаторы индексируются по адресу. Комбинированный score (репутация +
+    стейк) пересчитывается только при изменении стейка, репутации или
+    активности и кладётся в max-кучу с ленивым удалением устаревших
+    записей, поэтому выбор лидера - O(log n) амортизированно.
+    """
+
+    def __init__(self, min_stake: int, journal=None):
         self.validators: List[Validator] = []
         self.min_stake = min_stake
-        self.reputation_system = ReputationSystem()
+        self.journal = journal  # storage.StateJournal: журналирование изменений стейка
+        self._restored_stakes: Dict[str, int] = {}  # Стейки из журнала для ещё не добавленных валидаторов
+        # Score пересчитываются пакетно по такту (recalculate_all), а не на каждую метрику;
+        # метрики принимаются через очередь и не задерживают производство блоков
+        self.reputation_system = ReputationSystem(journal, batch_scoring=True,
+                                                  ingest_queue_size=65_536)
+        self.reputation_system.score_listener = self._on_reputation_change
         self.quality_oracle = QualityOracle()
         self.lock = threading.Lock()
         
+        # Индексы: адрес -> валидатор, порядок регистрации (для равных score)
+        self._by_address: Dict[str, Validator] = {}
+        self._order: Dict[str, int] = {}
+        self._reputation_scores: Dict[str, float] = {}
+        # Max-куча (-score, порядок, версия, адрес); версия отсекает устаревшие записи
+        self._heap: List[Tuple[float, int, int, str]] = []
+        self._versions: Dict[str, int] = {}
+        
         # Запускаем фоновое обновление метрик
         self.running = True
         threading.Thread(target=self._metrics_update_loop, daemon=True).start()
@@ -34,6 +58,10 @@ class ValidatorManager:
         if stake < self.min_stake:
             raise ValueError("Insufficient stake")
         
+        with self.lock:
+            # После перезапуска стейк берётся из журнала (награды и штрафы)
+            stake = self._restored_stakes.pop(address, stake)
+        
         validator = Validator(
             address=address,
             sphincs_sk=sphincs_sk,
@@ -44,8 +72,14 @@ class ValidatorManager:
             is_active=True
         )
         
+        # Score читаем до блокировки: при изменении он сам сообщит обработчику
+        reputation_score = self.reputation_system.get_validator_score(address)
         with self.lock:
             self.validators.append(validator)
+            self._by_address[address] = validator
+            self._order[address] = len(self._order)
+            self._reputation_scores.setdefault(address, reputation_score)
+            self._update_priority_locked(validator)
         
         # Инициализируем метрики
         self._initialize_validator_metrics(validator)
@@ -55,57 +89,99 @@ class ValidatorManager:
         # Начальный аптайм
         self.reputation_system.record_uptime(validator.address, True)
         
-        # Загружаем внешние метрики
+        # Загружаем внешние метрики в фоне: добавление валидатора не ждёт сети
         if validator.github_username:
-            external_metrics = self.quality_oracle.fetch_validator_metrics(
-                validator.address, validator.github_username
+            self.quality_oracle.fetch_validator_metrics_async(
+                validator.address, validator.github_username,
+                lambda external_metrics: self._apply_initial_external_metrics(
+                    validator, external_metrics)
             )
-            
-            # Добавляем code contributions
-            if "github_contributions" in external_metrics:
-                gh_data = external_metrics["github_contributions"]
-                self.reputation_system.add_code_contribution(
-                    validator.address,
-                    gh_data["lines_added"],
-                    gh_data["lines_removed"],
-                    is_core_contribution=True
-                )
-            
-            # Добавляем community metrics
-            if "forum_activity" in external_metrics:
-                forum_data = external_metrics["forum_activity"]
-                self.reputation_system.add_community_metric(
-                    validator.address,
-                    forum_data["helpful_answers"] / max(forum_data["posts_count"], 1),
-                    forum_data["reputation_score"] / 100.0
-                )
+    
+    def _apply_initial_external_metrics(self, validator: Validator, external_metrics: Dict):
+        """Добавляет начальные внешние метрики валидатора"""
+        # Добавляем code contributions
+        if "github_contributions" in external_metrics:
+            gh_data = external_metrics["github_contributions"]
+            self.reputation_system.add_code_contribution(
+                validator.address,
+                gh_data["lines_added"],
+                gh_data["lines_removed"],
+                is_core_contribution=True
+            )
+        
+        # Добавляем community metrics
+        if "forum_activity" in external_metrics:
+            forum_data = external_metrics["forum_activity"]
+            self.reputation_system.add_community_metric(
+                validator.address,
+                forum_data["helpful_answers"] / max(forum_data["posts_count"], 1),
+                forum_data["reputation_score"] / 100.0
+            )
+    
+    def get_validator(self, validator_address: str) -> Optional[Validator]:
+        with self.lock:
+            return self._by_address.get(validator_address)
+    
+    def combined_score(self, validator: Validator) -> float:
+        """Комбинированный score DPoQS: 70% репутация, 30% нормализованный стейк"""
+        reputation_score = self._reputation_scores.get(validator.address, 0.0)
+        stake_score = min(1.0, validator.stake / (self.min_stake * 10))  # Нормализуем стейк
+        return (reputation_score * 0.7) + (stake_score * 0.3)
     
     def select_validator(self) -> Optional[Validator]:
-        """Выбирает валидатора по алгоритму DPoQS"""
+        """Выбирает валидатора по алгоритму DPoQS (наивысший score)"""
         with self.lock:
-            active_validators = [v for v in self.validators if v.is_active]
-            
-            if not active_validators:
-                return None
-            
-            # Рассчитываем комбинированный score для каждого валидатора
-            validator_scores = []
-            for validator in active_validators:
-                reputation_score = self.reputation_system.get_validator_score(validator.address)
-                stake_score = min(1.0, validator.stake / (self.min_stake * 10))  # Нормализуем стейк
-                
-                # Комбинированный score: 70% репутация, 30% стейк
-                combined_score = (reputation_score * 0.7) + (stake_score * 0.3)
-                
-                validator_scores.append((validator, combined_score))
-            
-            # Выбираем валидатора с наивысшим score
-            selected_validator = max(validator_scores, key=lambda x: x[1])[0]
-            
-            # Обновляем время активности
-            selected_validator.last_active = time.time()
-            
-            return selected_validator
+            heap = self._heap
+            while heap:
+                _, _, version, address = heap[0]
+                if self._versions.get(address) != version:
+                    heapq.heappop(heap)
+                    continue
+                selected_validator = self._by_address[address]
+                # Обновляем время активности
+                selected_validator.last_active = time.time()
+                return selected_validator
+            return None
+    
+    def build_schedule(self, epoch: int, seed: bytes, shard_count: int,
+                       slots_per_epoch: int) -> Optional[LeaderSchedule]:
+        """Строит расписание лидеров на эпоху с весами по стейку валидаторов.
+
+        combined_score и признак активности в веса не входят: репутация и
+        аптайм - локальные наблюдения узла, и расписания узлов разошлись
+        бы. Валидаторы упорядочиваются по адресу. Совпадение расписаний
+        между узлами требует одинаковых стейков, которые пока ведутся
+        локально (награды и штрафы), поэтому лидер входящих блоков не
+        проверяется; неактивный лидер пропускает слот (chain.leader_for).
+        """
+        with self.lock:
+            validators = sorted(self.validators, key=lambda v: v.address)
+            weights = [float(v.stake) for v in validators]
+        if not validators:
+            return None
+        return LeaderSchedule(epoch, seed, validators, weights, shard_count, slots_per_epoch)
+    
+    def _on_reputation_change(self, validator_address: str, score: float):
+        with self.lock:
+            self._reputation_scores[validator_address] = score
+            validator = self._by_address.get(validator_address)
+            if validator is not None:
+                self._update_priority_locked(validator)
+    
+    def _update_priority_locked(self, validator: Validator):
+        """Переиндексирует валидатора в куче после изменения стейка/репутации/активности"""
+        address = validator.address
+        version = self._versions.get(address, 0) + 1
+        self._versions[address] = version
+        if validator.is_active:
+            heapq.heappush(self._heap, (-self.combined_score(validator), self._order[address],
+                                        version, address))
+        
+        # Ленивое удаление: перестраиваем кучу, если устаревших записей слишком много
+        if len(self._heap) > 2 * len(self._by_address) + 1024:
+            self._heap = [entry for entry in self._heap
+                          if self._versions.get(entry[3]) == entry[2]]
+            heapq.heapify(self._heap)
     
     def record_block_creation(self, validator_address: str, block_hash: str, 
                             accepted: bool, propagation_time: float):
@@ -120,10 +196,10 @@ class ValidatorManager:
         
         # Обновляем статус валидатора
         with self.lock:
-            for validator in self.validators:
-                if validator.address == validator_address:
-                    validator.is_active = is_online
-                    break
+            validator = self._by_address.get(validator_address)
+            if validator is not None and validator.is_active != is_online:
+                validator.is_active = is_online
+                self._update_priority_locked(validator)
     
     def record_governance_vote(self, validator_address: str, proposal_id: str):
         """Записывает участие в голосовании"""
@@ -135,39 +211,61 @@ class ValidatorManager:
                           penalty_severity: float = 0.05):
         """Наказывает валидатора (сланкинг)"""
         with self.lock:
-            for validator in self.validators:
-                if validator.address == validator_address:
-                    penalty_amount = int(validator.stake * penalty_severity)
-                    validator.stake -= penalty_amount
-                    
-                    # Также снижаем репутацию
-                    self.reputation_system.add_metric(
-                        validator_address,
-                        self.reputation_system.create_metric(
-                            MetricType.BLOCK_QUALITY,
-                            0.1,  # Сильное снижение за проступок
-                            "penalty"
-                        )
-                    )
-                    
-                    print(f"Validator {validator_address} penalized: {penalty_reason}, "
-                          f"amount: {penalty_amount}")
-                    break
+            validator = self._by_address.get(validator_address)
+            if validator is None:
+                return
+            penalty_amount = int(validator.stake * penalty_severity)
+            validator.stake -= penalty_amount
+            if self.journal is not None:
+                self.journal.log_stake(validator_address, validator.stake)
+            self._update_priority_locked(validator)
+        
+        # Также снижаем репутацию (вне блокировки: обработчик score берёт её сам)
+        self.reputation_system.add_metric(
+            validator_address,
+            self.reputation_system.create_metric(
+                MetricType.BLOCK_QUALITY,
+                0.1,  # Сильное снижение за проступок
+                "penalty"
+            )
+        )
+        
+        print(f"Validator {validator_address} penalized: {penalty_reason}, "
+              f"amount: {penalty_amount}")
     
     def reward_validator(self, validator_address: str, reward_amount: int):
         """Вознаграждает валидатора"""
         with self.lock:
-            for validator in self.validators:
-                if validator.address == validator_address:
-                    validator.stake += reward_amount
-                    break
+            validator = self._by_address.get(validator_address)
+            if validator is not None:
+                validator.stake += reward_amount
+                if self.journal is not None:
+                    self.journal.log_stake(validator_address, validator.stake)
+                self._update_priority_locked(validator)
+    
+    def get_stakes(self) -> Dict[str, int]:
+        """Текущие стейки по адресам (для снапшота)"""
+        with self.lock:
+            stakes = dict(self._restored_stakes)
+            stakes.update((v.address, v.stake) for v in self.validators)
+            return stakes
+    
+    def restore_stake(self, validator_address: str, stake: int):
+        """Восстанавливает стейк из журнала/снапшота"""
+        with self.lock:
+            validator = self._by_address.get(validator_address)
+            if validator is not None:
+                validator.stake = stake
+                self._update_priority_locked(validator)
+                return
+            self._restored_stakes[validator_address] = stake
     
     def get_validator_stats(self, validator_address: str) -> Dict:
         """Возвращает статистику валидатора"""
         reputation = self.reputation_system.get_validator_score(validator_address)
         
         with self.lock:
-            validator = next((v for v in self.validators if v.address == validator_address), None)
+            validator = self._by_address.get(validator_address)
             if validator:
                 return {
                     "address": validator.address,
@@ -199,6 +297,7 @@ class ValidatorManager:
                         if int(time.time()) % 3600 == 0:
                             self._update_external_metrics(validator)
                 
+                self.reputation_system.recalculate_all()
                 time.sleep(60)  # Обновляем каждую минуту
                 
             except Exception as e:
@@ -206,11 +305,14 @@ class ValidatorManager:
                 time.sleep(300)  # Ждём 5 минут при ошибке
     
     def _update_external_metrics(self, validator: Validator):
-        """Обновляет внешние метрики для валидатора"""
-        external_metrics = self.quality_oracle.fetch_validator_metrics(
-            validator.address, validator.github_username
+        """Запрашивает внешние метрики валидатора в фоне: цикл метрик не ждёт сети"""
+        self.quality_oracle.fetch_validator_metrics_async(
+            validator.address, validator.github_username,
+            lambda external_metrics: self._apply_external_metrics(validator, external_metrics)
         )
-        
+    
+    def _apply_external_metrics(self, validator: Validator, external_metrics: Dict):
+        """Обновляет внешние метрики для валидатора"""
         # Обновляем code contributions
         if "github_contributions" in external_metrics:
             gh_data = external_metrics["github_contributions"]
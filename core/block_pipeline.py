@@ -0,0 +1,234 @@
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from dag.dag_block import DAGBlock
+
+
+class _BlockJob:
+    """Блок, проходящий через стадии конвейера"""
+    __slots__ = ("shard", "validator", "transactions", "previous_hashes", "block", "started_at",
+                 "build_time")
+
+    def __init__(self, shard, validator, transactions: List, previous_hashes: List[str]):
+        self.shard = shard
+        self.validator = validator
+        self.transactions = transactions
+        self.previous_hashes = previous_hashes
+        self.block: Optional[DAGBlock] = None
+        self.started_at = time.time()
+        self.build_time = 0.0  # Сборка пакета + Merkle + вставка, с
+
+
+class BlockProductionPipeline:
+    """Конвейер производства блоков.
+
+    Стадии связаны ограниченными очередями и работают одновременно:
+    сборка пакета (по потоку на шард, с фиксированным периодом) ->
+    хэш/Merkle -> подпись (SPHINCS+ и NTRU параллельно в пуле процессов)
+    -> вставка в DAG -> broadcast. Пока один блок подписывается,
+    следующий уже собирается, поэтому период блока не включает задержку
+    подписи. Заполненная очередь тормозит предыдущую стадию.
+    Размер пакета на каждый блок выбирает chain.block_sizer по глубине
+    партиции пула и измеренным задержкам стадий, а валидатора - расписание
+    лидеров эпохи (chain.leader_for), так что шарды производят блоки от
+    разных валидаторов параллельно. Если блок не доходит до вставки
+    (ошибка стадии, отказ DAG, остановка конвейера), его транзакции
+    возвращаются в пул.
+    """
+
+    def __init__(self, chain, queue_size: int = 16, sign_workers: int = 2):
+        self.chain = chain
+        self.sign_workers = sign_workers
+        self.running = False
+
+        self.merkle_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.sign_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.insert_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.broadcast_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+
+        self._threads: List[threading.Thread] = []
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            "assembled": 0,
+            "signed": 0,
+            "inserted": 0,
+            "rejected": 0,
+            "broadcast": 0,
+            "missed_ticks": 0,
+            "skipped_slots": 0,
+            "failed": 0,
+            "returned_transactions": 0,
+        }
+
+    def start(self):
+        self.running = True
+        threads = [threading.Thread(target=self._assemble_loop, args=(shard,), daemon=True)
+                   for shard in self.chain.dag_shards]
+        threads.append(threading.Thread(target=self._merkle_loop, daemon=True))
+        threads.extend(threading.Thread(target=self._sign_loop, daemon=True)
+                       for _ in range(self.sign_workers))
+        threads.append(threading.Thread(target=self._insert_loop, daemon=True))
+        threads.append(threading.Thread(target=self._broadcast_loop, daemon=True))
+        for thread in threads:
+            thread.start()
+        self._threads = threads
+
+    def stop(self):
+        """Останавливает стадии и возвращает в пул транзакции незавершённых блоков"""
+        self.running = False
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        for stage in (self.merkle_queue, self.sign_queue, self.insert_queue):
+            while True:
+                try:
+                    self._release(stage.get_nowait())
+                except queue.Empty:
+                    break
+
+    def get_stats(self) -> Dict:
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats["queue_depths"] = {
+            "merkle": self.merkle_queue.qsize(),
+            "sign": self.sign_queue.qsize(),
+            "insert": self.insert_queue.qsize(),
+            "broadcast": self.broadcast_queue.qsize(),
+        }
+        return stats
+
+    def _count(self, key: str, amount: int = 1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def _release(self, job: _BlockJob):
+        """Блок не будет вставлен: его транзакции возвращаются в пул"""
+        pool = self.chain.transactions_pool
+        returned = sum(1 for tx in job.transactions if pool.add_transaction(tx))
+        self._count("returned_transactions", returned)
+
+    def _assemble_loop(self, shard):
+        """Сборка пакета транзакций для шарда с фиксированным периодом block_time"""
+        next_tick = time.monotonic()
+        while self.running:
+            try:
+                job = self._assemble(shard, self.chain.current_slot())
+                if job is not None and not self._put(self.merkle_queue, job):
+                    self._release(job)
+            except Exception as e:
+                print(f"Block assembly error in shard {shard.shard_id}: {e}")
+
+            next_tick += self.chain.block_time
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Отстали от расписания: пропускаем такты, а не копим долг
+                self._count("missed_ticks")
+                next_tick = time.monotonic()
+
+    def _assemble(self, shard, slot: int) -> Optional[_BlockJob]:
+        # Лидер слота берётся из расписания эпохи до извлечения транзакций
+        validator = self.chain.leader_for(shard, slot)
+        if not validator:
+            self._count("skipped_slots")
+            return None
+
+        started = time.perf_counter()
+        parents = shard.select_parents()
+        transactions_list = self.chain.take_batch(shard)
+        self._count("assembled")
+        job = _BlockJob(shard, validator, transactions_list, parents)
+        job.build_time = time.perf_counter() - started
+        return job
+
+    def _merkle_loop(self):
+        """Построение блока: Merkle root и хэш заголовка"""
+        for job in self._drain(self.merkle_queue):
+            started = time.perf_counter()
+            try:
+                job.block = DAGBlock(
+                    shard_id=job.shard.shard_id,
+                    transactions=job.transactions,
+                    miner=job.validator.address,
+                    previous_hashes=job.previous_hashes
+                )
+            except Exception as e:
+                print(f"Block build error: {e}")
+                self._fail(job)
+                continue
+            job.build_time += time.perf_counter() - started
+            if not self._put(self.sign_queue, job):
+                self._release(job)
+
+    def _sign_loop(self):
+        """Подпись блока обоими алгоритмами одновременно"""
+        crypto = self.chain.crypto
+        for job in self._drain(self.sign_queue):
+            message = job.block.signing_bytes()
+            started = time.perf_counter()
+            try:
+                sphincs = crypto.sign_async(message, job.validator.sphincs_sk, "sphincs")
+                ntru = crypto.sign_async(message, job.validator.ntru_sk, "ntru")
+                job.block.add_signature("sphincs", sphincs.result())
+                job.block.add_signature("ntru", ntru.result())
+            except Exception as e:
+                print(f"Block signing error: {e}")
+                self._fail(job)
+                continue
+            self.chain.block_sizer.observe_sign(time.perf_counter() - started)
+            self._count("signed")
+            if not self._put(self.insert_queue, job):
+                self._release(job)
+
+    def _insert_loop(self):
+        for job in self._drain(self.insert_queue):
+            started = time.perf_counter()
+            try:
+                inserted = self.chain.commit_block(job.shard, job.block, job.validator,
+                                                   job.started_at)
+            except Exception as e:
+                print(f"Block insert error: {e}")
+                inserted = False
+            job.build_time += time.perf_counter() - started
+            self.chain.block_sizer.observe_build(job.build_time, len(job.transactions))
+            if not inserted:
+                self._count("rejected")
+                self._release(job)
+                continue
+            self._count("inserted")
+            self._put(self.broadcast_queue, job)
+
+    def _broadcast_loop(self):
+        for job in self._drain(self.broadcast_queue):
+            try:
+                self.chain.network.broadcast_block(job.block)
+                self._count("broadcast")
+            except Exception as e:
+                print(f"Block broadcast error: {e}")
+
+    def _fail(self, job: _BlockJob):
+        self._count("failed")
+        self._release(job)
+
+    def _put(self, target: queue.Queue, job: _BlockJob) -> bool:
+        """Блокирующая запись в очередь следующей стадии (backpressure).
+
+        False, если конвейер остановлен раньше, чем нашлось место.
+        """
+        while self.running:
+            try:
+                target.put(job, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _drain(self, source: queue.Queue):
+        while self.running:
+            try:
+                yield source.get(timeout=0.5)
+            except queue.Empty:
+                continue
@@ -0,0 +1,96 @@
+import threading
+from typing import Dict
+
+
+class BlockSizeController:
+    """Выбирает размер пакета транзакций для очередного блока.
+
+    Размер ограничен глубиной партиции мемпула, бюджетом времени на блок
+    (по измеренным задержкам подписи и вставки), потолком газа и
+    max_batch; потолок по байтам применяет сам пул при извлечении.
+    Задержки сглаживаются EWMA. Подпись - фиксированная цена блока:
+    если она дольше block_time, блоки выходят реже и становятся крупнее.
+    """
+
+    def __init__(self, block_time: float, producers: int = 1, sign_workers: int = 1,
+                 max_block_bytes: int = 8 * 1024 * 1024, max_block_gas: int = 2_000_000_000,
+                 gas_per_tx: int = 21_000, min_batch: int = 1, max_batch: int = 200_000,
+                 initial_batch: int = 1_000, target_utilization: float = 0.8,
+                 smoothing: float = 0.2):
+        self.block_time = block_time
+        self.producers = max(1, producers)
+        self.sign_workers = max(1, sign_workers)
+        self.max_block_bytes = max_block_bytes
+        self.max_block_gas = max_block_gas
+        self.gas_per_tx = gas_per_tx
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.initial_batch = initial_batch
+        self.target_utilization = target_utilization
+        self.smoothing = smoothing
+
+        self.lock = threading.Lock()
+        self._sign_latency = None  # EWMA задержки подписи блока, с
+        self._per_tx_cost = None  # EWMA (сборка + вставка) / число транзакций, с
+        self.metrics = {
+            "decisions": 0,
+            "last_batch_size": 0,
+            "last_limit": None,
+            "total_requested": 0,
+        }
+
+    def next_batch_size(self, pool_depth: int) -> int:
+        """Размер пакета для следующего блока при текущей глубине пула"""
+        with self.lock:
+            limits = {
+                "depth": pool_depth,
+                "gas": self.max_block_gas // self.gas_per_tx,
+                "max": self.max_batch,
+                "time": self._time_limit(),
+            }
+            limit = min(limits, key=limits.get)
+            size = max(self.min_batch, limits[limit])
+
+            self.metrics["decisions"] += 1
+            self.metrics["last_batch_size"] = size
+            self.metrics["last_limit"] = limit
+            self.metrics["total_requested"] += size
+            return size
+
+    def observe_sign(self, latency: float):
+        """Учитывает измеренную задержку подписи блока"""
+        with self.lock:
+            self._sign_latency = self._ewma(self._sign_latency, latency)
+
+    def observe_build(self, latency: float, tx_count: int):
+        """Учитывает задержку сборки/вставки блока из tx_count транзакций"""
+        if tx_count <= 0:
+            return
+        with self.lock:
+            self._per_tx_cost = self._ewma(self._per_tx_cost, latency / tx_count)
+
+    def get_metrics(self) -> Dict:
+        with self.lock:
+            metrics = dict(self.metrics)
+            metrics["sign_latency"] = self._sign_latency
+            metrics["per_tx_cost"] = self._per_tx_cost
+            metrics["time_limit"] = self._time_limit()
+            decisions = metrics["decisions"]
+            metrics["avg_batch_size"] = metrics["total_requested"] / decisions if decisions else 0.0
+            return metrics
+
+    def _time_limit(self) -> int:
+        if not self._per_tx_cost:
+            return self.initial_batch
+        # Подписи идут параллельно, поэтому интервал блока - не меньше их доли
+        interval = self.block_time
+        if self._sign_latency is not None:
+            interval = max(interval, self._sign_latency / self.sign_workers)
+        # Стадии сборки и вставки общие для всех шардов-производителей
+        budget = interval * self.target_utilization / self.producers
+        return int(budget / self._per_tx_cost)
+
+    def _ewma(self, current, sample: float) -> float:
+        if current is None:
+            return sample
+        return current + self.smoothing * (sample - current)
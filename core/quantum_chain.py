@@ -5,7 +5,9 @@ import os
 from typing import List, Dict, Optional
 
 # Импорты из пакета
-from . import crypto, transactions, dag, consensus, network, monitoring
+from . import crypto, transactions, dag, consensus, network, monitoring, storage
+from .block_pipeline import BlockProductionPipeline
+from .block_sizer import BlockSizeController
 
 class QuantumSecureHyperChain:
     def __init__(self, config_path: str = "config/network_config.json"):
@@ -14,22 +16,47 @@ class QuantumSecureHyperChain:
         
         # Инициализация компонентов
         self.crypto = crypto.QuantumCrypto()
-        self.transactions_pool = transactions.TransactionPool()
-        self.dag_shards = [dag.DAGShard(shard_id=i) for i in range(self.sharding_factor)]
-        self.validators = consensus.ValidatorManager(self.min_stake)
+        self.journal = (storage.StateJournal(os.path.join(self.data_dir, "state"))
+                        if self.data_dir else None)
+        self.transactions_pool = transactions.ShardedTransactionPool(
+            self.sharding_factor, journal=self.journal)
+        self.dag_shards = [self._create_shard(i) for i in range(self.sharding_factor)]
+        self.validators = consensus.ValidatorManager(self.min_stake, journal=self.journal)
         self.network = network.P2PNetwork(self.port)
+        self.network.on_blocks = self.receive_blocks
+        self.network.on_transactions = self.receive_transactions
+        self.network.mempool_view = (
+            lambda shard_id: self.transactions_pool.get_shard_pool(shard_id).iter_transactions())
         self.monitor = monitoring.ThreatDetector(penalty_pool=self.transactions_pool)
+        self.block_pipeline = BlockProductionPipeline(self)
+        self.dag_sync = dag.DAGSyncEngine(self.dag_shards, validate=self.validate_incoming_blocks)
+        self.sync_peers: List = []
+        self.block_sizer = BlockSizeController(
+            self.block_time,
+            producers=self.sharding_factor,
+            sign_workers=self.block_pipeline.sign_workers,
+            max_block_bytes=self.max_block_bytes,
+            max_block_gas=self.max_block_gas,
+            max_batch=self.max_block_transactions
+        )
         
         # DPoQS специфичные атрибуты
         self.validator_performance = {}
         self.propagation_times = {}
         self.block_times = {}
         
-        # Локи для потокобезопасности
-        self.pool_lock = threading.Lock()
-        self.shard_lock = threading.Lock()
+        # Локи для потокобезопасности (пул и шарды блокируются по партициям)
         self.validator_lock = threading.Lock()
         
+        # Расписание лидеров текущей эпохи (перестраивается на границе эпох)
+        self.leader_schedule = None
+        self.schedule_lock = threading.Lock()
+        
+        # Восстановление мемпула, стейков и репутации: снапшот + хвост журнала
+        if self.journal:
+            self.journal.recover(self.transactions_pool, self.validators,
+                                 self.validators.reputation_system)
+        
         # Запуск процессов
         self.start_background_services()
 
@@ -42,7 +69,20 @@ class QuantumSecureHyperChain:
             "min_stake": 100_000,
             "port": 8000,
             "max_validators": 100,
-            "reputation_update_interval": 60
+            "reputation_update_interval": 60,
+            "data_dir": "data/chain",
+            "hot_window_blocks": 10_000,
+            "snapshot_interval": 300,
+            "max_block_bytes": 8 * 1024 * 1024,
+            "max_block_gas": 2_000_000_000,
+            "max_block_transactions": 200_000,
+            "max_block_parents": 8,
+            "tip_selection": "oldest_first",
+            "finality_depth": 1_000,
+            "checkpoint_interval": 256,
+            "slots_per_epoch": 7_200,
+            "genesis_epoch": 0,  # Эпоха запуска сети: отсчёт высот для seed расписания
+            "sync_interval": 10
         }
         
         if os.path.exists(config_path):
@@ -58,168 +98,247 @@ class QuantumSecureHyperChain:
             print("Конфиг-файл не найден. Используем defaults.")
             self.__dict__.update(defaults)
 
+    def _create_shard(self, shard_id: int):
+        """Создаёт шард с сегментным хранилищем на диске (если задан data_dir)"""
+        options = {
+            "max_parents": self.max_block_parents,
+            "tip_selection": self.tip_selection,
+            "finality_depth": self.finality_depth,
+            "checkpoint_interval": self.checkpoint_interval,
+        }
+        if not self.data_dir:
+            return dag.DAGShard(shard_id=shard_id, **options)
+        store = storage.SegmentBlockStore(os.path.join(self.data_dir, f"shard_{shard_id}"))
+        return dag.DAGShard(shard_id=shard_id, store=store, hot_window=self.hot_window_blocks,
+                            **options)
+
     def start_background_services(self):
         """Запуск фоновых сервисов DPoQS"""
-        threading.Thread(target=self.block_creation_loop, daemon=True).start()
+        self.network.start()
+        # Конвейер производства блоков: все шарды производят блоки одновременно
+        self.block_pipeline.start()
         threading.Thread(target=self.dag_synchronization, daemon=True).start()
         threading.Thread(target=self.uptime_monitoring, daemon=True).start()
         threading.Thread(target=self.reputation_update_loop, daemon=True).start()
         threading.Thread(target=lambda: self.monitor.start(), daemon=True).start()
+        if self.journal:
+            threading.Thread(target=self.snapshot_loop, daemon=True).start()
 
-    def block_creation_loop(self):
-        """Основной цикл создания блоков"""
+    def snapshot_loop(self):
+        """Периодический снапшот состояния с обрезкой журнала"""
         while True:
             try:
-                self.create_block()
-                time.sleep(self.block_time)
+                time.sleep(self.snapshot_interval)
+                self.journal.snapshot(self.transactions_pool, self.validators,
+                                      self.validators.reputation_system)
             except Exception as e:
-                print(f"Error in block creation: {e}")
-                time.sleep(1)
+                print(f"Snapshot error: {e}")
 
-    def select_shard(self, transaction_hash: str = None):
+    def select_shard(self, sender: str = None):
         """Выбор шарда для нового блока"""
-        if transaction_hash:
-            # Детерминированный выбор на основе хэша транзакции
-            shard_index = int(transaction_hash[:8], 16) % self.sharding_factor
+        if sender:
+            # Шард, партиция пула которого хранит транзакции отправителя
+            shard_index = self.transactions_pool.shard_for(sender)
         else:
             # Случайный выбор для пустых блоков
             import random
             shard_index = random.randint(0, self.sharding_factor - 1)
         
-        with self.shard_lock:
-            return self.dag_shards[shard_index]
+        return self.dag_shards[shard_index]
 
-    def create_block(self):
-        """Создание блока через DPoQS консенсус"""
-        shard = self.select_shard()
-        
-        with self.pool_lock:
-            transactions_list = self.transactions_pool.get_batch(10)
+    def create_block(self, shard=None):
+        """Создание одного блока через DPoQS консенсус (последовательно, вне конвейера)"""
+        if shard is None:
+            shard = self.select_shard()
         
-        # Выбор валидатора через DPoQS
-        validator = self.validators.select_validator()
+        # Лидер текущего слота шарда по расписанию DPoQS (до извлечения транзакций)
+        validator = self.leader_for(shard, self.current_slot())
         
         if not validator:
-            print("No active validators available for block creation")
+            print("No active leader for the current slot")
             return
         
+        # Берём транзакции только из партиции пула этого шарда
+        build_started = time.perf_counter()
+        transactions_list = self.take_batch(shard)
+        
         # Создаем блок
         block = dag.DAGBlock(
             shard_id=shard.shard_id,
             transactions=transactions_list,
             miner=validator.address,
-            previous_hashes=shard.get_tips()
+            previous_hashes=shard.select_parents()
         )
         
+        build_time = time.perf_counter() - build_started
+        
         # Подписываем блок
         start_time = time.time()
+        sign_started = time.perf_counter()
         try:
             block.add_signature("sphincs", 
-                self.crypto.sign(block.hash.encode(), validator.sphincs_sk, "sphincs"))
+                self.crypto.sign(block.signing_bytes(), validator.sphincs_sk, "sphincs"))
             block.add_signature("ntru", 
-                self.crypto.sign(block.hash.encode(), validator.ntru_sk, "ntru"))
+                self.crypto.sign(block.signing_bytes(), validator.ntru_sk, "ntru"))
         except Exception as e:
             print(f"Block signing error: {e}")
             return
+        self.block_sizer.observe_sign(time.perf_counter() - sign_started)
         
-        # Добавляем в DAG
-        with self.shard_lock:
-            if shard.add_block(block):
-                propagation_time = time.time() - start_time
-                
-                # Записываем метрики качества блока в DPoQS
-                self.validators.record_block_creation(
-                    validator.address, 
-                    block.hash, 
-                    True,  # accepted
-                    propagation_time
-                )
-                
-                # Сохраняем время для метрик
-                self.propagation_times[block.hash] = propagation_time
-                self.block_times[block.hash] = time.time()
-                
-                # Вознаграждаем валидатора
-                self.validators.reward_validator(validator.address, 10)
-                
-                # Broadcast блока
-                self.network.broadcast_block(block)
-                
-                print(f"Block {block.hash[:16]} created by {validator.address[:16]} "
-                      f"in shard {shard.shard_id}, propagation: {propagation_time:.3f}s")
+        insert_started = time.perf_counter()
+        committed = self.commit_block(shard, block, validator, start_time)
+        build_time += time.perf_counter() - insert_started
+        self.block_sizer.observe_build(build_time, len(transactions_list))
+        if committed:
+            # Broadcast блока
+            self.network.broadcast_block(block)
+
+    def current_slot(self) -> int:
+        return int(time.time() / self.block_time)
+
+    def leader_for(self, shard, slot: int):
+        """Лидер слота шарда: индекс в расписании эпохи (None - слот пропускается)"""
+        schedule = self.leader_schedule
+        if schedule is None or not schedule.covers(slot):
+            schedule = self._rebuild_schedule(slot // self.slots_per_epoch)
+            if schedule is None:
+                return None
+        validator = schedule.leader(shard.shard_id, slot)
+        # Лидер ушёл в оффлайн посреди эпохи: слот пропускается
+        return validator if validator.is_active else None
+
+    def _rebuild_schedule(self, epoch: int):
+        with self.schedule_lock:
+            schedule = self.leader_schedule
+            if schedule is not None and schedule.epoch == epoch:
+                return schedule
+            # Seed - финализированные хэши шардов на высоте, заданной номером эпохи
+            seed = consensus.epoch_seed(self.dag_shards, epoch - self.genesis_epoch,
+                                        self.slots_per_epoch, self.finality_depth)
+            schedule = self.validators.build_schedule(epoch, seed, self.sharding_factor,
+                                                      self.slots_per_epoch)
+            self.leader_schedule = schedule
+            return schedule
+
+    def take_batch(self, shard) -> List:
+        """Извлекает из партиции шарда пакет размера, выбранного block_sizer"""
+        depth = self.transactions_pool.get_shard_pool(shard.shard_id).get_pool_size()
+        size = self.block_sizer.next_batch_size(depth)
+        return self.transactions_pool.get_batch(shard.shard_id, size, self.max_block_bytes)
+
+    def commit_block(self, shard, block: dag.DAGBlock, validator, start_time: float) -> bool:
+        """Добавляет подписанный блок в DAG и обновляет метрики DPoQS"""
+        # Добавляем в DAG (шард блокируется сам)
+        if not shard.add_block(block):
+            return False
+        
+        propagation_time = time.time() - start_time
+        
+        # Записываем метрики качества блока в DPoQS
+        self.validators.record_block_creation(
+            validator.address, 
+            block.hash, 
+            True,  # accepted
+            propagation_time
+        )
+        
+        # Сохраняем время для метрик
+        self.propagation_times[block.hash] = propagation_time
+        self.block_times[block.hash] = time.time()
+        
+        # Вознаграждаем валидатора
+        self.validators.reward_validator(validator.address, 10)
+        
+        print(f"Block {block.hash[:16]} created by {validator.address[:16]} "
+              f"in shard {shard.shard_id}, propagation: {propagation_time:.3f}s")
+        return True
 
     def validate_incoming_block(self, block: dag.DAGBlock) -> bool:
         """Валидация входящего блока с учётом DPoQS"""
-        try:
+        return self.validate_incoming_blocks([block])[0]
+
+    def validate_incoming_blocks(self, blocks: List[dag.DAGBlock]) -> List[bool]:
+        """Пакетная валидация входящих блоков (например, бэклог синхронизации с пиром).
+
+        Подписи SPHINCS+ и NTRU всех блоков проверяются одним пакетом
+        параллельно в пуле процессов.
+        """
+        results = [False] * len(blocks)
+        items = []
+        positions = []  # Индекс блока для каждой пары подписей в items
+        for i, block in enumerate(blocks):
             # Получаем публичный ключ валидатора
             validator_pk = self.get_validator_public_key(block.miner)
             if not validator_pk:
                 print(f"Unknown validator: {block.miner}")
-                return False
-            
-            # Проверяем подписи
-            sphincs_valid = self.crypto.verify(
-                block.hash.encode(),
-                block.signatures.get("sphincs", b""),
-                validator_pk,
-                "sphincs"
-            )
+                continue
+            message = block.signing_bytes()
+            for algorithm in ("sphincs", "ntru"):
+                items.append((message, block.signatures.get(algorithm, b""), validator_pk, algorithm))
+            positions.append(i)
+        
+        try:
+            # Для одиночного блока прекращаем проверку на первой неверной подписи
+            verified = self.crypto.verify_batch(items, short_circuit=len(positions) == 1)
+        except Exception as e:
+            print(f"Block validation error: {e}")
+            return results
+        
+        for n, i in enumerate(positions):
+            block = blocks[i]
+            sphincs_valid, ntru_valid = verified[2 * n], verified[2 * n + 1]
             
-            if not sphincs_valid:
+            if sphincs_valid is False:
                 print(f"Invalid SPHINCS signature for block {block.hash[:16]}")
                 self.validators.penalize_validator(
                     block.miner, 
                     "Invalid SPHINCS signature", 
                     0.05
                 )
-                return False
+                continue
             
-            # Проверяем NTRU подпись
-            ntru_valid = self.crypto.verify(
-                block.hash.encode(),
-                block.signatures.get("ntru", b""),
-                validator_pk,
-                "ntru"
-            )
-            
-            if not ntru_valid:
+            if ntru_valid is False:
                 print(f"Invalid NTRU signature for block {block.hash[:16]}")
                 self.validators.penalize_validator(
                     block.miner, 
                     "Invalid NTRU signature", 
                     0.05
                 )
-                return False
+                continue
             
             # Обновляем метрики валидатора
             propagation_time = self.propagation_times.get(block.hash, 1.0)
             self.validators.record_block_creation(
                 block.miner, block.hash, True, propagation_time
             )
-            
-            return True
-            
-        except Exception as e:
-            print(f"Block validation error: {e}")
-            return False
+            results[i] = True
+        
+        return results
 
     def get_validator_public_key(self, validator_address: str):
         """Получает публичный ключ валидатора"""
-        with self.validator_lock:
-            for validator in self.validators.validators:
-                if validator.address == validator_address:
-                    # В реальной реализации здесь будет получение публичного ключа
-                    # Для демо возвращаем заглушку
-                    return f"public_key_{validator_address}"
+        if self.validators.get_validator(validator_address) is not None:
+            # В реальной реализации здесь будет получение публичного ключа
+            # Для демо возвращаем заглушку
+            return f"public_key_{validator_address}"
         return None
 
+    def add_sync_peer(self, peer):
+        """Регистрирует пира синхронизации (get_checkpoints/get_ranges, см. dag.LocalSyncPeer)"""
+        self.sync_peers.append(peer)
+
     def dag_synchronization(self):
-        """Синхронизация DAG между шардами"""
+        """Синхронизация шардов DAG с пирами по контрольным дайджестам"""
         while True:
             try:
-                # В реальной реализации здесь будет сложная логика синхронизации
-                # между шардами и нодами
-                time.sleep(10)
+                for peer in list(self.sync_peers):
+                    added = self.dag_sync.sync_with(peer)
+                    if getattr(peer, "peer_id", None) in self.dag_sync.banned_peers:
+                        self.sync_peers.remove(peer)  # Прислал блоки с подменённым телом
+                    if added:
+                        print(f"Synchronized {added} blocks from peer "
+                              f"{getattr(peer, 'peer_id', peer)}")
+                time.sleep(self.sync_interval)
             except Exception as e:
                 print(f"DAG synchronization error: {e}")
                 time.sleep(30)
@@ -232,7 +351,7 @@ class QuantumSecureHyperChain:
                 current_time = time.time()
                 
                 for shard in self.dag_shards:
-                    recent_blocks = shard.blocks[-5:]  # Последние 5 блоков
+                    recent_blocks = shard.get_recent_blocks(5)  # Последние 5 блоков
                     for block in recent_blocks:
                         validator = block.miner
                         # Считаем валидатора онлайн если он создал блок в последние 5 минут
@@ -260,6 +379,8 @@ class QuantumSecureHyperChain:
                         bandwidth_usage=500
                     )
                 
+                # Такт пакетного пересчёта score всех валидаторов
+                self.validators.reputation_system.recalculate_all()
                 time.sleep(self.reputation_update_interval)
                 
             except Exception as e:
@@ -267,14 +388,36 @@ class QuantumSecureHyperChain:
                 time.sleep(300)
 
     def add_transaction(self, transaction):
-        """Добавление транзакции в пул"""
-        with self.pool_lock:
+        """Добавление транзакции в партицию пула её шарда и её рассылка пирам"""
+        admitted = self.transactions_pool.add_transaction(transaction)
+        if admitted:
+            self.network.broadcast_transaction(transaction)
+        return admitted
+
+    def receive_transactions(self, transactions_list: List):
+        """Пачка транзакций из gossip (уже разосланных дальше сетевым слоем)"""
+        for transaction in transactions_list:
             self.transactions_pool.add_transaction(transaction)
 
+    def receive_blocks(self, blocks: List[dag.DAGBlock]):
+        """Пачка блоков из gossip: пакетная проверка подписей и вставка в шарды"""
+        # Родители созданы раньше потомков: вставляем по времени создания
+        blocks = sorted(blocks, key=lambda b: b.timestamp_ns)
+        verdicts = self.validate_incoming_blocks(blocks)
+        included = []
+        for block, valid in zip(blocks, verdicts):
+            if valid and 0 <= block.shard_id < self.sharding_factor:
+                if self.dag_shards[block.shard_id].add_block(block):
+                    included.extend(tx.hash for tx in block.transactions)
+        # Транзакции из чужих блоков не должны повторно попасть в свои
+        if included:
+            self.transactions_pool.remove_transactions(included)
+
     def get_blockchain_stats(self) -> Dict:
         """Возвращает статистику блокчейна"""
-        total_blocks = sum(len(shard.blocks) for shard in self.dag_shards)
-        total_transactions = sum(len(shard.get_all_transactions()) for shard in self.dag_shards)
+        shard_stats = [shard.get_shard_stats() for shard in self.dag_shards]
+        total_blocks = sum(stats["block_count"] for stats in shard_stats)
+        total_transactions = sum(stats["transaction_count"] for stats in shard_stats)
         
         active_validators = len([v for v in self.validators.validators if v.is_active])
         total_validators = len(self.validators.validators)
@@ -285,7 +428,9 @@ class QuantumSecureHyperChain:
             "active_validators": active_validators,
             "total_validators": total_validators,
             "sharding_factor": self.sharding_factor,
-            "tps_target": self.tps_target
+            "tps_target": self.tps_target,
+            "block_sizing": self.block_sizer.get_metrics(),
+            "reputation_ingest": self.validators.reputation_system.ingest.get_stats()
         }
 
     def get_validator_info(self, validator_address: str) -> Optional[Dict]:
@@ -1,8 +1,48 @@
-ffrom typing import Tuple
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import List, Optional, Sequence, Tuple
 from pqcrypto.sign import sphincs_sha3_512fs_simple
 from pqcrypto.sign import falcon_512
+from .verify_cache import VerificationCache
+
+# Элемент пакетной проверки: (message, signature, public_key, algorithm)
+VerifyItem = Tuple[bytes, bytes, object, str]
+
+
+def _verify_signature(message: bytes, signature: bytes, public_key, algorithm: str) -> bool:
+    try:
+        if algorithm == "sphincs":
+            sphincs_sha3_512fs_simple.verify(message, signature, public_key)
+        elif algorithm == "ntru":
+            falcon_512.verify(message, signature, public_key)
+        else:
+            return False  # Неизвестный алгоритм не считается проверенным
+        return True
+    except:
+        return False
+
+
+def _verify_chunk(items: Sequence[VerifyItem]) -> List[bool]:
+    """Проверка части пакета в процессе-воркере"""
+    return [_verify_signature(*item) for item in items]
+
+
+def _sign_message(message: bytes, private_key, algorithm: str) -> bytes:
+    """Подпись в процессе-воркере"""
+    return QuantumCrypto.sign(message, private_key, algorithm)
+
 
 class QuantumCrypto:
+    def __init__(self, max_workers: Optional[int] = None, verify_cache_size: int = 100_000):
+        # Вызовы pqcrypto держат GIL, поэтому пакетная проверка идёт в пуле процессов
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        
+        # Повторно пришедшие блоки (дубликаты gossip, ресинк) не проверяем заново
+        self.verify_cache = VerificationCache(verify_cache_size)
+
     @staticmethod
     def generate_keypair(algorithm: str) -> Tuple[object, object]:
         if algorithm == "sphincs":
@@ -23,13 +63,80 @@ class QuantumCrypto:
         else:
             raise ValueError("Unsupported algorithm")
 
-    @staticmethod
-    def verify(message: bytes, signature: bytes, public_key, algorithm: str) -> bool:
-        try:
-            if algorithm == "sphincs":
-                sphincs_sha3_512fs_simple.verify(message, signature, public_key)
-            elif algorithm == "ntru":
-                falcon_512.verify(message, signature, public_key)
+    def sign_async(self, message: bytes, private_key, algorithm: str) -> Future:
+        """Подписывает в пуле процессов; позволяет подписывать обоими алгоритмами параллельно"""
+        return self._get_executor().submit(_sign_message, message, private_key, algorithm)
+
+    def verify(self, message: bytes, signature: bytes, public_key, algorithm: str) -> bool:
+        key = self.verify_cache.make_key(message, signature, public_key, algorithm)
+        if self.verify_cache.contains(key):
             return True
-        except:
-            return False
+        valid = _verify_signature(message, signature, public_key, algorithm)
+        if valid:
+            self.verify_cache.add(key)
+        return valid
+
+    def verify_batch(self, items: Sequence[VerifyItem],
+                     short_circuit: bool = False) -> List[Optional[bool]]:
+        """Проверяет пакет подписей параллельно на всех ядрах.
+
+        Возвращает результат для каждого элемента. При short_circuit=True
+        после первой неверной подписи оставшиеся части отменяются, а их
+        элементы получают None (не проверены).
+        """
+        results: List[Optional[bool]] = [None] * len(items)
+        
+        # Уже проверенные подписи берём из кэша, в пул уходят только промахи
+        keys = [self.verify_cache.make_key(*item) for item in items]
+        misses = []
+        for i, key in enumerate(keys):
+            if self.verify_cache.contains(key):
+                results[i] = True
+            else:
+                misses.append(i)
+        if not misses:
+            return results
+        if len(misses) == 1:
+            i = misses[0]
+            results[i] = _verify_signature(*items[i])
+            if results[i]:
+                self.verify_cache.add(keys[i])
+            return results
+
+        # Несколько частей на воркер сглаживают разброс времени проверки
+        chunk_size = max(1, -(-len(misses) // (self.max_workers * 4)))
+        executor = self._get_executor()
+        pending = {}
+        for start in range(0, len(misses), chunk_size):
+            indexes = misses[start:start + chunk_size]
+            chunk = [items[i] for i in indexes]
+            pending[executor.submit(_verify_chunk, chunk)] = indexes
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            failed = False
+            for future in done:
+                indexes = pending.pop(future)
+                for i, valid in zip(indexes, future.result()):
+                    results[i] = valid
+                    if valid:
+                        self.verify_cache.add(keys[i])
+                    else:
+                        failed = True
+            if failed and short_circuit:
+                for future in pending:
+                    future.cancel()
+                break
+        return results
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
@@ -0,0 +1,73 @@
+import hashlib
+import struct
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+_LENGTH = struct.Struct(">I")
+
+
+def _as_bytes(value) -> bytes:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    return str(value).encode()
+
+
+class VerificationCache:
+    """Ограниченный LRU-кэш успешных проверок подписей.
+
+    Ключ - SHA3-256 от (algorithm, message, signature, public_key) с
+    префиксами длины. Хранятся только положительные результаты, поэтому
+    подделка не может "закэшироваться". Потокобезопасен.
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, None]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(message: bytes, signature: bytes, public_key, algorithm: str) -> bytes:
+        digest = hashlib.sha3_256()
+        for part in (algorithm.encode(), _as_bytes(message), _as_bytes(signature),
+                     _as_bytes(public_key)):
+            digest.update(_LENGTH.pack(len(part)))
+            digest.update(part)
+        return digest.digest()
+
+    def contains(self, key: bytes) -> bool:
+        """Проверяет наличие ключа и обновляет счётчики попаданий/промахов"""
+        with self.lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def add(self, key: bytes):
+        """Запоминает успешную проверку, вытесняя самые старые записи"""
+        with self.lock:
+            self._entries[key] = None
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
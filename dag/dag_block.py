@@ -1,7 +1,25 @@
 import hashlib
-import json
+import struct
 import time
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+
+from transactions.transaction import Transaction
+from .merkle import MerkleTree, ProofStep
+
+# Формат бинарной кодировки блока (хранение на диске и передача по сети)
+BLOCK_ENCODING_VERSION = 2
+
+# Заголовок: version, shard_id, merkle_root, timestamp_ns | miner | nonce, parent_count | parents
+_HEADER_PREFIX = struct.Struct(">BH32sq")
+_HEADER_TAIL = struct.Struct(">QH")
+_U8 = struct.Struct(">B")
+_U16 = struct.Struct(">H")
+_U32 = struct.Struct(">I")
+
+# Поля заголовка: их изменение сбрасывает закэшированные заголовок, хэш и to_dict.
+# previous_hashes отслеживается только при присваивании, не при изменении списка на месте
+_HEADER_FIELDS = frozenset(("shard_id", "merkle_root", "timestamp_ns", "miner", "nonce",
+                            "previous_hashes"))
 
 class DAGBlock:
     def __init__(self, shard_id: int, transactions: List, miner: str, previous_hashes: List[str]):
@@ -9,54 +27,182 @@ class DAGBlock:
         self.transactions = transactions
         self.miner = miner
         self.previous_hashes = previous_hashes
-        self.timestamp = time.time()
+        self.timestamp_ns = time.time_ns()
         self.signatures: Dict[str, bytes] = {}
-        self.merkle_root = self._calculate_merkle_root()
-        self.hash = self._calculate_hash()
         self.nonce = 0  # Для PoW варианта, если понадобится
+        self._merkle_tree: Optional[MerkleTree] = None
+        self.merkle_root = self._calculate_merkle_root()
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in _HEADER_FIELDS:
+            object.__setattr__(self, "_header", None)
+            object.__setattr__(self, "_hash", None)
+            object.__setattr__(self, "_dict", None)
+
+    @property
+    def timestamp(self) -> float:
+        """Время создания блока в секундах (в заголовке хранится timestamp_ns)"""
+        return self.timestamp_ns / 1e9
+
+    @timestamp.setter
+    def timestamp(self, value: float):
+        self.timestamp_ns = round(value * 1e9)
+
+    @property
+    def hash(self) -> str:
+        block_hash = self._hash
+        if block_hash is None:
+            block_hash = hashlib.sha3_256(self.header_bytes()).hexdigest()
+            object.__setattr__(self, "_hash", block_hash)
+        return block_hash
+
+    def header_bytes(self) -> bytes:
+        """Бинарный заголовок блока: его хэш - хэш блока, его же подписывают валидаторы"""
+        header = self._header
+        if header is None:
+            miner = self.miner.encode()
+            parts = [
+                _HEADER_PREFIX.pack(BLOCK_ENCODING_VERSION, self.shard_id,
+                                    bytes.fromhex(self.merkle_root), self.timestamp_ns),
+                _U16.pack(len(miner)), miner,
+                _HEADER_TAIL.pack(self.nonce, len(self.previous_hashes)),
+            ]
+            parts.extend(bytes.fromhex(h) for h in self.previous_hashes)
+            header = b"".join(parts)
+            object.__setattr__(self, "_header", header)
+        return header
+
+    def signing_bytes(self) -> bytes:
+        return self.header_bytes()
+
+    @property
+    def merkle_tree(self) -> MerkleTree:
+        """Дерево Меркла транзакций (для декодированных блоков строится лениво)"""
+        if self._merkle_tree is None:
+            self._merkle_tree = MerkleTree([tx.hash for tx in self.transactions])
+        return self._merkle_tree
 
     def _calculate_merkle_root(self) -> str:
-        if not self.transactions:
-            return "0" * 64
-        
-        tx_hashes = [tx.hash for tx in self.transactions]
-        
-        # Простой Merkle tree calculation
-        while len(tx_hashes) > 1:
-            new_hashes = []
-            for i in range(0, len(tx_hashes), 2):
-                if i + 1 < len(tx_hashes):
-                    combined = tx_hashes[i] + tx_hashes[i + 1]
-                else:
-                    combined = tx_hashes[i] + tx_hashes[i]
-                
-                new_hash = hashlib.sha3_256(combined.encode()).hexdigest()
-                new_hashes.append(new_hash)
-            tx_hashes = new_hashes
-        
-        return tx_hashes[0] if tx_hashes else "0" * 64
-
-    def _calculate_hash(self) -> str:
-        data = {
-            "shard_id": self.shard_id,
-            "merkle_root": self.merkle_root,
-            "timestamp": self.timestamp,
-            "previous_hashes": self.previous_hashes,
-            "miner": self.miner,
-            "nonce": self.nonce
-        }
-        return hashlib.sha3_256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+        return self.merkle_tree.root
+
+    def get_merkle_proof(self, tx_hash: str) -> Optional[List[ProofStep]]:
+        """Доказательство включения транзакции в merkle_root блока"""
+        return self.merkle_tree.get_proof(tx_hash)
+
+    def verify_merkle_proof(self, tx_hash: str, proof: List[ProofStep]) -> bool:
+        return MerkleTree.verify_proof(tx_hash, proof, self.merkle_root)
 
     def add_signature(self, algorithm: str, signature: bytes):
         self.signatures[algorithm] = signature
 
     def to_dict(self) -> Dict:
-        return {
-            "hash": self.hash,
-            "shard_id": self.shard_id,
-            "miner": self.miner,
-            "timestamp": self.timestamp,
-            "transaction_count": len(self.transactions),
-            "previous_hashes": self.previous_hashes,
-            "merkle_root": self.merkle_root
-        }
+        cached = self._dict
+        if cached is None:
+            cached = {
+                "hash": self.hash,
+                "shard_id": self.shard_id,
+                "miner": self.miner,
+                "timestamp": self.timestamp,
+                "transaction_count": len(self.transactions),
+                "previous_hashes": list(self.previous_hashes),
+                "merkle_root": self.merkle_root
+            }
+            object.__setattr__(self, "_dict", cached)
+        return dict(cached)
+
+    def to_bytes(self) -> bytes:
+        """Сериализует блок: заголовок, транзакции и подписи"""
+        parts = [self.header_bytes(), _U32.pack(len(self.transactions))]
+        parts.extend(tx.to_bytes() for tx in self.transactions)
+        parts.append(_U8.pack(len(self.signatures)))
+        for algorithm in sorted(self.signatures):
+            name = algorithm.encode()
+            signature = self.signatures[algorithm]
+            parts.extend((_U16.pack(len(name)), name, _U32.pack(len(signature)), signature))
+        return b"".join(parts)
+
+    @classmethod
+    def decode_header(cls, data, offset: int = 0) -> Tuple["DAGBlock", int]:
+        """Декодирует заголовок (без транзакций и подписей) начиная с offset.
+
+        Возвращает блок и смещение за концом заголовка; байты заголовка
+        сохраняются, поэтому хэш не требует повторного кодирования.
+        """
+        view = memoryview(data)
+        try:
+            version, shard_id, merkle_root, timestamp_ns = _HEADER_PREFIX.unpack_from(view, offset)
+            if version != BLOCK_ENCODING_VERSION:
+                raise ValueError(f"Unsupported block encoding version: {version}")
+            start = offset
+            offset += _HEADER_PREFIX.size
+
+            miner, offset = cls._read_str(view, offset)
+            nonce, parent_count = _HEADER_TAIL.unpack_from(view, offset)
+            offset += _HEADER_TAIL.size
+        except struct.error as e:
+            raise ValueError(f"Truncated block header: {e}") from e
+        parents, offset = cls._read_bytes(view, offset, 32 * parent_count)
+        previous_hashes = [parents[32 * i:32 * (i + 1)].hex() for i in range(parent_count)]
+
+        block = cls.__new__(cls)
+        block.shard_id = shard_id
+        block.transactions = []
+        block.miner = miner
+        block.previous_hashes = previous_hashes
+        block.timestamp_ns = timestamp_ns
+        block.signatures = {}
+        block.nonce = nonce
+        block._merkle_tree = None
+        block.merkle_root = merkle_root.hex()
+        object.__setattr__(block, "_header", bytes(view[start:offset]))
+        return block, offset
+
+    @classmethod
+    def from_bytes(cls, data, verify_merkle: bool = True) -> "DAGBlock":
+        """Восстанавливает блок из результата to_bytes() (принимает bytes или memoryview).
+
+        Транзакции сверяются с merkle_root заголовка: иначе подменённое
+        тело под подлинным подписанным заголовком имело бы тот же хэш.
+        verify_merkle=False - только для данных из собственного хранилища.
+        """
+        view = memoryview(data)
+        block, offset = cls.decode_header(view)
+
+        try:
+            (tx_count,) = _U32.unpack_from(view, offset)
+            offset += _U32.size
+            transactions = []
+            for _ in range(tx_count):
+                tx, offset = Transaction.decode(view, offset)
+                transactions.append(tx)
+            block.transactions = transactions
+
+            (sig_count,) = _U8.unpack_from(view, offset)
+            offset += _U8.size
+            for _ in range(sig_count):
+                algorithm, offset = cls._read_str(view, offset)
+                (length,) = _U32.unpack_from(view, offset)
+                offset += _U32.size
+                block.signatures[algorithm], offset = cls._read_bytes(view, offset, length)
+        except struct.error as e:
+            raise ValueError(f"Truncated block: {e}") from e
+        if offset != len(view):
+            raise ValueError("Trailing bytes after block")
+        if verify_merkle and block.merkle_tree.root != block.merkle_root:
+            raise ValueError(f"Merkle root mismatch for block {block.hash[:16]}")
+        return block
+
+    @staticmethod
+    def _read_str(view: memoryview, offset: int) -> Tuple[str, int]:
+        (length,) = _U16.unpack_from(view, offset)
+        raw, offset = DAGBlock._read_bytes(view, offset + _U16.size, length)
+        return raw.decode(), offset
+
+    @staticmethod
+    def _read_bytes(view: memoryview, offset: int, length: int) -> Tuple[bytes, int]:
+        """Срез длины length; ValueError, если буфер короче префикса длины"""
+        end = offset + length
+        if end > len(view):
+            raise ValueError(f"Truncated field: need {length} bytes at offset {offset}")
+        return bytes(view[offset:end]), end
@@ -1,64 +1,504 @@
+import heapq
+import random
 import threading
-from typing import List, Set
+from collections import Counter, OrderedDict
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
 from .dag_block import DAGBlock
+from .merkle import MerkleTree
+
+# Отсортированный по времени прогон: (хэши, timestamps, начало, конец)
+Run = Tuple[List[str], Optional[List[float]], int, int]
+
+
+class BlockRange:
+    """Ленивое представление диапазона блоков шарда без копирования списка.
+
+    Состоит из срезов отсортированных прогонов, актуальных на момент
+    запроса: прогоны не меняются на месте (основной только дополняется
+    в конец), поэтому диапазон остаётся согласованным и итерируется без
+    блокировки шарда. Несколько прогонов сливаются по времени при обходе.
+    Блоки разрешаются по хэшу при обращении (из памяти или с диска).
+    """
+
+    def __init__(self, runs: List[Run], resolve: Callable[[str], Optional[DAGBlock]]):
+        self._runs = [run for run in runs if run[3] > run[2]]
+        self._resolve = resolve
+        self._merged: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return sum(stop - start for _, _, start, stop in self._runs)
+
+    def __iter__(self) -> Iterator[DAGBlock]:
+        resolve = self._resolve
+        for block_hash in self._iter_hashes():
+            yield resolve(block_hash)
+
+    def __getitem__(self, index: int) -> DAGBlock:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("BlockRange index out of range")
+        if len(self._runs) == 1:
+            order, _, start, _ = self._runs[0]
+            return self._resolve(order[start + index])
+        return self._resolve(self.hashes()[index])
+
+    def hashes(self) -> List[str]:
+        """Хэши блоков диапазона без загрузки самих блоков"""
+        if len(self._runs) == 1:
+            order, _, start, stop = self._runs[0]
+            return order[start:stop]
+        if self._merged is None:
+            self._merged = list(self._iter_hashes())
+        return list(self._merged)
+
+    def _iter_hashes(self) -> Iterator[str]:
+        if len(self._runs) == 1:
+            order, _, start, stop = self._runs[0]
+            for i in range(start, stop):
+                yield order[i]
+            return
+        # При равном времени раньше идут блоки более старых прогонов
+        pairs = [_run_pairs(*run) for run in self._runs]
+        for _, block_hash in heapq.merge(*pairs, key=lambda pair: pair[0]):
+            yield block_hash
+
+
+def _run_pairs(order: List[str], timestamps: List[float], start: int,
+               stop: int) -> Iterator[Tuple[float, str]]:
+    for i in range(start, stop):
+        yield timestamps[i], order[i]
+
+
+TIP_SELECTION_STRATEGIES = ("oldest_first", "random_walk")
 
 class DAGShard:
-    def __init__(self, shard_id: int):
+    """Шард DAG с индексами по хэшу, высоте и времени.
+
+    Родители нового блока выбираются select_parents(): не больше
+    max_parents tips, самые старые первыми (так набор tips сходится) или
+    взвешенным случайным блужданием от недавнего блока к tips. При
+    заданном finality_depth тела блоков глубже этой высоты вытесняются
+    из памяти (остаются заголовки и индексы; с хранилищем тело читается
+    с диска), а отставшие tips перестают быть кандидатами в родители.
+    Для синхронизации шард публикует контрольные дайджесты: корень Меркла
+    над хэшами блоков каждого диапазона из checkpoint_interval высот.
+    Без хранилища диапазоны с вытесненными телами не публикуются и не
+    отдаются: шард может раздать только полные блоки.
+    """
+
+    def __init__(self, shard_id: int, store=None, hot_window: Optional[int] = None,
+                 max_parents: int = 8, tip_selection: str = "oldest_first",
+                 finality_depth: Optional[int] = None, walk_depth: int = 16,
+                 checkpoint_interval: int = 256):
+        if tip_selection not in TIP_SELECTION_STRATEGIES:
+            raise ValueError(f"Unknown tip selection strategy: {tip_selection}")
+        if finality_depth is not None and finality_depth < 1:
+            raise ValueError("finality_depth must be at least 1")
         self.shard_id = shard_id
-        self.blocks: List[DAGBlock] = []
+        self._order: List[str] = []  # Хэши блоков, упорядоченные по timestamp
+        self._timestamps: List[float] = []  # Параллельный список для бисекции
+        # Блоки, пришедшие не по порядку: отсортированные прогоны убывающей длины
+        self._late_runs: List[Tuple[List[float], List[str]]] = []
         self.tips: Set[str] = set()  # Хэши последних блоков
         self.lock = threading.Lock()
         
+        # Хранилище на диске (SegmentBlockStore) и размер горячего окна в памяти
+        self.store = store
+        self.hot_window = hot_window if store is not None else None
+        
+        # Выбор родителей и финализация
+        self.max_parents = max_parents
+        self.tip_selection = tip_selection
+        self.finality_depth = finality_depth
+        self.walk_depth = walk_depth
+        self._unpruned: List[Tuple[int, str]] = []  # Куча (высота, hash) блоков с телом в памяти
+        self._pruned_count = 0
+        self._pruned_height = -1  # Без хранилища: тела блоков до этой высоты утрачены
+        
+        # Индексы, поддерживаемые при вставке
+        self._index: Dict[str, DAGBlock] = OrderedDict()  # hash -> блок в памяти
+        self._locations: Dict = {}  # hash -> IndexEntry блока на диске
+        self._children: Dict[str, List[str]] = {}  # hash -> хэши дочерних блоков
+        self._heights: Dict[str, int] = {}  # hash -> высота в DAG (все известные блоки)
+        self._by_height: Dict[int, List[str]] = {}  # высота -> хэши блоков
+        self._max_height = -1
+        
+        # Контрольные дайджесты диапазонов высот; сбрасываются при вставке в диапазон
+        self.checkpoint_interval = checkpoint_interval
+        self._checkpoints: Dict[int, str] = {}
+        
+        # Счётчики статистики, обновляемые в add_block
+        self._transaction_count = 0
+        self._transaction_bytes = 0
+        self._miner_block_counts: Counter = Counter()
+        
+        if store is not None:
+            self._load_from_store()
+    
+    @property
+    def blocks(self) -> BlockRange:
+        """Все блоки шарда в порядке времени (ленивое представление)"""
+        return self.get_blocks_since(float("-inf"))
+    
+    def _load_from_store(self):
+        """Восстанавливает индексы, tips и счётчики по индексу сегментов без декодирования блоков"""
+        ordered = []
+        for entry in self.store.iter_index():
+            block_hash = entry.block_hash
+            self._locations[block_hash] = entry
+            self._heights[block_hash] = entry.height
+            self._by_height.setdefault(entry.height, []).append(block_hash)
+            if entry.height > self._max_height:
+                self._max_height = entry.height
+            for parent_hash in entry.parents:
+                if parent_hash in self._heights:
+                    self._children.setdefault(parent_hash, []).append(block_hash)
+            self.tips.difference_update(entry.parents)
+            self.tips.add(block_hash)
+            
+            self._transaction_count += entry.tx_count
+            self._transaction_bytes += entry.tx_bytes
+            self._miner_block_counts[entry.miner] += 1
+            ordered.append((entry.timestamp, block_hash))
+        
+        # Почти упорядоченный вход: timsort справляется за ~O(n)
+        ordered.sort(key=lambda item: item[0])
+        self._timestamps = [timestamp for timestamp, _ in ordered]
+        self._order = [block_hash for _, block_hash in ordered]
+        
     def add_block(self, block: DAGBlock) -> bool:
         """Добавляет блок в DAG шард"""
+        # Размер считаем до захвата блокировки
+        block_bytes = sum(tx.size for tx in block.transactions)
+        encoded = block.to_bytes() if self.store is not None else None
+        
         with self.lock:
-            # Проверяем, что блок ссылается на существующие tips
-            if not all(prev_hash in [b.hash for b in self.blocks] for prev_hash in block.previous_hashes):
-                if self.blocks:  # Если это не genesis блок
+            block_hash = block.hash
+            heights = self._heights
+            if block_hash in heights:
+                return False
+            
+            # Проверяем, что блок ссылается на существующие блоки
+            known_parents = [h for h in block.previous_hashes if h in heights]
+            if len(known_parents) != len(block.previous_hashes):
+                if heights:  # Если это не genesis блок
                     return False
             
-            # Добавляем блок
-            self.blocks.append(block)
+            # Высота = 1 + максимальная высота родителей
+            height = 1 + max((heights[h] for h in known_parents), default=-1)
+            
+            # Сначала пишем на диск: при ошибке записи состояние в памяти не меняется
+            if encoded is not None:
+                self._locations[block_hash] = self.store.append(
+                    block_hash, encoded, block.timestamp, height, known_parents,
+                    len(block.transactions), block_bytes, block.miner
+                )
+            
+            # Добавляем блок, сохраняя порядок по времени
+            self._insert_ordered(block_hash, block.timestamp)
+            self._cache_block(block_hash, block)
+            
+            heights[block_hash] = height
+            self._by_height.setdefault(height, []).append(block_hash)
+            self._checkpoints.pop(height - height % self.checkpoint_interval, None)
+            if height > self._max_height:
+                self._max_height = height
+            for parent_hash in known_parents:
+                self._children.setdefault(parent_hash, []).append(block_hash)
             
             # Обновляем tips
             self.tips.difference_update(block.previous_hashes)
             self.tips.add(block.hash)
             
+            # Обновляем счётчики статистики
+            self._transaction_count += len(block.transactions)
+            self._transaction_bytes += block_bytes
+            self._miner_block_counts[block.miner] += 1
+            
+            if self.finality_depth is not None:
+                heapq.heappush(self._unpruned, (height, block_hash))
+                self._prune_locked()
+            
             return True
     
+    def _prune_locked(self):
+        """Вытесняет тела блоков глубже finality_depth, оставляя заголовки и индексы.
+
+        Амортизированно O(log n) на блок: каждый блок извлекается из кучи один раз.
+        """
+        final_height = self._max_height - self.finality_depth
+        unpruned = self._unpruned
+        while unpruned and unpruned[0][0] <= final_height:
+            height, block_hash = heapq.heappop(unpruned)
+            # Финализированный tip больше не выбирается родителем
+            self.tips.discard(block_hash)
+            block = self._index.get(block_hash)
+            if block is None:
+                continue
+            if self.store is not None:
+                # Тело остаётся на диске и читается по требованию
+                del self._index[block_hash]
+            else:
+                # Подписи остаются: заголовок по-прежнему можно проверить
+                header = DAGBlock.decode_header(block.header_bytes())[0]
+                header.signatures = dict(block.signatures)
+                self._index[block_hash] = header
+                self._pruned_height = max(self._pruned_height, height)
+            self._pruned_count += 1
+    
+    def _insert_ordered(self, block_hash: str, timestamp: float):
+        """Вставка в упорядоченный по времени индекс.
+
+        Обычный случай (блок новее последнего) - O(1) append в основной
+        прогон. Блок из прошлого становится новым прогоном из одного
+        элемента; прогоны не длиннее нового сливаются с ним, как разряды
+        двоичного счётчика, поэтому каждый блок копируется O(log n) раз, а
+        прогонов не больше log n. Существующие списки не меняются на месте,
+        и уже выданные BlockRange остаются согласованными.
+        """
+        if not self._timestamps or timestamp >= self._timestamps[-1]:
+            self._order.append(block_hash)
+            self._timestamps.append(timestamp)
+            return
+        
+        timestamps, order = [timestamp], [block_hash]
+        runs = self._late_runs
+        while runs and len(runs[-1][0]) <= len(timestamps):
+            older_timestamps, older_order = runs.pop()
+            merged = list(heapq.merge(zip(older_timestamps, older_order), zip(timestamps, order),
+                                      key=lambda pair: pair[0]))
+            timestamps = [t for t, _ in merged]
+            order = [h for _, h in merged]
+        runs.append((timestamps, order))
+    
+    def _runs_between(self, start_time: float, end_time: float) -> List[Run]:
+        """Срезы всех прогонов с timestamp в [start_time, end_time) (под блокировкой)"""
+        runs = []
+        for timestamps, order in [(self._timestamps, self._order)] + self._late_runs:
+            start = bisect_left(timestamps, start_time)
+            stop = bisect_left(timestamps, end_time, lo=start)
+            runs.append((order, timestamps, start, stop))
+        return runs
+    
+    def _cache_block(self, block_hash: str, block: DAGBlock):
+        """Кладёт блок в горячее окно, вытесняя самые давно использованные"""
+        self._index[block_hash] = block
+        if self.hot_window is not None:
+            self._index.move_to_end(block_hash)
+            while len(self._index) > self.hot_window:
+                self._index.popitem(last=False)
+    
+    def _resolve(self, block_hash: str) -> Optional[DAGBlock]:
+        """Блок по хэшу: из памяти или, если вытеснен, из хранилища"""
+        with self.lock:
+            return self._get_block_locked(block_hash)
+    
+    def _get_block_locked(self, block_hash: str) -> Optional[DAGBlock]:
+        block = self._index.get(block_hash)
+        if block is not None:
+            if self.hot_window is not None:
+                self._index.move_to_end(block_hash)
+            return block
+        
+        entry = self._locations.get(block_hash)
+        if entry is None:
+            return None
+        block = DAGBlock.from_bytes(self.store.read(entry), verify_merkle=False)
+        self._cache_block(block_hash, block)
+        return block
+    
     def get_tips(self) -> List[str]:
         """Возвращает текущие tips DAG"""
         with self.lock:
             return list(self.tips)
     
-    def get_block(self, block_hash: str) -> DAGBlock:
+    def select_parents(self, max_parents: Optional[int] = None) -> List[str]:
+        """Выбирает не больше max_parents tips в родители нового блока"""
+        limit = max_parents if max_parents is not None else self.max_parents
+        with self.lock:
+            if len(self.tips) <= limit:
+                return list(self.tips)
+            if self.tip_selection == "random_walk":
+                return self._random_walk_tips(limit)
+            heights = self._heights
+            return sorted(self.tips, key=lambda h: (heights[h], h))[:limit]
+    
+    def _random_walk_tips(self, limit: int) -> List[str]:
+        """Блуждание от блока на walk_depth позади к tips.
+
+        Переход к дочернему блоку взвешен числом его потомков первого
+        уровня, поэтому ветви, на которые уже ссылаются, предпочтительнее.
+        """
+        selected: List[str] = []
+        start = self._order[max(0, len(self._order) - self.walk_depth)]
+        children = self._children
+        for _ in range(4 * limit):
+            current = start
+            while current not in self.tips:
+                options = children.get(current)
+                if not options:
+                    break
+                weights = [1 + len(children.get(child, ())) for child in options]
+                current = random.choices(options, weights)[0]
+            if current in self.tips and current not in selected:
+                selected.append(current)
+                if len(selected) == limit:
+                    break
+        if not selected:
+            # Блуждание не дошло до tips (например, они отстали) - берём самые старые
+            heights = self._heights
+            return sorted(self.tips, key=lambda h: (heights[h], h))[:limit]
+        return selected
+    
+    def get_block(self, block_hash: str) -> Optional[DAGBlock]:
         """Находит блок по хэшу"""
+        return self._resolve(block_hash)
+    
+    def has_block(self, block_hash: str) -> bool:
         with self.lock:
-            for block in self.blocks:
-                if block.hash == block_hash:
-                    return block
-            return None
+            return block_hash in self._heights
+    
+    def get_parents(self, block_hash: str) -> List[str]:
+        """Возвращает хэши известных родителей блока"""
+        with self.lock:
+            entry = self._locations.get(block_hash)
+            if entry is not None:
+                return list(entry.parents)
+            block = self._index.get(block_hash)
+            if block is None:
+                return []
+            return [h for h in block.previous_hashes if h in self._heights]
+    
+    def get_children(self, block_hash: str) -> List[str]:
+        """Возвращает хэши блоков, ссылающихся на данный"""
+        with self.lock:
+            return list(self._children.get(block_hash, ()))
+    
+    def get_height(self, block_hash: str) -> Optional[int]:
+        """Возвращает высоту блока в DAG (genesis = 0)"""
+        with self.lock:
+            return self._heights.get(block_hash)
     
-    def get_blocks_since(self, timestamp: float) -> List[DAGBlock]:
+    def get_max_height(self) -> int:
+        with self.lock:
+            return self._max_height
+    
+    def get_finalized_hash(self, height: Optional[int] = None) -> Optional[str]:
+        """Хэш финализированного блока - детерминированный seed.
+
+        Без height - блок на глубине finality_depth от вершины. С height -
+        блок на этой высоте, если она уже финализирована (иначе None):
+        ответ не зависит от того, насколько далеко ушла вершина.
+        """
+        with self.lock:
+            final_height = self._max_height - (self.finality_depth or 0)
+            if height is None:
+                height = final_height
+            elif height > final_height:
+                return None
+            hashes = self._by_height.get(height)
+            return min(hashes) if hashes else None
+    
+    def get_checkpoints(self) -> Dict[int, str]:
+        """Дайджесты диапазонов высот: начальная высота -> корень Меркла хэшей блоков.
+
+        Хэши внутри диапазона сортируются, поэтому дайджест не зависит от
+        порядка, в котором блоки были получены. Диапазоны, которые
+        get_range_data не может отдать целиком, не публикуются.
+        """
+        with self.lock:
+            interval = self.checkpoint_interval
+            checkpoints = {}
+            for start in range(self._first_servable_start(), self._max_height + 1, interval):
+                digest = self._checkpoints.get(start)
+                if digest is None:
+                    hashes = []
+                    for height in range(start, start + interval):
+                        hashes.extend(self._by_height.get(height, ()))
+                    digest = MerkleTree(sorted(hashes)).root
+                    self._checkpoints[start] = digest
+                checkpoints[start] = digest
+            return checkpoints
+    
+    def get_range_data(self, starts: List[int]) -> List[bytes]:
+        """Закодированные блоки диапазонов контрольных точек, по возрастанию высоты.
+
+        С хранилищем байты читаются с диска без декодирования. Тела
+        финализированных блоков без хранилища недоступны, такие диапазоны
+        пропускаются (заголовок без тела получатель принял бы за полный блок).
+        """
+        with self.lock:
+            interval = self.checkpoint_interval
+            first_servable = self._first_servable_start()
+            data = []
+            for start in sorted(starts):
+                if start < first_servable:
+                    continue
+                for height in range(start, start + interval):
+                    for block_hash in self._by_height.get(height, ()):
+                        entry = self._locations.get(block_hash)
+                        if entry is not None:
+                            data.append(bytes(self.store.read(entry)))
+                        else:
+                            data.append(self._index[block_hash].to_bytes())
+            return data
+    
+    def get_servable_start(self) -> int:
+        """Начало первого диапазона, который шард публикует и отдаёт.
+
+        Диапазоны ниже уже финализированы и вытеснены без хранилища:
+        синхронизация их не сравнивает.
+        """
+        with self.lock:
+            return self._first_servable_start()
+    
+    def _first_servable_start(self) -> int:
+        """Начало первого диапазона без вытесненных тел"""
+        interval = self.checkpoint_interval
+        return (self._pruned_height // interval + 1) * interval if self._pruned_height >= 0 else 0
+    
+    def get_blocks_since(self, timestamp: float) -> BlockRange:
         """Возвращает блоки начиная с указанного времени"""
         with self.lock:
-            return [block for block in self.blocks if block.timestamp >= timestamp]
+            return BlockRange(self._runs_between(timestamp, float("inf")), self._resolve)
+    
+    def get_blocks_between(self, start_time: float, end_time: float) -> BlockRange:
+        """Возвращает блоки с timestamp в интервале [start_time, end_time)"""
+        with self.lock:
+            return BlockRange(self._runs_between(start_time, end_time), self._resolve)
     
-    def get_all_transactions(self) -> List:
-        """Возвращает все транзакции в шарде"""
+    def get_recent_blocks(self, count: int) -> BlockRange:
+        """Возвращает последние count блоков по времени"""
         with self.lock:
-            transactions = []
-            for block in self.blocks:
-                transactions.extend(block.transactions)
-            return transactions
+            stop = len(self._order)
+            runs: List[Run] = [(self._order, self._timestamps, max(0, stop - count), stop)]
+            runs.extend((order, timestamps, max(0, len(order) - count), len(order))
+                        for timestamps, order in self._late_runs)
+        if len(runs) == 1:
+            return BlockRange(runs, self._resolve)
+        # Хвосты прогонов короткие: сливаем их и берём последние count
+        tail = BlockRange(runs, self._resolve).hashes()[-count:] if count > 0 else []
+        return BlockRange([(tail, None, 0, len(tail))], self._resolve)
+    
+    def iter_transactions(self) -> Iterator:
+        """Потоково перебирает все транзакции шарда без копирования в список"""
+        for block in self.get_blocks_since(float("-inf")):
+            yield from block.transactions
     
-    def get_shard_stats(self) -> dict:
-        """Возвращает статистику шарда"""
+    def get_shard_stats(self, include_miners: bool = False) -> dict:
+        """Возвращает статистику шарда за O(1) по счётчикам"""
         with self.lock:
-            return {
+            stats = {
                 "shard_id": self.shard_id,
-                "block_count": len(self.blocks),
-                "transaction_count": len(self.get_all_transactions()),
+                "block_count": len(self._heights),
+                "transaction_count": self._transaction_count,
+                "transaction_bytes": self._transaction_bytes,
                 "tips_count": len(self.tips),
-                "latest_block": self.blocks[-1].hash if self.blocks else None
+                "pruned_blocks": self._pruned_count,
+                "latest_block": self._order[-1] if self._order else None
             }
+            if include_miners:
+                stats["miner_block_counts"] = dict(self._miner_block_counts)
+            return stats
@@ -0,0 +1,143 @@
+import atexit
+import hashlib
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DIGEST_SIZE = 32
+EMPTY_ROOT = "0" * 64
+
+# Один шаг доказательства: (хэш соседа, сосед справа)
+ProofStep = Tuple[str, bool]
+
+# hashlib отпускает GIL только для входов от 2 КБ, а узел дерева - 64 байта,
+# поэтому потоки ускоряют хэширование уровня лишь в сборке без GIL
+_GIL_ENABLED = getattr(sys, "_is_gil_enabled", lambda: True)()
+_DEFAULT_WORKERS = 1 if _GIL_ENABLED else (os.cpu_count() or 1)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> ThreadPoolExecutor:
+    """Общий пул хэширования уровней: создаётся один раз и закрывается при выходе.
+
+    Пул не пересоздаётся под больший workers (старый пул никто бы не
+    закрыл, а вызов, уже получивший его, мог бы отправить в него задачи
+    после shutdown): части уровня, которым не хватило потоков, ждут в очереди.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(workers, os.cpu_count() or 1),
+                                           thread_name_prefix="merkle")
+            atexit.register(_executor.shutdown, wait=False)
+        return _executor
+
+
+def _hash_pairs(level: memoryview, out: bytearray, start: int, stop: int):
+    """Хэширует пары узлов start..stop-1 уровня level в out"""
+    sha3 = hashlib.sha3_256
+    for i in range(start, stop):
+        offset = 2 * i * DIGEST_SIZE
+        out[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE] = \
+            sha3(level[offset:offset + 2 * DIGEST_SIZE]).digest()
+
+
+class MerkleTree:
+    """Дерево Меркла над 32-байтовыми хэшами транзакций.
+
+    Каждый уровень хранится одним непрерывным буфером дайджестов, узел -
+    sha3_256(левый || правый), непарный последний узел дублируется.
+    Широкие уровни делятся на диапазоны и хэшируются в пуле потоков.
+    Уровни сохраняются, поэтому доказательство включения строится и
+    проверяется за O(log n); готовые доказательства кэшируются.
+    """
+
+    def __init__(self, leaf_hashes: Sequence[str], workers: Optional[int] = None,
+                 parallel_threshold: int = 16_384):
+        self.workers = max(1, workers if workers is not None else _DEFAULT_WORKERS)
+        self.parallel_threshold = parallel_threshold
+        self.leaf_count = len(leaf_hashes)
+        self._leaf_index: Optional[Dict[str, int]] = None
+        self._leaf_hashes = leaf_hashes
+        self._proof_cache: Dict[str, List[ProofStep]] = {}
+        self._proof_lock = threading.Lock()
+        self.levels: List[bytes] = self._build(leaf_hashes)
+
+    @property
+    def root(self) -> str:
+        if not self.levels:
+            return EMPTY_ROOT
+        return self.levels[-1].hex()
+
+    def get_proof(self, tx_hash: str) -> Optional[List[ProofStep]]:
+        """Доказательство включения tx_hash или None, если его нет в дереве"""
+        with self._proof_lock:
+            proof = self._proof_cache.get(tx_hash)
+            if proof is not None:
+                return proof
+            if self._leaf_index is None:
+                # Индекс листьев нужен только для доказательств - строим лениво
+                self._leaf_index = {h: i for i, h in enumerate(self._leaf_hashes)}
+            index = self._leaf_index.get(tx_hash)
+            if index is None:
+                return None
+
+            proof = []
+            for level in self.levels[:-1]:
+                count = len(level) // DIGEST_SIZE
+                sibling = index ^ 1
+                if sibling >= count:
+                    sibling = index  # Непарный узел хэшируется сам с собой
+                proof.append((level[sibling * DIGEST_SIZE:(sibling + 1) * DIGEST_SIZE].hex(),
+                              sibling >= index))
+                index //= 2
+            self._proof_cache[tx_hash] = proof
+            return proof
+
+    @staticmethod
+    def verify_proof(tx_hash: str, proof: List[ProofStep], root: str) -> bool:
+        """Проверяет доказательство включения tx_hash в дерево с корнем root"""
+        try:
+            node = bytes.fromhex(tx_hash)
+            for sibling_hex, sibling_right in proof:
+                sibling = bytes.fromhex(sibling_hex)
+                pair = node + sibling if sibling_right else sibling + node
+                node = hashlib.sha3_256(pair).digest()
+        except ValueError:
+            return False
+        return node.hex() == root
+
+    def _build(self, leaf_hashes: Sequence[str]) -> List[bytes]:
+        if not leaf_hashes:
+            return []
+        level = bytes.fromhex("".join(leaf_hashes))
+        levels = [level]
+        while len(level) > DIGEST_SIZE:
+            level = self._hash_level(level)
+            levels.append(level)
+        return levels
+
+    def _hash_level(self, level: bytes) -> bytes:
+        count = len(level) // DIGEST_SIZE
+        if count % 2:
+            level += level[-DIGEST_SIZE:]
+            count += 1
+        pairs = count // 2
+        out = bytearray(pairs * DIGEST_SIZE)
+        view = memoryview(level)
+
+        if self.workers == 1 or pairs < self.parallel_threshold:
+            _hash_pairs(view, out, 0, pairs)
+            return bytes(out)
+
+        chunk = -(-pairs // self.workers)
+        executor = _get_executor(self.workers)
+        futures = [executor.submit(_hash_pairs, view, out, start, min(start + chunk, pairs))
+                   for start in range(0, pairs, chunk)]
+        for future in futures:
+            future.result()
+        return bytes(out)
@@ -0,0 +1,117 @@
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .dag_block import DAGBlock
+from .dag_shard import DAGShard
+
+
+class LocalSyncPeer:
+    """Пир синхронизации поверх шардов в том же процессе (тесты, бенчмарки).
+
+    Реализует тот же интерфейс, что и сетевой пир: get_checkpoints и
+    get_ranges. Блоки передаются в бинарной кодировке, как по сети.
+    """
+
+    def __init__(self, shards: Sequence[DAGShard], peer_id: str = "local"):
+        self.shards = {shard.shard_id: shard for shard in shards}
+        self.peer_id = peer_id
+
+    def get_checkpoints(self, shard_id: int) -> Dict[int, str]:
+        return self.shards[shard_id].get_checkpoints()
+
+    def get_ranges(self, shard_id: int, starts: List[int]) -> List[bytes]:
+        return self.shards[shard_id].get_range_data(starts)
+
+
+class DAGSyncEngine:
+    """Синхронизация шардов DAG с пирами по контрольным дайджестам.
+
+    Сначала сравниваются дайджесты диапазонов высот, затем одним запросом
+    на шард запрашиваются только отличающиеся или отсутствующие
+    диапазоны. Полученные блоки вставляются по возрастанию высоты, поэтому
+    родители попадают в шард раньше потомков. Если задан validate
+    (например, QuantumSecureHyperChain.validate_incoming_blocks), блоки
+    перед вставкой проходят пакетную проверку подписей. Пир, приславший
+    блок, тело которого не совпадает с merkle_root заголовка, отвергается
+    целиком и больше не используется.
+    """
+
+    def __init__(self, shards: Sequence[DAGShard],
+                 validate: Optional[Callable[[List[DAGBlock]], List[bool]]] = None):
+        self.shards = {shard.shard_id: shard for shard in shards}
+        self.validate = validate
+        self.lock = threading.Lock()
+        self.banned_peers = set()
+        self.stats = {
+            "rounds": 0,
+            "ranges_compared": 0,
+            "ranges_fetched": 0,
+            "blocks_received": 0,
+            "blocks_added": 0,
+            "blocks_rejected": 0,
+            "peers_banned": 0,
+        }
+
+    def sync_with(self, peer) -> int:
+        """Синхронизирует все шарды с пиром. Возвращает число добавленных блоков"""
+        added = 0
+        for shard_id in self.shards:
+            if self._peer_id(peer) in self.banned_peers:
+                break
+            added += self.sync_shard(shard_id, peer)
+        self._count("rounds")
+        return added
+
+    def sync_shard(self, shard_id: int, peer) -> int:
+        if self._peer_id(peer) in self.banned_peers:
+            return 0
+        shard = self.shards[shard_id]
+        remote = peer.get_checkpoints(shard_id)
+        local = shard.get_checkpoints()
+        # Свои вытесненные диапазоны шард не публикует, но они уже финализированы
+        servable_start = shard.get_servable_start()
+        differing = [start for start, digest in remote.items()
+                     if start >= servable_start and local.get(start) != digest]
+        self._count("ranges_compared", len(remote))
+        if not differing:
+            return 0
+
+        try:
+            blocks = [DAGBlock.from_bytes(data) for data in peer.get_ranges(shard_id, differing)]
+        except ValueError as e:
+            print(f"Rejecting sync peer {self._peer_id(peer)}: {e}")
+            with self.lock:
+                self.banned_peers.add(self._peer_id(peer))
+                self.stats["peers_banned"] += 1
+            return 0
+        self._count("ranges_fetched", len(differing))
+        self._count("blocks_received", len(blocks))
+
+        # Уже известные блоки не проверяем повторно
+        blocks = [block for block in blocks if not shard.has_block(block.hash)]
+        if self.validate is not None and blocks:
+            verdicts = self.validate(blocks)
+            self._count("blocks_rejected", verdicts.count(False))
+            blocks = [block for block, valid in zip(blocks, verdicts) if valid]
+
+        # Пир отдаёт блоки по возрастанию высоты: родители вставляются первыми
+        added = 0
+        for block in blocks:
+            if shard.add_block(block):
+                added += 1
+            else:
+                self._count("blocks_rejected")
+        self._count("blocks_added", added)
+        return added
+
+    @staticmethod
+    def _peer_id(peer) -> str:
+        return getattr(peer, "peer_id", str(id(peer)))
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return dict(self.stats)
+
+    def _count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.stats[key] += amount
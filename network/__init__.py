@@ -0,0 +1,9 @@
+from .framing import KIND_BLOCKS, KIND_TRANSACTIONS, encode_frame, encode_frames, decode_body
+from .compact import CompactBlock, reconstruct
+from .p2p import P2PNetwork, SeenSet
+
+__all__ = [
+    'P2PNetwork', 'SeenSet', 'CompactBlock', 'reconstruct',
+    'KIND_BLOCKS', 'KIND_TRANSACTIONS', 'encode_frame', 'encode_frames',
+    'decode_body'
+]
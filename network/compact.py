@@ -0,0 +1,168 @@
+import hashlib
+import os
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dag.dag_block import DAGBlock
+from transactions.transaction import Transaction
+
+SHORT_ID_SIZE = 6
+SALT_SIZE = 16
+
+_U8 = struct.Struct(">B")
+_U16 = struct.Struct(">H")
+_U32 = struct.Struct(">I")
+
+
+def short_id(salt: bytes, tx_hash: str) -> bytes:
+    """Короткий идентификатор транзакции: keyed BLAKE2b от хэша, 6 байт"""
+    return hashlib.blake2b(bytes.fromhex(tx_hash), digest_size=SHORT_ID_SIZE, key=salt).digest()
+
+
+class CompactBlock:
+    """Компактное представление блока: заголовок, соль, короткие ID транзакций и подписи.
+
+    Соль своя у каждого анонса, поэтому коллизии коротких ID нельзя
+    подобрать заранее; случайная коллизия ловится сверкой merkle_root
+    после восстановления.
+    """
+
+    def __init__(self, header: DAGBlock, salt: bytes, short_ids: List[bytes],
+                 signatures: Dict[str, bytes]):
+        self.header = header
+        self.salt = salt
+        self.short_ids = short_ids
+        self.signatures = signatures
+
+    @property
+    def hash(self) -> str:
+        return self.header.hash
+
+    @classmethod
+    def from_block(cls, block: DAGBlock, salt: Optional[bytes] = None) -> "CompactBlock":
+        salt = salt if salt is not None else os.urandom(SALT_SIZE)
+        return cls(block, salt, [short_id(salt, tx.hash) for tx in block.transactions],
+                   dict(block.signatures))
+
+    def to_bytes(self) -> bytes:
+        parts = [self.header.header_bytes(), self.salt, _U32.pack(len(self.short_ids))]
+        parts.extend(self.short_ids)
+        parts.append(_U8.pack(len(self.signatures)))
+        for algorithm in sorted(self.signatures):
+            name = algorithm.encode()
+            signature = self.signatures[algorithm]
+            parts.extend((_U16.pack(len(name)), name, _U32.pack(len(signature)), signature))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data) -> "CompactBlock":
+        view = memoryview(data)
+        header, offset = DAGBlock.decode_header(view)
+        salt = bytes(view[offset:offset + SALT_SIZE])
+        offset += SALT_SIZE
+        (count,) = _U32.unpack_from(view, offset)
+        offset += _U32.size
+        ids_end = offset + count * SHORT_ID_SIZE
+        raw_ids = bytes(view[offset:ids_end])
+        short_ids = [raw_ids[i:i + SHORT_ID_SIZE] for i in range(0, len(raw_ids), SHORT_ID_SIZE)]
+        offset = ids_end
+
+        signatures: Dict[str, bytes] = {}
+        (sig_count,) = _U8.unpack_from(view, offset)
+        offset += _U8.size
+        for _ in range(sig_count):
+            (length,) = _U16.unpack_from(view, offset)
+            offset += _U16.size
+            algorithm = bytes(view[offset:offset + length]).decode()
+            offset += length
+            (length,) = _U32.unpack_from(view, offset)
+            offset += _U32.size
+            signatures[algorithm] = bytes(view[offset:offset + length])
+            offset += length
+        if offset != len(view) or len(short_ids) != count:
+            raise ValueError("Malformed compact block")
+        return cls(header, salt, short_ids, signatures)
+
+
+class PendingBlock:
+    """Блок, восстановленный из локального пула не полностью"""
+
+    def __init__(self, compact: CompactBlock, slots: List[Optional[Transaction]]):
+        self.compact = compact
+        self.slots = slots
+
+    @property
+    def missing(self) -> List[int]:
+        return [i for i, tx in enumerate(self.slots) if tx is None]
+
+    def fill(self, transactions: List[Transaction]) -> Optional[DAGBlock]:
+        """Подставляет присланные транзакции на места недостающих"""
+        missing = self.missing
+        if len(transactions) != len(missing):
+            return None
+        for index, tx in zip(missing, transactions):
+            if short_id(self.compact.salt, tx.hash) != self.compact.short_ids[index]:
+                return None
+            self.slots[index] = tx
+        return _assemble(self.compact, self.slots)
+
+
+def reconstruct(compact: CompactBlock,
+                candidates: Iterable[Transaction]) -> Tuple[Optional[DAGBlock], PendingBlock]:
+    """Восстанавливает блок из транзакций локального пула.
+
+    Возвращает готовый блок (если все транзакции найдены и merkle_root
+    совпал) и PendingBlock с номерами недостающих транзакций.
+    """
+    wanted = {sid: i for i, sid in enumerate(compact.short_ids)}
+    slots: List[Optional[Transaction]] = [None] * len(compact.short_ids)
+    salt = compact.salt
+    for tx in candidates:
+        index = wanted.get(short_id(salt, tx.hash))
+        if index is not None:
+            slots[index] = tx
+    pending = PendingBlock(compact, slots)
+    if pending.missing:
+        return None, pending
+    block = _assemble(compact, slots)
+    if block is None:
+        # Коллизия коротких ID: запрашиваем все транзакции целиком
+        pending.slots = [None] * len(slots)
+    return block, pending
+
+
+def _assemble(compact: CompactBlock, transactions: List[Transaction]) -> Optional[DAGBlock]:
+    block, _ = DAGBlock.decode_header(compact.header.header_bytes())
+    block.transactions = list(transactions)
+    if block.merkle_tree.root != block.merkle_root:
+        return None
+    block.signatures = dict(compact.signatures)
+    return block
+
+
+def encode_tx_request(block_hash: str, indexes: List[int]) -> bytes:
+    return bytes.fromhex(block_hash) + _U32.pack(len(indexes)) + b"".join(
+        _U32.pack(i) for i in indexes)
+
+
+def decode_tx_request(data) -> Tuple[str, List[int]]:
+    view = memoryview(data)
+    (count,) = _U32.unpack_from(view, 32)
+    indexes = [_U32.unpack_from(view, 36 + 4 * i)[0] for i in range(count)]
+    return bytes(view[:32]).hex(), indexes
+
+
+def encode_tx_response(block_hash: str, transactions: List[Transaction]) -> bytes:
+    return bytes.fromhex(block_hash) + _U32.pack(len(transactions)) + b"".join(
+        tx.to_bytes() for tx in transactions)
+
+
+def decode_tx_response(data) -> Tuple[str, List[Transaction]]:
+    view = memoryview(data)
+    (count,) = _U32.unpack_from(view, 32)
+    offset = 36
+    transactions = []
+    for _ in range(count):
+        tx, offset = Transaction.decode(view, offset)
+        transactions.append(tx)
+    return bytes(view[:32]).hex(), transactions
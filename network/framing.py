@@ -0,0 +1,83 @@
+import struct
+from typing import List, Tuple
+
+# Кадр: длина тела | тело = тип сообщений, число элементов, элементы с префиксом длины
+KIND_BLOCKS = 1
+KIND_TRANSACTIONS = 2
+KIND_COMPACT_BLOCKS = 3
+KIND_GET_BLOCK_TXS = 4  # Запрос недостающих транзакций компактного блока
+KIND_BLOCK_TXS = 5  # Ответ на KIND_GET_BLOCK_TXS
+
+FRAME_HEADER = struct.Struct(">I")
+_BODY_HEADER = struct.Struct(">BI")  # kind, count
+_ITEM_LENGTH = struct.Struct(">I")
+
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+def encode_frame(kind: int, items: List[bytes]) -> bytes:
+    """Упаковывает несколько блоков или транзакций одного типа в один кадр"""
+    parts = [b"", _BODY_HEADER.pack(kind, len(items))]
+    for item in items:
+        parts.append(_ITEM_LENGTH.pack(len(item)))
+        parts.append(item)
+    body_length = sum(len(part) for part in parts)
+    if body_length > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame too large: {body_length} bytes")
+    parts[0] = FRAME_HEADER.pack(body_length)
+    return b"".join(parts)
+
+
+def encode_frames(kind: int, items: List[bytes], max_bytes: int = MAX_FRAME_BYTES) -> List[bytes]:
+    """Как encode_frame, но делит элементы на кадры не длиннее max_bytes.
+
+    ValueError только если один элемент сам не помещается в кадр.
+    """
+    frames = []
+    chunk: List[bytes] = []
+    chunk_bytes = _BODY_HEADER.size
+    for item in items:
+        item_bytes = _ITEM_LENGTH.size + len(item)
+        if _BODY_HEADER.size + item_bytes > max_bytes:
+            raise ValueError(f"Frame item too large: {len(item)} bytes")
+        if chunk and chunk_bytes + item_bytes > max_bytes:
+            frames.append(encode_frame(kind, chunk))
+            chunk, chunk_bytes = [], _BODY_HEADER.size
+        chunk.append(item)
+        chunk_bytes += item_bytes
+    if chunk:
+        frames.append(encode_frame(kind, chunk))
+    return frames
+
+
+def decode_body(body) -> Tuple[int, List[memoryview]]:
+    """Разбирает тело кадра без копирования элементов; ValueError на битом теле"""
+    view = memoryview(body)
+    try:
+        kind, count = _BODY_HEADER.unpack_from(view, 0)
+        offset = _BODY_HEADER.size
+        items = []
+        for _ in range(count):
+            (length,) = _ITEM_LENGTH.unpack_from(view, offset)
+            offset += _ITEM_LENGTH.size
+            if offset + length > len(view):
+                raise ValueError("Truncated frame item")
+            items.append(view[offset:offset + length])
+            offset += length
+    except struct.error as e:
+        raise ValueError(f"Malformed frame: {e}") from e
+    if offset != len(view):
+        raise ValueError("Trailing bytes after frame items")
+    return kind, items
+
+
+def body_length(header: bytes) -> int:
+    """Длина тела по заголовку кадра; слишком большие кадры отвергаются"""
+    try:
+        (length,) = FRAME_HEADER.unpack(header)
+    except struct.error as e:
+        raise ValueError(f"Malformed frame header: {e}") from e
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame too large: {length} bytes")
+    return length
+
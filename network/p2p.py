@@ -0,0 +1,402 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from dag.dag_block import DAGBlock
+from transactions.transaction import Transaction
+
+from . import compact
+from .framing import (FRAME_HEADER, KIND_BLOCK_TXS, KIND_BLOCKS, KIND_COMPACT_BLOCKS,
+                      KIND_GET_BLOCK_TXS, KIND_TRANSACTIONS, body_length, decode_body,
+                      encode_frames)
+
+_DECODERS = {
+    KIND_BLOCKS: DAGBlock.from_bytes,
+    KIND_TRANSACTIONS: Transaction.from_bytes,
+}
+
+
+class SeenSet:
+    """Ограниченное LRU-множество идентификаторов уже виденных сообщений"""
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[int, str], None]" = OrderedDict()
+
+    def add(self, key: Tuple[int, str]) -> bool:
+        """Добавляет ключ; возвращает False, если он уже был"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return False
+        self._entries[key] = None
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _Peer:
+    """Постоянное соединение с пиром и его ограниченная очередь отправки"""
+
+    def __init__(self, peer_id: str, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter, queue_size: int):
+        self.peer_id = peer_id
+        self.reader = reader
+        self.writer = writer
+        # Элементы очереди: (kind, payload, время постановки)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.tasks: List[asyncio.Task] = []
+
+
+class P2PNetwork:
+    """Gossip-слой поверх asyncio.
+
+    Цикл событий работает в отдельном потоке, поэтому broadcast_* можно
+    вызывать из обычных потоков узла. С каждым пиром держится одно
+    постоянное соединение; кадры с префиксом длины несут пачку блоков или
+    транзакций (до max_batch элементов, накопленных за batch_delay).
+    Повторно полученные сообщения отсекаются ограниченным LRU seen-set и
+    не пересылаются дальше. Очередь отправки к пиру ограничена: если она
+    полна, отправитель ждёт до send_timeout, затем сообщение для этого
+    пира отбрасывается. Обработчики on_blocks/on_transactions получают
+    новые сообщения пачкой в пуле потоков, не блокируя цикл событий.
+
+    В режиме compact_blocks блок анонсируется заголовком и короткими ID
+    транзакций. Получатель восстанавливает его из своей партиции мемпула
+    (mempool_view(shard_id)) и запрашивает у анонсировавшего пира только
+    недостающие транзакции; для ответа на такие запросы недавние блоки
+    хранятся в ограниченном LRU.
+    """
+
+    def __init__(self, port: int, host: str = "127.0.0.1", max_batch: int = 256,
+                 batch_delay: float = 0.002, queue_size: int = 4096,
+                 send_timeout: float = 1.0, max_seen: int = 100_000,
+                 latency_samples: int = 10_000, compact_blocks: bool = True,
+                 recent_blocks: int = 1_024):
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.batch_delay = batch_delay
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.compact_blocks = compact_blocks
+        self.recent_blocks = recent_blocks
+
+        self.on_blocks: Optional[Callable[[List[DAGBlock]], None]] = None
+        self.on_transactions: Optional[Callable[[List[Transaction]], None]] = None
+        self.mempool_view: Optional[Callable[[int], Iterable[Transaction]]] = None
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Dict[str, _Peer] = {}
+        self._seen = SeenSet(max_seen)
+        self._latencies: deque = deque(maxlen=latency_samples)
+        self._recent: "OrderedDict[str, DAGBlock]" = OrderedDict()
+        self._pending: "OrderedDict[str, compact.PendingBlock]" = OrderedDict()
+
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            "frames_sent": 0,
+            "items_sent": 0,
+            "bytes_sent": 0,
+            "frames_received": 0,
+            "items_received": 0,
+            "duplicates": 0,
+            "dropped": 0,
+            "decode_errors": 0,
+            "compact_reconstructed": 0,
+            "compact_incomplete": 0,
+            "missing_requested": 0,
+            "reconstruct_failed": 0,
+        }
+
+    def start(self):
+        """Запускает цикл событий и сервер; port=0 выбирает свободный порт"""
+        ready = threading.Event()
+        self.loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self._server = self.loop.run_until_complete(
+                asyncio.start_server(self._accept, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self.loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+
+    def stop(self):
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def connect(self, host: str, port: int) -> str:
+        """Открывает постоянное соединение с пиром и возвращает его идентификатор"""
+        return asyncio.run_coroutine_threadsafe(self._connect(host, port), self.loop).result()
+
+    def get_peers(self) -> List[str]:
+        return list(self._peers)
+
+    def broadcast_block(self, block: DAGBlock):
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._publish_block(block), self.loop).result()
+
+    def broadcast_blocks(self, blocks: List[DAGBlock]):
+        for block in blocks:
+            self.broadcast_block(block)
+
+    def broadcast_transaction(self, tx: Transaction):
+        self._broadcast(KIND_TRANSACTIONS, tx.hash, tx.to_bytes())
+
+    def get_stats(self) -> Dict:
+        """Счётчики и перцентили задержки рассылки (постановка в очередь -> запись в сокет)"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+            latencies = sorted(self._latencies)
+        stats["peers"] = len(self._peers)
+        stats["seen"] = len(self._seen)
+        for name, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+            stats[f"fanout_latency_{name}"] = (
+                latencies[min(len(latencies) - 1, int(len(latencies) * q))] if latencies else None)
+        return stats
+
+    def _count(self, key: str, amount: int = 1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def _broadcast(self, kind: int, item_id: str, payload: bytes):
+        if self.loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._publish(kind, item_id, payload), self.loop)
+        # Ожидание - это и есть backpressure от заполненных очередей пиров
+        future.result()
+
+    async def _publish(self, kind: int, item_id: str, payload: bytes):
+        if self._seen.add((kind, item_id)):
+            await self._fan_out(kind, payload, None)
+
+    async def _publish_block(self, block: DAGBlock, source: Optional[str] = None):
+        if self._seen.add((KIND_BLOCKS, block.hash)):
+            await self._relay_block(block, source)
+
+    async def _relay_block(self, block: DAGBlock, source: Optional[str]):
+        if not self.compact_blocks:
+            await self._fan_out(KIND_BLOCKS, block.to_bytes(), source)
+            return
+        self._recent[block.hash] = block
+        if len(self._recent) > self.recent_blocks:
+            self._recent.popitem(last=False)
+        await self._fan_out(KIND_COMPACT_BLOCKS,
+                            compact.CompactBlock.from_block(block).to_bytes(), source)
+
+    async def _fan_out(self, kind: int, payload: bytes, source: Optional[str]):
+        item = (kind, payload, time.perf_counter())
+        for peer_id, peer in list(self._peers.items()):
+            if peer_id == source:
+                continue
+            await self._enqueue(peer, item)
+
+    async def _enqueue(self, peer: _Peer, item: Tuple[int, bytes, float]):
+        try:
+            peer.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(peer.queue.put(item), self.send_timeout)
+            except asyncio.TimeoutError:
+                self._count("dropped")
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        host, port = writer.get_extra_info("peername")[:2]
+        self._add_peer(f"{host}:{port}", reader, writer)
+
+    async def _connect(self, host: str, port: int) -> str:
+        reader, writer = await asyncio.open_connection(host, port)
+        peer_id = f"{host}:{port}"
+        self._add_peer(peer_id, reader, writer)
+        return peer_id
+
+    def _add_peer(self, peer_id: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = _Peer(peer_id, reader, writer, self.queue_size)
+        self._peers[peer_id] = peer
+        peer.tasks = [asyncio.ensure_future(self._send_loop(peer)),
+                      asyncio.ensure_future(self._receive_loop(peer))]
+
+    def _drop_peer(self, peer: _Peer):
+        if self._peers.get(peer.peer_id) is not peer:
+            return
+        del self._peers[peer.peer_id]
+        for task in peer.tasks:
+            task.cancel()
+        peer.writer.close()
+
+    async def _send_loop(self, peer: _Peer):
+        """Собирает очередь пира в пачки и пишет их кадрами"""
+        try:
+            while True:
+                batch = [await peer.queue.get()]
+                if self.batch_delay and peer.queue.qsize() < self.max_batch:
+                    await asyncio.sleep(self.batch_delay)
+                while len(batch) < self.max_batch and not peer.queue.empty():
+                    batch.append(peer.queue.get_nowait())
+
+                by_kind: Dict[int, List[bytes]] = {}
+                for kind, payload, _ in batch:
+                    by_kind.setdefault(kind, []).append(payload)
+                sent_bytes = 0
+                frames = 0
+                for kind, payloads in by_kind.items():
+                    # Крупные пачки делятся на несколько кадров по размеру
+                    for frame in encode_frames(kind, payloads):
+                        peer.writer.write(frame)
+                        sent_bytes += len(frame)
+                        frames += 1
+                await peer.writer.drain()
+
+                now = time.perf_counter()
+                with self.stats_lock:
+                    self.stats["frames_sent"] += frames
+                    self.stats["bytes_sent"] += sent_bytes
+                    self.stats["items_sent"] += len(batch)
+                    self._latencies.extend(now - queued_at for _, _, queued_at in batch)
+        except (ConnectionError, OSError, ValueError):
+            # ValueError: элемент не помещается даже в отдельный кадр
+            self._drop_peer(peer)
+
+    async def _receive_loop(self, peer: _Peer):
+        try:
+            while True:
+                header = await peer.reader.readexactly(FRAME_HEADER.size)
+                body = await peer.reader.readexactly(body_length(header))
+                await self._handle_frame(peer, body)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError, ValueError):
+            self._drop_peer(peer)
+
+    async def _handle_frame(self, peer: _Peer, body: bytes):
+        kind, payloads = decode_body(body)
+        self._count("frames_received")
+        self._count("items_received", len(payloads))
+        if kind == KIND_COMPACT_BLOCKS:
+            fresh = await self._handle_compact(peer, payloads)
+        elif kind == KIND_GET_BLOCK_TXS:
+            await self._handle_tx_request(peer, payloads)
+            return
+        elif kind == KIND_BLOCK_TXS:
+            fresh = await self._handle_tx_response(peer, payloads)
+        elif kind in _DECODERS:
+            fresh = await self._handle_items(peer, kind, payloads)
+        else:
+            return
+
+        handler = self.on_transactions if kind == KIND_TRANSACTIONS else self.on_blocks
+        if fresh and handler is not None:
+            self.loop.run_in_executor(None, self._deliver, handler, fresh)
+
+    async def _handle_items(self, peer: _Peer, kind: int, payloads: List[memoryview]) -> List:
+        decoder = _DECODERS[kind]
+        fresh = []
+        for payload in payloads:
+            try:
+                item = decoder(payload)
+            except Exception as e:
+                # Битый элемент или тело блока, не совпадающее с merkle_root: пир отключается
+                self._count("decode_errors")
+                raise ValueError(f"Invalid item from {peer.peer_id}") from e
+            if not self._seen.add((kind, item.hash)):
+                self._count("duplicates")
+                continue
+            fresh.append(item)
+            if kind == KIND_BLOCKS:
+                await self._relay_block(item, peer.peer_id)
+            else:
+                await self._fan_out(kind, bytes(payload), peer.peer_id)
+        return fresh
+
+    async def _handle_compact(self, peer: _Peer, payloads: List[memoryview]) -> List[DAGBlock]:
+        fresh = []
+        for payload in payloads:
+            try:
+                announced = compact.CompactBlock.from_bytes(payload)
+            except Exception:
+                self._count("decode_errors")
+                continue
+            if not self._seen.add((KIND_BLOCKS, announced.hash)):
+                self._count("duplicates")
+                continue
+            # Перебор партиции мемпула - вне цикла событий
+            block, pending = await self.loop.run_in_executor(
+                None, self._reconstruct, announced)
+            if block is not None:
+                self._count("compact_reconstructed")
+                fresh.append(block)
+                await self._relay_block(block, peer.peer_id)
+                continue
+            self._count("compact_incomplete")
+            missing = pending.missing
+            self._count("missing_requested", len(missing))
+            self._pending[announced.hash] = pending
+            if len(self._pending) > self.recent_blocks:
+                self._pending.popitem(last=False)  # Пир так и не ответил
+            await self._enqueue(peer, (KIND_GET_BLOCK_TXS,
+                                       compact.encode_tx_request(announced.hash, missing),
+                                       time.perf_counter()))
+        return fresh
+
+    def _reconstruct(self, announced: compact.CompactBlock):
+        candidates = self.mempool_view(announced.header.shard_id) if self.mempool_view else ()
+        return compact.reconstruct(announced, candidates)
+
+    async def _handle_tx_request(self, peer: _Peer, payloads: List[memoryview]):
+        for payload in payloads:
+            try:
+                block_hash, indexes = compact.decode_tx_request(payload)
+            except Exception:
+                self._count("decode_errors")
+                continue
+            block = self._recent.get(block_hash)
+            if block is None or any(i >= len(block.transactions) for i in indexes):
+                continue
+            response = compact.encode_tx_response(
+                block_hash, [block.transactions[i] for i in indexes])
+            await self._enqueue(peer, (KIND_BLOCK_TXS, response, time.perf_counter()))
+
+    async def _handle_tx_response(self, peer: _Peer,
+                                  payloads: List[memoryview]) -> List[DAGBlock]:
+        fresh = []
+        for payload in payloads:
+            try:
+                block_hash, transactions = compact.decode_tx_response(payload)
+            except Exception:
+                self._count("decode_errors")
+                continue
+            pending = self._pending.pop(block_hash, None)
+            if pending is None:
+                continue
+            block = pending.fill(transactions)
+            if block is None:
+                # Присланные транзакции не сходятся с short ID или merkle_root блока
+                self._count("reconstruct_failed")
+                raise ValueError(f"Invalid block transactions from {peer.peer_id}")
+            fresh.append(block)
+            await self._relay_block(block, peer.peer_id)
+        return fresh
+
+    @staticmethod
+    def _deliver(handler: Callable, items: List):
+        try:
+            handler(items)
+        except Exception as e:
+            print(f"Gossip handler error: {e}")
+
+    async def _shutdown(self):
+        for peer in list(self._peers.values()):
+            self._drop_peer(peer)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
@@ -0,0 +1,8 @@
+from .segment_store import SegmentBlockStore, IndexEntry
+from .wal import WriteAheadLog
+from .journal import StateJournal
+
+__all__ = [
+    'SegmentBlockStore', 'IndexEntry',
+    'WriteAheadLog', 'StateJournal'
+]
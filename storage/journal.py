@@ -0,0 +1,146 @@
+import os
+import struct
+import threading
+from collections import Counter
+from typing import Iterator, List, Tuple
+
+from transactions.transaction import Transaction
+from .wal import WriteAheadLog, read_snapshot, write_snapshot
+
+# Типы записей журнала состояния
+TX_ADMIT = 1
+TX_REMOVE = 2
+STAKE = 3
+METRIC = 4
+
+_U16 = struct.Struct(">H")
+_STAKE = struct.Struct(">q")
+_METRIC_VALUES = struct.Struct(">dd")  # value, timestamp
+_HASH_SIZE = 32
+
+
+def _pack_str(value: str) -> bytes:
+    raw = value.encode()
+    return _U16.pack(len(raw)) + raw
+
+
+def _unpack_str(data: bytes, offset: int) -> Tuple[str, int]:
+    (length,) = _U16.unpack_from(data, offset)
+    offset += _U16.size
+    return data[offset:offset + length].decode(), offset + length
+
+
+class StateJournal:
+    """Журнал состояния узла: мемпул, стейки валидаторов и метрики репутации.
+
+    Компоненты вызывают log_* при каждом изменении; записи уходят в
+    WriteAheadLog с групповым коммитом. snapshot() сохраняет компактный
+    снимок (в том же формате записей) и обрезает журнал, recover()
+    загружает снимок и доигрывает хвост журнала.
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 0.005):
+        self.directory = directory
+        self.wal = WriteAheadLog(os.path.join(directory, "wal"), flush_interval=flush_interval)
+        self.snapshot_path = os.path.join(directory, "snapshot.bin")
+        self.snapshot_lock = threading.Lock()
+        self.replaying = False  # Во время восстановления изменения не журналируются
+
+    def log_tx_admit(self, tx: Transaction):
+        if not self.replaying:
+            self.wal.append(TX_ADMIT, tx.to_bytes())
+
+    def log_tx_remove(self, tx_hashes: List[str]):
+        if not self.replaying and tx_hashes:
+            self.wal.append(TX_REMOVE, b"".join(bytes.fromhex(h) for h in tx_hashes))
+
+    def log_stake(self, validator_address: str, stake: int):
+        if not self.replaying:
+            self.wal.append(STAKE, _pack_str(validator_address) + _STAKE.pack(stake))
+
+    def log_metric(self, validator_address: str, metric):
+        if not self.replaying:
+            self.wal.append(METRIC, self._encode_metric(validator_address, metric.metric_type.value,
+                                                        metric.value, metric.timestamp,
+                                                        metric.source))
+
+    def snapshot(self, pool=None, validators=None, reputation=None) -> int:
+        """Сохраняет снимок состояния и удаляет покрытые им сегменты журнала"""
+        with self.snapshot_lock:
+            # LSN фиксируем до чтения состояния: записи после него будут доиграны
+            lsn = self.wal.last_lsn
+            write_snapshot(self.snapshot_path, lsn,
+                           self._snapshot_records(pool, validators, reputation))
+            self.wal.truncate_before(lsn)
+            return lsn
+
+    def recover(self, pool=None, validators=None, reputation=None) -> int:
+        """Загружает снимок и доигрывает журнал. Возвращает число применённых записей"""
+        snapshot_lsn, records = read_snapshot(self.snapshot_path)
+
+        # Метрика, записанная между фиксацией LSN и чтением состояния, есть и в снимке,
+        # и в хвосте журнала: вычитаем такие записи по полному содержимому, поштучно
+        snapshot_metrics: Counter = Counter()
+        self.replaying = True
+        try:
+            applied = 0
+            for record_type, payload in records:
+                if record_type == METRIC:
+                    snapshot_metrics[payload] += 1
+                applied += self._apply(record_type, payload, pool, validators, reputation)
+
+            for _, record_type, payload in self.wal.replay(after_lsn=snapshot_lsn):
+                if record_type == METRIC and snapshot_metrics[payload] > 0:
+                    snapshot_metrics[payload] -= 1
+                    continue
+                applied += self._apply(record_type, payload, pool, validators, reputation)
+            return applied
+        finally:
+            self.replaying = False
+
+    def close(self):
+        self.wal.close()
+
+    def _snapshot_records(self, pool, validators, reputation) -> Iterator[Tuple[int, bytes]]:
+        if pool is not None:
+            for tx in pool.snapshot_transactions():
+                yield TX_ADMIT, tx.to_bytes()
+        if validators is not None:
+            for address, stake in validators.get_stakes().items():
+                yield STAKE, _pack_str(address) + _STAKE.pack(stake)
+        if reputation is not None:
+            for address, metrics in reputation.snapshot_metrics().items():
+                for metric in metrics:
+                    yield METRIC, self._encode_metric(address, metric.metric_type.value,
+                                                      metric.value, metric.timestamp,
+                                                      metric.source)
+
+    def _apply(self, record_type: int, payload: bytes, pool, validators, reputation) -> int:
+        if record_type == TX_ADMIT and pool is not None:
+            pool.add_transaction(Transaction.from_bytes(payload))
+        elif record_type == TX_REMOVE and pool is not None:
+            pool.remove_transactions([payload[i:i + _HASH_SIZE].hex()
+                                      for i in range(0, len(payload), _HASH_SIZE)])
+        elif record_type == STAKE and validators is not None:
+            address, offset = _unpack_str(payload, 0)
+            (stake,) = _STAKE.unpack_from(payload, offset)
+            validators.restore_stake(address, stake)
+        elif record_type == METRIC and reputation is not None:
+            reputation.restore_metric(*self._decode_metric(payload))
+        else:
+            return 0
+        return 1
+
+    @staticmethod
+    def _encode_metric(address: str, metric_type: str, value: float, timestamp: float,
+                       source: str) -> bytes:
+        return b"".join((_pack_str(address), _pack_str(metric_type),
+                         _METRIC_VALUES.pack(value, timestamp), _pack_str(source)))
+
+    @staticmethod
+    def _decode_metric(payload: bytes) -> Tuple[str, str, float, float, str]:
+        address, offset = _unpack_str(payload, 0)
+        metric_type, offset = _unpack_str(payload, offset)
+        value, timestamp = _METRIC_VALUES.unpack_from(payload, offset)
+        source, _ = _unpack_str(payload, offset + _METRIC_VALUES.size)
+        return address, metric_type, value, timestamp, source
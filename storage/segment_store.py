@@ -0,0 +1,184 @@
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+# Запись индекса: hash, offset, length, timestamp, height, tx_count, tx_bytes,
+# длина имени майнера, количество родителей; далее имя майнера и хэши родителей
+_INDEX_RECORD = struct.Struct(">32sQIdIIQHH")
+_HASH_SIZE = 32
+
+_SEGMENT_DATA = "segment_{:06d}.dat"
+_SEGMENT_INDEX = "segment_{:06d}.idx"
+
+
+class IndexEntry(NamedTuple):
+    block_hash: str
+    segment: int
+    offset: int
+    length: int
+    timestamp: float
+    height: int
+    tx_count: int
+    tx_bytes: int
+    miner: str
+    parents: Tuple[str, ...]
+
+
+class SegmentBlockStore:
+    """Append-only хранилище блоков шарда в сегментных файлах.
+
+    Каждый сегмент - пара файлов: .dat с закодированными блоками подряд и
+    .idx с индексными записями (смещение, длина и метаданные блока для
+    восстановления tips/высот без декодирования самих блоков). Чтение идёт
+    через mmap и возвращает memoryview без копирования.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024,
+                 sync_writes: bool = False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.sync_writes = sync_writes
+        self.lock = threading.Lock()
+
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._data_file = None
+        self._index_file = None
+        self._active_segment = 0
+        self._active_size = 0
+
+        os.makedirs(directory, exist_ok=True)
+        segments = self._list_segments()
+        if segments:
+            self._truncate_torn_tail(segments[-1])
+        self._open_segment(segments[-1] if segments else 0)
+
+    def append(self, block_hash: str, data: bytes, timestamp: float, height: int,
+               parents: List[str], tx_count: int, tx_bytes: int, miner: str) -> IndexEntry:
+        """Дописывает блок в активный сегмент и возвращает его индексную запись"""
+        with self.lock:
+            if self._active_size and self._active_size + len(data) > self.segment_bytes:
+                self._open_segment(self._active_segment + 1)
+
+            offset = self._active_size
+            self._data_file.write(data)
+            self._active_size += len(data)
+
+            miner_raw = miner.encode()
+            record = [
+                _INDEX_RECORD.pack(bytes.fromhex(block_hash), offset, len(data), timestamp,
+                                   height, tx_count, tx_bytes, len(miner_raw), len(parents)),
+                miner_raw,
+            ]
+            record.extend(bytes.fromhex(h) for h in parents)
+            self._index_file.write(b"".join(record))
+
+            # Индекс пишется после данных: при сбое запись без данных не появится
+            self._data_file.flush()
+            self._index_file.flush()
+            if self.sync_writes:
+                os.fsync(self._data_file.fileno())
+                os.fsync(self._index_file.fileno())
+
+            return IndexEntry(block_hash, self._active_segment, offset, len(data), timestamp,
+                              height, tx_count, tx_bytes, miner, tuple(parents))
+
+    def read(self, entry: IndexEntry) -> memoryview:
+        """Возвращает закодированный блок как memoryview над mmap сегмента"""
+        with self.lock:
+            segment_map = self._maps.get(entry.segment)
+            if segment_map is None or len(segment_map) < entry.offset + entry.length:
+                segment_map = self._map_segment(entry.segment)
+            return memoryview(segment_map)[entry.offset:entry.offset + entry.length]
+
+    def iter_index(self) -> Iterator[IndexEntry]:
+        """Перебирает индексные записи всех сегментов в порядке записи"""
+        for segment in self._list_segments():
+            for entry, _ in self._scan_segment(segment):
+                yield entry
+
+    def _scan_segment(self, segment: int) -> Iterator[Tuple[IndexEntry, int]]:
+        """Разбирает .idx сегмента; останавливается на оборванной записи"""
+        data_path = os.path.join(self.directory, _SEGMENT_DATA.format(segment))
+        data_size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        with open(os.path.join(self.directory, _SEGMENT_INDEX.format(segment)), "rb") as f:
+            raw = f.read()
+
+        offset = 0
+        while offset + _INDEX_RECORD.size <= len(raw):
+            (block_hash, data_offset, length, timestamp, height, tx_count, tx_bytes,
+             miner_len, parent_count) = _INDEX_RECORD.unpack_from(raw, offset)
+            end = offset + _INDEX_RECORD.size + miner_len + parent_count * _HASH_SIZE
+            if end > len(raw) or data_offset + length > data_size:
+                break
+
+            position = offset + _INDEX_RECORD.size
+            miner = raw[position:position + miner_len].decode()
+            position += miner_len
+            parents = tuple(raw[p:p + _HASH_SIZE].hex()
+                            for p in range(position, end, _HASH_SIZE))
+            yield IndexEntry(block_hash.hex(), segment, data_offset, length, timestamp,
+                             height, tx_count, tx_bytes, miner, parents), end
+            offset = end
+
+    def _truncate_torn_tail(self, segment: int):
+        """Обрезает активный сегмент до последней целой записи после сбоя"""
+        index_end = data_end = 0
+        for entry, end in self._scan_segment(segment):
+            index_end = end
+            data_end = entry.offset + entry.length
+        for name, size in ((_SEGMENT_INDEX, index_end), (_SEGMENT_DATA, data_end)):
+            path = os.path.join(self.directory, name.format(segment))
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def flush(self):
+        with self.lock:
+            self._data_file.flush()
+            self._index_file.flush()
+            os.fsync(self._data_file.fileno())
+            os.fsync(self._index_file.fileno())
+
+    def close(self):
+        with self.lock:
+            for segment_map in self._maps.values():
+                self._close_map(segment_map)
+            self._maps.clear()
+            if self._data_file:
+                self._data_file.close()
+                self._index_file.close()
+                self._data_file = self._index_file = None
+
+    def _list_segments(self) -> List[int]:
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith("segment_") and name.endswith(".idx"):
+                segments.append(int(name[len("segment_"):-len(".idx")]))
+        return sorted(segments)
+
+    def _open_segment(self, segment: int):
+        if self._data_file:
+            self._data_file.close()
+            self._index_file.close()
+        self._active_segment = segment
+        self._data_file = open(os.path.join(self.directory, _SEGMENT_DATA.format(segment)), "ab")
+        self._index_file = open(os.path.join(self.directory, _SEGMENT_INDEX.format(segment)), "ab")
+        self._active_size = self._data_file.tell()
+
+    def _map_segment(self, segment: int) -> mmap.mmap:
+        """(Пере)отображает сегмент в память; активный сегмент растёт, поэтому его мапим заново"""
+        old_map = self._maps.pop(segment, None)
+        if old_map is not None:
+            self._close_map(old_map)
+        with open(os.path.join(self.directory, _SEGMENT_DATA.format(segment)), "rb") as f:
+            segment_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[segment] = segment_map
+        return segment_map
+
+    @staticmethod
+    def _close_map(segment_map: mmap.mmap):
+        try:
+            segment_map.close()
+        except BufferError:
+            pass  # На отображение ещё ссылаются выданные memoryview
@@ -0,0 +1,216 @@
+import os
+import struct
+import threading
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+# Заголовок записи: длина payload, crc32 payload, LSN, тип записи
+_RECORD_HEADER = struct.Struct(">IIQB")
+_SNAPSHOT_HEADER = struct.Struct(">4sQ")
+_SNAPSHOT_MAGIC = b"QSNP"
+
+_SEGMENT_NAME = "wal_{:020d}.log"
+
+
+def encode_record(lsn: int, record_type: int, payload: bytes) -> bytes:
+    return _RECORD_HEADER.pack(len(payload), zlib.crc32(payload), lsn, record_type) + payload
+
+
+def decode_records(data: bytes) -> Iterator[Tuple[int, int, bytes]]:
+    """Разбирает последовательность записей; останавливается на оборванной или битой"""
+    view = memoryview(data)
+    offset = 0
+    while offset + _RECORD_HEADER.size <= len(view):
+        length, crc, lsn, record_type = _RECORD_HEADER.unpack_from(view, offset)
+        start = offset + _RECORD_HEADER.size
+        payload = bytes(view[start:start + length])
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            return
+        yield lsn, record_type, payload
+        offset = start + length
+
+
+class WriteAheadLog:
+    """Журнал упреждающей записи с групповым коммитом.
+
+    append() только кладёт запись в буфер и возвращает её LSN; фоновый
+    поток раз в flush_interval (или при переполнении буфера) пишет
+    накопленные записи одним write и делает один fsync на всю пачку.
+    Кому нужна гарантия долговечности, ждут её через wait_durable(lsn).
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 0.005,
+                 max_pending_bytes: int = 4 * 1024 * 1024,
+                 segment_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.max_pending_bytes = max_pending_bytes
+        self.segment_bytes = segment_bytes
+
+        self.lock = threading.Lock()
+        self._flushed = threading.Condition(self.lock)
+        self._io_lock = threading.Lock()
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        # Имя сегмента хранит первый LSN, поэтому нумерация продолжается
+        # даже если все записи уже покрыты снапшотом и удалены
+        segments = self._list_segments()
+        last_lsn = self._segment_first_lsn(segments[-1]) - 1 if segments else 0
+        for lsn, _, _ in self.replay():
+            last_lsn = max(last_lsn, lsn)
+        self._next_lsn = last_lsn + 1
+        self._written_lsn = last_lsn
+        self._durable_lsn = last_lsn
+
+        self._file = None
+        self._file_size = 0
+        self._open_segment(self._next_lsn)
+
+        self.running = True
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    @property
+    def last_lsn(self) -> int:
+        """LSN последней принятой (не обязательно записанной) записи"""
+        with self.lock:
+            return self._next_lsn - 1
+
+    def append(self, record_type: int, payload: bytes, sync: bool = False) -> int:
+        """Добавляет запись в журнал и возвращает её LSN"""
+        with self.lock:
+            lsn = self._next_lsn
+            self._next_lsn += 1
+            record = encode_record(lsn, record_type, payload)
+            self._pending.append(record)
+            self._pending_bytes += len(record)
+            if self._pending_bytes >= self.max_pending_bytes:
+                self._flushed.notify_all()
+        if sync:
+            self.wait_durable(lsn)
+        return lsn
+
+    def wait_durable(self, lsn: int, timeout: Optional[float] = None) -> bool:
+        """Ждёт, пока запись с данным LSN будет записана и сброшена на диск"""
+        with self.lock:
+            while self._durable_lsn < lsn:
+                self._flushed.notify_all()
+                if not self._flushed.wait(timeout) and timeout is not None:
+                    return self._durable_lsn >= lsn
+            return True
+
+    def flush(self):
+        """Синхронно записывает всё накопленное"""
+        with self._io_lock:
+            self._write_pending()
+
+    def replay(self, after_lsn: int = 0) -> Iterator[Tuple[int, int, bytes]]:
+        """Перебирает записи (lsn, type, payload) с LSN больше after_lsn"""
+        for name in self._list_segments():
+            with open(os.path.join(self.directory, name), "rb") as f:
+                data = f.read()
+            for lsn, record_type, payload in decode_records(data):
+                if lsn > after_lsn:
+                    yield lsn, record_type, payload
+
+    def truncate_before(self, lsn: int):
+        """Удаляет сегменты, все записи которых имеют LSN не больше lsn (покрыты снапшотом)"""
+        with self._io_lock:
+            self._write_pending()
+            with self.lock:
+                next_lsn = self._next_lsn
+            self._open_segment(next_lsn)
+
+            segments = self._list_segments()
+            for current, following in zip(segments, segments[1:]):
+                if self._segment_first_lsn(following) <= lsn + 1:
+                    os.remove(os.path.join(self.directory, current))
+
+    def close(self):
+        self.running = False
+        with self.lock:
+            self._flushed.notify_all()
+        self._flusher.join()
+        with self._io_lock:
+            self._write_pending()
+            self._file.close()
+
+    def _flush_loop(self):
+        while self.running:
+            with self.lock:
+                if not self._pending:
+                    self._flushed.wait(self.flush_interval)
+            with self._io_lock:
+                self._write_pending()
+
+    def _write_pending(self):
+        """Пишет накопленные записи одним вызовом и делает один fsync (вызывается под _io_lock)"""
+        with self.lock:
+            if not self._pending:
+                return
+            batch = self._pending
+            last_lsn = self._next_lsn - 1
+            self._pending = []
+            self._pending_bytes = 0
+
+        if self._file_size >= self.segment_bytes:
+            self._open_segment(self._written_lsn + 1)
+        data = b"".join(batch)
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file_size += len(data)
+        self._written_lsn = last_lsn
+
+        with self.lock:
+            self._durable_lsn = last_lsn
+            self._flushed.notify_all()
+
+    def _open_segment(self, first_lsn: int):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.directory, _SEGMENT_NAME.format(first_lsn))
+        self._file = open(path, "ab")
+        self._file_size = self._file.tell()
+
+    def _list_segments(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.startswith("wal_") and name.endswith(".log"))
+
+    @staticmethod
+    def _segment_first_lsn(name: str) -> int:
+        return int(name[len("wal_"):-len(".log")])
+
+
+def write_snapshot(path: str, lsn: int, records: Iterator[Tuple[int, bytes]]):
+    """Атомарно записывает снапшот: записи в формате журнала, покрывающие LSN <= lsn"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, lsn))
+        for record_type, payload in records:
+            f.write(encode_record(0, record_type, payload))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    directory_fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
+
+
+def read_snapshot(path: str) -> Tuple[int, List[Tuple[int, bytes]]]:
+    """Читает снапшот, возвращает (lsn, [(type, payload)]); без снапшота - (0, [])"""
+    if not os.path.exists(path):
+        return 0, []
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, lsn = _SNAPSHOT_HEADER.unpack_from(data, 0)
+    if magic != _SNAPSHOT_MAGIC:
+        raise ValueError(f"Not a snapshot file: {path}")
+    records = [(record_type, payload)
+               for _, record_type, payload in decode_records(data[_SNAPSHOT_HEADER.size:])]
+    return lsn, records
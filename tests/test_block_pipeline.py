@@ -0,0 +1,87 @@
+import time
+from concurrent.futures import Future
+
+from core.block_pipeline import BlockProductionPipeline
+from dag.dag_shard import DAGShard
+from transactions.transaction import ShardedTransactionPool, Transaction
+
+
+class _Validator:
+    def __init__(self, address, sk="key"):
+        self.address = address
+        self.sphincs_sk = sk
+        self.ntru_sk = sk
+
+
+class _Crypto:
+    def sign_async(self, message, private_key, algorithm):
+        if private_key == "broken":
+            raise RuntimeError("signer unavailable")
+        future = Future()
+        future.set_result(b"sig")
+        return future
+
+
+class _Sizer:
+    def observe_sign(self, seconds):
+        pass
+
+    def observe_build(self, seconds, transactions):
+        pass
+
+
+class _Network:
+    def broadcast_block(self, block):
+        pass
+
+
+class _Chain:
+    """Минимальная цепочка: шард 1 не может подписать, шард 2 отвергает вставку"""
+
+    def __init__(self, shard_count: int = 4):
+        self.block_time = 0.005
+        self.dag_shards = [DAGShard(shard_id=i) for i in range(shard_count)]
+        self.transactions_pool = ShardedTransactionPool(shard_count)
+        self.crypto = _Crypto()
+        self.block_sizer = _Sizer()
+        self.network = _Network()
+        self.validators = [_Validator(f"v{i}", "broken" if i == 1 else "key")
+                           for i in range(shard_count)]
+
+    def current_slot(self) -> int:
+        return 0
+
+    def leader_for(self, shard, slot):
+        return self.validators[shard.shard_id]
+
+    def take_batch(self, shard):
+        return self.transactions_pool.get_batch(shard.shard_id, 3)
+
+    def commit_block(self, shard, block, validator, start_time):
+        time.sleep(0.01)  # Медленная вставка: очереди заполняются
+        return shard.shard_id != 2 and shard.add_block(block)
+
+
+def test_pipeline_returns_transactions_of_failed_blocks_to_pool():
+    """Все шарды работают одновременно; транзакции не теряются ни на одном пути"""
+    chain = _Chain()
+    txs = [Transaction(f"sender{i}", "bob", 1.0) for i in range(200)]
+    for tx in txs:
+        chain.transactions_pool.add_transaction(tx)
+
+    pipeline = BlockProductionPipeline(chain, queue_size=1)
+    pipeline.start()
+    time.sleep(0.3)
+    pipeline.stop()
+
+    included = [tx.hash for shard in chain.dag_shards for block in shard.blocks
+                for tx in block.transactions]
+    assert included
+    assert not chain.dag_shards[1].blocks and not chain.dag_shards[2].blocks
+    pooled = [tx.hash for tx in txs if chain.transactions_pool.contains(tx.hash)]
+    assert sorted(included + pooled) == sorted(tx.hash for tx in txs)
+
+    stats = pipeline.get_stats()
+    assert stats["failed"] > 0 and stats["rejected"] > 0
+    assert stats["returned_transactions"] > 0
+    assert all(depth == 0 for name, depth in stats["queue_depths"].items() if name != "broadcast")
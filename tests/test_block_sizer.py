@@ -0,0 +1,29 @@
+from core.block_sizer import BlockSizeController
+
+
+def test_block_sizer_limited_by_depth_and_gas():
+    """Размер пакета не превышает глубину пула и потолок газа"""
+    sizer = BlockSizeController(block_time=0.5, max_block_gas=21_000 * 50, gas_per_tx=21_000)
+
+    assert sizer.next_batch_size(20) == 20
+    assert sizer.get_metrics()["last_limit"] == "depth"
+
+    assert sizer.next_batch_size(10_000) == 50
+    metrics = sizer.get_metrics()
+    assert metrics["last_limit"] == "gas"
+    assert metrics["decisions"] == 2
+    assert metrics["avg_batch_size"] == 35
+
+
+def test_block_sizer_scales_with_measured_latency():
+    """Бюджет времени пересчитывается по измеренной стоимости транзакции"""
+    sizer = BlockSizeController(block_time=1.0, target_utilization=1.0, smoothing=1.0)
+    assert sizer.next_batch_size(10**9) == sizer.initial_batch
+
+    sizer.observe_build(0.01, 100)  # 0.1 мс на транзакцию
+    assert sizer.next_batch_size(10**9) == 10_000
+
+    # Подпись дольше block_time: блоки реже, но крупнее
+    sizer.observe_sign(4.0)
+    assert sizer.next_batch_size(10**9) == 40_000
+    assert sizer.get_metrics()["last_limit"] == "time"
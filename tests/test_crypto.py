@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("pqcrypto")
+
+from crypto.quantum_chain import QuantumCrypto
+
+
+@pytest.fixture
+def crypto():
+    instance = QuantumCrypto(max_workers=2)
+    yield instance
+    instance.close()
+
+
+def _signed(crypto, count: int):
+    sk, pk = crypto.generate_keypair("ntru")
+    return [(b"block%d" % i, crypto.sign(b"block%d" % i, sk, "ntru"), pk, "ntru")
+            for i in range(count)]
+
+
+def test_unknown_algorithm_is_rejected(crypto):
+    items = _signed(crypto, 1)
+    message, signature, pk, _ = items[0]
+    assert not crypto.verify(message, signature, pk, "rsa")
+    assert crypto.verify_batch([(message, signature, pk, "rsa")]) == [False]
+
+
+def test_verify_batch_mixed_valid_and_invalid(crypto):
+    items = _signed(crypto, 6)
+    # Подпись от другого сообщения и испорченная подпись
+    items[1] = (items[1][0], items[2][1], items[1][2], "ntru")
+    items[4] = (items[4][0], bytes(len(items[4][1])), items[4][2], "ntru")
+
+    assert crypto.verify_batch(items) == [True, False, True, True, False, True]
+    stats = crypto.verify_cache.get_stats()
+    assert stats["size"] == 4  # В кэш попадают только верные подписи
+
+
+def test_verify_batch_uses_cache_on_repeat(crypto):
+    items = _signed(crypto, 4)
+    assert crypto.verify_batch(items) == [True] * 4
+    hits = crypto.verify_cache.get_stats()["hits"]
+    assert crypto.verify_batch(items) == [True] * 4
+    assert crypto.verify_cache.get_stats()["hits"] == hits + 4
+
+
+def test_cached_signature_does_not_cover_tampered_copy(crypto):
+    message, signature, pk, algorithm = _signed(crypto, 1)[0]
+    assert crypto.verify(message, signature, pk, algorithm)
+
+    tampered = bytes([signature[0] ^ 1]) + signature[1:]
+    assert not crypto.verify(message, tampered, pk, algorithm)
+    assert crypto.verify_batch([(message, signature, pk, algorithm),
+                                (message, tampered, pk, algorithm)]) == [True, False]
@@ -0,0 +1,134 @@
+from dag.dag_block import DAGBlock
+from dag.dag_shard import DAGShard
+from dag.sync import DAGSyncEngine, LocalSyncPeer
+from transactions.transaction import Transaction
+
+
+def _extend(shard: DAGShard, count: int, miner: str = "miner"):
+    for i in range(count):
+        txs = [Transaction(miner, "bob", float(i), nonce=i)]
+        shard.add_block(DAGBlock(shard.shard_id, txs, miner, shard.select_parents()))
+
+
+def _replica(source: DAGShard, **kwargs) -> DAGShard:
+    replica = DAGShard(shard_id=source.shard_id, checkpoint_interval=source.checkpoint_interval,
+                       **kwargs)
+    for block in source.blocks:
+        replica.add_block(DAGBlock.from_bytes(block.to_bytes()))
+    return replica
+
+
+def test_sync_fetches_only_differing_ranges():
+    """Совпадающие диапазоны не запрашиваются, недостающие блоки догружаются"""
+    remote = DAGShard(shard_id=0, checkpoint_interval=4)
+    _extend(remote, 12)
+    local = _replica(remote)
+    _extend(remote, 6)
+
+    engine = DAGSyncEngine([local])
+    added = engine.sync_with(LocalSyncPeer([remote]))
+
+    assert added == 6
+    assert local.get_checkpoints() == remote.get_checkpoints()
+    assert sorted(local.get_tips()) == sorted(remote.get_tips())
+    stats = engine.get_stats()
+    assert stats["ranges_fetched"] == 2  # [8, 12) с новыми блоками и [12, 16)
+    assert engine.sync_with(LocalSyncPeer([remote])) == 0
+
+
+def test_sync_merges_divergent_branches_and_validates():
+    remote = DAGShard(shard_id=0, checkpoint_interval=4)
+    _extend(remote, 3)
+    local = _replica(remote)
+    _extend(remote, 3, miner="remote")
+    _extend(local, 2, miner="local")
+
+    rejected_miner = []
+
+    def validate(blocks):
+        return [block.miner != "remote" or not rejected_miner for block in blocks]
+
+    engine = DAGSyncEngine([local], validate=validate)
+    assert engine.sync_with(LocalSyncPeer([remote])) == 3
+    assert local.get_shard_stats()["block_count"] == 8
+
+    rejected_miner.append(True)
+    _extend(remote, 1, miner="remote")
+    assert engine.sync_with(LocalSyncPeer([remote])) == 0
+    assert engine.get_stats()["blocks_rejected"] == 1
+
+
+class _ForgingPeer(LocalSyncPeer):
+    """Отдаёт подлинные заголовки с подменёнными транзакциями или обрезанные блоки"""
+
+    def __init__(self, shards, peer_id: str = "forger", truncate: int = 0):
+        super().__init__(shards, peer_id)
+        self.truncate = truncate
+
+    def get_ranges(self, shard_id, starts):
+        forged = []
+        for data in super().get_ranges(shard_id, starts):
+            if self.truncate:
+                forged.append(data[:-self.truncate])
+                continue
+            block = DAGBlock.from_bytes(data)
+            block.transactions = [Transaction("mallory", "mallory", 1_000.0)]
+            forged.append(block.to_bytes())
+        return forged
+
+
+def test_sync_bans_peer_sending_forged_bodies():
+    remote = DAGShard(shard_id=0, checkpoint_interval=4)
+    _extend(remote, 6)
+    local = DAGShard(shard_id=0, checkpoint_interval=4)
+
+    engine = DAGSyncEngine([local])
+    peer = _ForgingPeer([remote], peer_id="forger")
+    assert engine.sync_with(peer) == 0
+    assert local.get_shard_stats()["block_count"] == 0
+    assert "forger" in engine.banned_peers
+    assert engine.sync_with(peer) == 0
+    assert engine.get_stats()["peers_banned"] == 1
+
+
+def test_sync_bans_peer_sending_truncated_blocks():
+    """Обрезанный блок - ValueError, а не struct.error: пир отвергается, раунд продолжается"""
+    remote = DAGShard(shard_id=0, checkpoint_interval=4)
+    _extend(remote, 6)
+    honest = LocalSyncPeer([remote], peer_id="honest")
+    local = DAGShard(shard_id=0, checkpoint_interval=4)
+    engine = DAGSyncEngine([local])
+
+    for truncate in (20, 200):
+        peer = _ForgingPeer([remote], peer_id=f"truncator{truncate}", truncate=truncate)
+        assert engine.sync_with(peer) == 0
+        assert peer.peer_id in engine.banned_peers
+    assert engine.sync_with(honest) == 6
+
+
+def test_pruned_ranges_without_store_are_not_served():
+    """Шард без хранилища не выдаёт заголовки вытесненных блоков за полные блоки"""
+    remote = DAGShard(shard_id=0, checkpoint_interval=4, finality_depth=2)
+    _extend(remote, 8)  # Высоты 0..7, тела до высоты 5 вытеснены
+    assert remote.get_shard_stats()["pruned_blocks"] == 6
+
+    assert sorted(remote.get_checkpoints()) == []  # Диапазон [4, 8) содержит вытесненные тела
+    assert remote.get_range_data([0, 4]) == []
+
+    local = DAGShard(shard_id=0, checkpoint_interval=4)
+    engine = DAGSyncEngine([local])
+    assert engine.sync_with(LocalSyncPeer([remote])) == 0
+    assert engine.get_stats()["peers_banned"] == 0
+
+
+    # Обратная сторона: шард с вытесненными телами не перекачивает свои
+    # финализированные диапазоны у полного пира на каждом раунде
+    full = DAGShard(shard_id=0, checkpoint_interval=4)
+    _extend(full, 20)
+    pruned = _replica(full, finality_depth=6)
+    assert pruned.get_servable_start() == 16
+    engine = DAGSyncEngine([pruned])
+    for _ in range(3):
+        assert engine.sync_with(LocalSyncPeer([full])) == 0
+    stats = engine.get_stats()
+    assert (stats["ranges_fetched"], stats["blocks_received"]) == (0, 0)
@@ -0,0 +1,59 @@
+import hashlib
+
+from dag.dag_block import DAGBlock
+from dag.merkle import EMPTY_ROOT, MerkleTree
+from transactions.transaction import Transaction
+
+
+def _leaves(count):
+    return [hashlib.sha3_256(b"tx%d" % i).hexdigest() for i in range(count)]
+
+
+def _reference_root(leaves):
+    level = [bytes.fromhex(h) for h in leaves]
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha3_256(level[i] + level[i + 1]).digest()
+                 for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def test_merkle_root_matches_reference():
+    """Корень совпадает с наивным построением, включая непарные узлы"""
+    assert MerkleTree([]).root == EMPTY_ROOT
+    for count in (1, 2, 3, 7, 100):
+        leaves = _leaves(count)
+        assert MerkleTree(leaves).root == _reference_root(leaves)
+
+
+def test_merkle_parallel_levels_match_serial():
+    leaves = _leaves(1001)
+    serial = MerkleTree(leaves, workers=1)
+    parallel = MerkleTree(leaves, workers=4, parallel_threshold=8)
+    assert parallel.levels == serial.levels
+
+
+def test_merkle_proofs_verify_for_every_leaf():
+    leaves = _leaves(13)
+    tree = MerkleTree(leaves)
+    for leaf in leaves:
+        proof = tree.get_proof(leaf)
+        assert len(proof) == len(tree.levels) - 1
+        assert MerkleTree.verify_proof(leaf, proof, tree.root)
+        assert tree.get_proof(leaf) is proof  # Доказательство закэшировано
+
+    proof = tree.get_proof(leaves[0])
+    assert not MerkleTree.verify_proof(leaves[1], proof, tree.root)
+    assert tree.get_proof("ff" * 32) is None
+
+
+def test_block_merkle_proof_after_decoding():
+    """Декодированный блок строит дерево лениво и даёт те же доказательства"""
+    txs = [Transaction(f"sender{i}", "bob", 1.0) for i in range(5)]
+    block = DAGBlock(shard_id=0, transactions=txs, miner="miner", previous_hashes=[])
+    restored = DAGBlock.from_bytes(block.to_bytes())
+
+    proof = restored.get_merkle_proof(txs[3].hash)
+    assert proof == block.get_merkle_proof(txs[3].hash)
+    assert block.verify_merkle_proof(txs[3].hash, proof)
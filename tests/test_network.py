@@ -0,0 +1,157 @@
+import socket
+import time
+
+import pytest
+
+from dag.dag_block import DAGBlock
+from network.compact import CompactBlock, reconstruct
+from network.framing import KIND_BLOCKS, decode_body, encode_frame, encode_frames
+from network.p2p import P2PNetwork, SeenSet
+from transactions.transaction import Transaction
+
+
+def _wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_frame_roundtrip_batches_items():
+    items = [b"a", b"", b"xyz" * 100]
+    frame = encode_frame(KIND_BLOCKS, items)
+    kind, decoded = decode_body(frame[4:])
+    assert kind == KIND_BLOCKS
+    assert [bytes(item) for item in decoded] == items
+
+
+def test_malformed_frames_raise_value_error():
+    for body in (b"\x01", b"\x01\x00\x00\x00\x01\x00", encode_frame(KIND_BLOCKS, [b"ab"])[4:-1]):
+        with pytest.raises(ValueError):
+            decode_body(body)
+
+
+def test_large_batches_are_split_by_size():
+    items = [bytes(100)] * 10
+    frames = encode_frames(KIND_BLOCKS, items, max_bytes=350)
+    assert len(frames) == 4  # По три элемента в кадре
+    decoded = [bytes(item) for frame in frames for item in decode_body(frame[4:])[1]]
+    assert decoded == items
+    with pytest.raises(ValueError):
+        encode_frames(KIND_BLOCKS, [bytes(400)], max_bytes=350)
+
+
+def test_seen_set_is_bounded_lru():
+    seen = SeenSet(max_entries=2)
+    assert seen.add((1, "a"))
+    assert seen.add((1, "b"))
+    assert not seen.add((1, "a"))
+    assert seen.add((1, "c"))  # Вытесняет "b"
+    assert len(seen) == 2
+    assert seen.add((1, "b"))
+
+
+def test_gossip_reaches_all_local_peers_once():
+    """Рассылка по цепочке пиров через loopback без повторной доставки"""
+    nodes = [P2PNetwork(0) for _ in range(4)]
+    received = [[] for _ in nodes]
+    for node, inbox in zip(nodes, received):
+        node.on_blocks = inbox.extend
+        node.on_transactions = inbox.extend
+        node.start()
+    try:
+        # Кольцо: сообщения возвращаются к отправителю и должны отсекаться
+        for i, node in enumerate(nodes):
+            node.connect("127.0.0.1", nodes[(i + 1) % len(nodes)].port)
+        assert _wait_for(lambda: all(len(node.get_peers()) == 2 for node in nodes))
+
+        blocks = [DAGBlock(0, [], f"miner{i}", []) for i in range(20)]
+        for block in blocks:
+            nodes[0].broadcast_block(block)
+        tx = Transaction("alice", "bob", 1.0)
+        nodes[0].broadcast_transaction(tx)
+
+        assert _wait_for(lambda: all(len(inbox) == 21 for inbox in received[1:]))
+        assert sorted(b.hash for b in received[1] if isinstance(b, DAGBlock)) == \
+            sorted(b.hash for b in blocks)
+        assert received[0] == []
+        assert _wait_for(lambda: sum(node.get_stats()["duplicates"] for node in nodes) > 0)
+
+        stats = nodes[0].get_stats()
+        assert stats["frames_sent"] < stats["items_sent"]  # Пачки, а не кадр на блок
+        assert stats["fanout_latency_p99"] is not None
+    finally:
+        for node in nodes:
+            node.stop()
+
+
+def test_compact_block_reconstructs_from_pool_and_fills_missing():
+    txs = [Transaction(f"sender{i}", "bob", 1.0) for i in range(10)]
+    block = DAGBlock(0, txs, "miner", [])
+    block.add_signature("sphincs", b"sig")
+    announced = CompactBlock.from_bytes(CompactBlock.from_block(block).to_bytes())
+    assert len(announced.to_bytes()) < len(block.to_bytes()) // 3
+
+    rebuilt, _ = reconstruct(announced, reversed(txs))
+    assert rebuilt.hash == block.hash
+    assert rebuilt.to_bytes() == block.to_bytes()
+
+    rebuilt, pending = reconstruct(announced, txs[:7])
+    assert rebuilt is None
+    assert pending.missing == [7, 8, 9]
+    assert pending.fill(txs[7:]).to_bytes() == block.to_bytes()
+
+
+def test_compact_relay_requests_only_missing_transactions():
+    txs = [Transaction(f"sender{i}", "bob", 1.0) for i in range(50)]
+    sender, receiver = P2PNetwork(0), P2PNetwork(0)
+    received = []
+    receiver.on_blocks = received.extend
+    receiver.mempool_view = lambda shard_id: txs[:40]
+    for node in (sender, receiver):
+        node.start()
+    try:
+        sender.connect("127.0.0.1", receiver.port)
+        assert _wait_for(lambda: receiver.get_peers())
+        block = DAGBlock(0, txs, "miner", [])
+        sender.broadcast_block(block)
+
+        assert _wait_for(lambda: len(received) == 1)
+        assert received[0].to_bytes() == block.to_bytes()
+        assert receiver.get_stats()["missing_requested"] == 10
+    finally:
+        sender.stop()
+        receiver.stop()
+
+
+def test_forged_block_body_drops_peer_and_is_not_delivered():
+    node = P2PNetwork(0)
+    inbox = []
+    node.on_blocks = inbox.extend
+    node.start()
+    try:
+        block = DAGBlock(0, [Transaction("alice", "bob", 1.0)], "miner", [])
+        forged = DAGBlock.from_bytes(block.to_bytes())
+        forged.transactions = [Transaction("mallory", "mallory", 1_000.0)]
+        with socket.create_connection(("127.0.0.1", node.port)) as sock:
+            assert _wait_for(lambda: len(node.get_peers()) == 1)
+            sock.sendall(encode_frame(KIND_BLOCKS, [forged.to_bytes()]))
+            assert _wait_for(lambda: node.get_peers() == [])
+        assert inbox == []
+        assert node.get_stats()["decode_errors"] == 1
+    finally:
+        node.stop()
+
+
+def test_garbage_frame_drops_peer():
+    node = P2PNetwork(0)
+    node.start()
+    try:
+        with socket.create_connection(("127.0.0.1", node.port)) as sock:
+            assert _wait_for(lambda: len(node.get_peers()) == 1)
+            sock.sendall(b"\x00\x00\x00\x01\x01")
+            assert _wait_for(lambda: node.get_peers() == [])
+    finally:
+        node.stop()
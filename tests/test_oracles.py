@@ -0,0 +1,152 @@
+import hashlib
+import threading
+import time
+
+import pytest
+
+from consensys.oracles import FixtureOracleServer, OracleBackend, OracleClient, QualityOracle
+from consensys.validator import ValidatorManager
+
+COMMITS = {"alice": [{"commit": {"author": {"date": "2026-01-01"}},
+                      "stats": {"additions": 120, "deletions": 30}}]}
+
+
+def _wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def _forum_fixture(address: str):
+    forum_id = hashlib.sha256(address.encode()).hexdigest()[:16]
+    return {forum_id: {"posts_count": 10, "helpful_answers": 5, "reputation_score": 80.0}}
+
+
+def test_metrics_are_cached_and_concurrent_requests_coalesce():
+    server = FixtureOracleServer(COMMITS, _forum_fixture("val1"), latency=0.1).start()
+    oracle = QualityOracle(OracleClient(server.backend()))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        oracle.fetch_validator_metrics("val1", "alice"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert server.requests == 2  # По одному запросу на GitHub и форум
+    assert results[0]["github_contributions"]["lines_added"] == 120
+    assert results[0]["forum_activity"]["posts_count"] == 10
+    assert all(result == results[0] for result in results)
+
+    oracle.fetch_validator_metrics("val1", "alice")
+    assert server.requests == 2
+    stats = oracle.client.get_stats()
+    assert stats["backend_calls"] == 2 and stats["hits"] == 2
+    server.stop()
+
+
+def test_stale_entry_is_served_while_refreshing():
+    server = FixtureOracleServer(COMMITS, _forum_fixture("val1"), latency=0.2).start()
+    oracle = QualityOracle(OracleClient(server.backend(), ttl=0.0))
+    first = oracle.fetch_validator_metrics("val1", "alice")
+
+    start = time.monotonic()
+    stale = oracle.fetch_validator_metrics("val1", "alice")
+    assert time.monotonic() - start < 0.2  # Не ждём обновления
+    assert stale["github_contributions"] == first["github_contributions"]
+    assert _wait_for(lambda: server.requests >= 4)
+    assert oracle.client.get_stats()["stale_hits"] >= 1
+    server.stop()
+
+
+def test_disk_cache_survives_restart_and_timeouts_are_bounded(tmp_path):
+    cache_path = str(tmp_path / "oracle_cache.json")
+    server = FixtureOracleServer(COMMITS).start()
+    client = OracleClient(server.backend(), cache_path=cache_path)
+    QualityOracle(client).fetch_validator_metrics("val1", "alice")
+    assert _wait_for(lambda: (tmp_path / "oracle_cache.json").exists())
+    client.close()
+
+    server.latency = 1.0
+    restarted = QualityOracle(OracleClient(server.backend(), timeout=0.1, cache_path=cache_path))
+    metrics = restarted.fetch_validator_metrics("val1", "alice")
+    assert metrics["github_contributions"]["commit_count"] == 1
+    assert "forum_activity" not in metrics  # 404 у форума на диск не попадает: метрика пропущена
+    start = time.monotonic()
+    assert restarted.fetch_validator_metrics("val2", "bob") == {}
+    assert time.monotonic() - start < 0.5
+    assert restarted.client.get_stats()["timeouts"] >= 1
+    server.stop()
+
+
+def test_failures_are_cached_for_failure_ttl():
+    server = FixtureOracleServer(COMMITS).start()  # Форум отвечает 404
+    client = OracleClient(server.backend(), failure_ttl=60.0)
+    oracle = QualityOracle(client)
+    for _ in range(3):
+        assert oracle.fetch_validator_metrics("val1") == {}
+    assert server.requests == 1
+    assert client.get_stats()["failure_hits"] == 2
+
+    client.failure_ttl = 0.0  # Срок истёк: ключ запрашивается снова
+    oracle.fetch_validator_metrics("val1")
+    assert server.requests == 2
+    server.stop()
+
+
+def test_cache_saves_are_coalesced_and_flushed_on_close(tmp_path):
+    cache_path = tmp_path / "oracle_cache.json"
+    server = FixtureOracleServer(COMMITS, {}).start()
+    client = OracleClient(server.backend(), cache_path=str(cache_path), save_interval=60.0)
+    for i in range(20):
+        client.submit(client.fetch(f"github:user{i}", lambda timeout: {"commit_count": 0})).result()
+    assert not cache_path.exists()  # Сохранение отложено
+    client.close()
+
+    assert client.get_stats()["cache_saves"] == 1
+    restarted = OracleClient(server.backend(), cache_path=str(cache_path))
+    assert restarted.get_stats()["cached"] == 20
+    restarted.close()
+    server.stop()
+
+
+def test_add_validator_does_not_wait_for_oracles():
+    server = FixtureOracleServer(COMMITS, _forum_fixture("val1"), latency=0.5).start()
+    manager = ValidatorManager(min_stake=100)
+    manager.quality_oracle = QualityOracle(OracleClient(server.backend()))
+    manager.running = False
+
+    start = time.monotonic()
+    manager.add_validator("val1", None, None, 1_000, github_username="alice")
+    assert time.monotonic() - start < 0.3
+    assert _wait_for(lambda: manager.reputation_system.ingest.get_stats()["enqueued"] >= 3)
+    server.stop()
+
+
+def test_oracle_backend_requires_both_methods():
+    class GitHubOnly(OracleBackend):
+        def get_contributions(self, github_username, repo_owner, repo_name, timeout):
+            return {}
+
+    with pytest.raises(TypeError):
+        GitHubOnly()
+
+
+def test_periodic_external_metrics_do_not_block_the_metrics_loop():
+    server = FixtureOracleServer(COMMITS, _forum_fixture("val1"), latency=0.5).start()
+    manager = ValidatorManager(min_stake=100)
+    manager.quality_oracle = QualityOracle(OracleClient(server.backend()))
+    manager.running = False
+    manager.add_validator("val1", None, None, 1_000)
+    validator = manager.get_validator("val1")
+    validator.github_username = "alice"
+    enqueued = manager.reputation_system.ingest.get_stats()["enqueued"]
+
+    start = time.monotonic()
+    manager._update_external_metrics(validator)
+    assert time.monotonic() - start < 0.3
+    assert _wait_for(lambda: manager.reputation_system.ingest.get_stats()["enqueued"] > enqueued)
+    server.stop()
@@ -0,0 +1,121 @@
+from consensys.metric_store import MetricHistoryStore
+from consensys.reputation import CountWindow, MetricType, ReputationSystem, SlidingWindow
+
+
+def test_sliding_window_expires_old_buckets():
+    window = SlidingWindow(window=100, bucket_seconds=10)
+    window.add(1.0, timestamp=0, now=0)
+    window.add(3.0, timestamp=50, now=50)
+    window.add(5.0, timestamp=20, now=50)  # Не по порядку
+    assert window.mean(now=50) == 3.0
+
+    assert window.mean(now=115) == 4.0  # Бакет t=0 вышел из окна
+    assert window.mean(now=1000) is None
+    assert window.total == 0.0
+
+
+def test_count_window_keeps_running_ratio():
+    history = CountWindow(maxlen=3)
+    for value in (1, 1, 0, 0):
+        history.append(value)
+    assert len(history) == 3
+    assert history.ratio() == 1 / 3
+
+
+def test_score_is_weighted_mean_of_recent_metric_types():
+    """Score = средневзвешенное средних по типам метрик внутри окна"""
+    reputation = ReputationSystem()
+    reputation.record_governance_participation("val1", "prop1", True)
+    reputation.record_governance_participation("val1", "prop2", False)
+    assert reputation.get_validator_score("val1") == 0.5
+
+    old = reputation.create_metric(MetricType.UPTIME, 1.0, "system", timestamp=0.0)
+    reputation.add_metric("val1", old)  # Старше окна: не влияет на score
+    assert reputation.get_validator_score("val1") == 0.5
+
+    reputation.record_uptime("val1", True)
+    expected = (0.5 * 0.15 + 1.0 * 0.25) / (0.15 + 0.25)
+    assert abs(reputation.get_validator_score("val1") - expected) < 1e-9
+    assert reputation.get_top_validators(1)[0][0] == "val1"
+
+
+def test_metric_history_is_bounded():
+    reputation = ReputationSystem(max_history=5)
+    for i in range(20):
+        reputation.record_block_quality("val1", f"block{i}", True, 0.1)
+    assert len(reputation.snapshot_metrics()["val1"]) == 5
+
+
+def test_metric_store_rolls_old_rows_into_buckets():
+    store = MetricHistoryStore(raw_ttl=100, rollup_seconds=50, rollup_ttl=1000,
+                               compaction_interval=4)
+    for t in (10.0, 20.0, 60.0, 500.0):
+        store.append("val1", "uptime", 1.0, t, "system", now=500.0)
+    # Сжатие после 4-й записи: строки старше 400 свёрнуты в бакеты 0 и 50
+    timestamps, values = store.window("val1", "uptime", since=0.0)
+    assert list(timestamps) == [500.0]
+    starts, sums, counts = store.rollups("val1", "uptime")
+    assert (list(starts), list(sums), list(counts)) == ([0.0, 50.0], [2.0, 1.0], [2, 1])
+
+    store.compact_all(now=1060.0)  # Бакеты старше rollup_ttl удаляются
+    assert list(store.rollups("val1", "uptime")[0]) == [500.0 - 500.0 % 50]
+
+
+def test_recent_metrics_are_windowed_by_type():
+    reputation = ReputationSystem()
+    reputation.add_metric("val1", reputation.create_metric(MetricType.UPTIME, 1.0, "system",
+                                                           timestamp=0.0))
+    reputation.record_governance_participation("val1", "prop1", True)
+    recent = reputation._get_recent_metrics("val1")
+    assert list(recent[MetricType.GOVERNANCE][1]) == [1.0]
+    assert len(recent[MetricType.UPTIME][0]) == 0
+
+
+def test_batch_scoring_recalculates_on_tick_and_weight_change():
+    changes = []
+    reputation = ReputationSystem(batch_scoring=True)
+    reputation.score_listener = lambda address, score: changes.append((address, score))
+    reputation.record_governance_participation("val1", "prop1", True)
+    reputation.record_uptime("val2", True)
+    reputation.record_governance_participation("val2", "prop1", False)
+    assert changes == [] and reputation.get_top_validators() == []
+
+    assert reputation.recalculate_all() == {"val1": 1.0, "val2": 0.25 / 0.40}
+    assert reputation.recalculate_all() == {}  # Без изменений слушатель не вызывается
+
+    changed = reputation.set_metric_weights({"uptime": 0.0})
+    assert changed == {"val2": 0.0}
+    assert reputation.get_top_validators(1) == [("val1", 1.0)]
+    assert changes[-1] == ("val2", 0.0)
+
+
+def test_recalculate_all_compacts_idle_history():
+    """Ряд без новых записей сворачивается по такту пересчёта"""
+    reputation = ReputationSystem(score_window=100, rollup_ttl=1000, batch_scoring=True)
+    reputation.metric_history.rollup_seconds = 50
+    reputation.add_metric("val1", reputation.create_metric(MetricType.UPTIME, 1.0, "system",
+                                                           timestamp=10.0))
+    history = reputation.metric_history
+    assert len(history.window("val1", MetricType.UPTIME, since=0.0)[0]) == 1
+
+    reputation.recalculate_all(now=500.0)
+    assert len(history.window("val1", MetricType.UPTIME, since=0.0)[0]) == 0
+    assert list(history.rollups("val1", MetricType.UPTIME)[2]) == [1]
+
+
+def test_ingest_queue_merges_observations_and_counts_drops():
+    reputation = ReputationSystem(ingest_queue_size=4)
+    reputation.ingest.running = False  # Применяем вручную через flush_metrics
+    reputation.ingest._worker.join()
+    for voted in (True, True, False):
+        reputation.record_governance_participation("val1", "prop", voted)
+    reputation.record_uptime("val2", True)
+    reputation.record_uptime("val2", False)  # Буфер полон: отброшено
+    assert reputation.get_validator_score("val1") == 0.0
+
+    reputation.flush_metrics()
+    stats = reputation.ingest.get_stats()
+    assert (stats["depth"], stats["dropped"], stats["applied"], stats["merged"]) == (0, 1, 4, 2)
+    assert abs(reputation.get_validator_score("val1") - 2 / 3) < 1e-9
+    assert reputation.get_validator_score("val2") == 1.0
+    assert len(reputation.snapshot_metrics()["val1"]) == 3
@@ -0,0 +1,72 @@
+from collections import Counter
+
+from consensys.schedule import AliasTable, LeaderSchedule, epoch_seed
+from dag.dag_block import DAGBlock
+from dag.dag_shard import DAGShard
+from transactions.transaction import Transaction
+
+
+class _Validator:
+    def __init__(self, address):
+        self.address = address
+
+
+def test_alias_table_matches_weights():
+    table = AliasTable([1.0, 3.0, 0.0, 4.0])
+    counts = Counter(table.sample(column, (i % 100) / 100)
+                     for i, column in enumerate(range(40_000)))
+    assert counts[2] == 0
+    assert abs(counts[1] / 40_000 - 3 / 8) < 0.02
+    assert abs(counts[3] / 40_000 - 4 / 8) < 0.02
+
+
+def test_alias_table_uniform_when_all_weights_zero():
+    table = AliasTable([0.0, 0.0])
+    assert {table.sample(column, 0.5) for column in range(10)} == {0, 1}
+
+
+def test_leader_schedule_is_deterministic_and_weighted():
+    """Одинаковый seed - одинаковое расписание; слоты распределены по весам"""
+    validators = [_Validator(f"v{i}") for i in range(4)]
+    weights = [0.1, 0.2, 0.3, 0.4]
+    schedule = LeaderSchedule(5, b"seed", validators, weights, shard_count=4, slots_per_epoch=2500)
+    again = LeaderSchedule(5, b"seed", validators, weights, shard_count=4, slots_per_epoch=2500)
+    other = LeaderSchedule(5, b"other", validators, weights, shard_count=4, slots_per_epoch=2500)
+
+    assert schedule.slots == again.slots
+    assert schedule.slots != other.slots
+    assert schedule.covers(5 * 2500) and not schedule.covers(6 * 2500)
+    assert schedule.leader(0, 5 * 2500) is schedule.slots[0][0]
+
+    counts = schedule.slot_counts()
+    assert len(counts) == 4
+    assert abs(counts["v3"] / 10_000 - 0.4) < 0.03
+    # Разные шарды в одном слоте обычно ведут разные валидаторы
+    assert any(len({schedule.slots[s][i].address for s in range(4)}) > 1 for i in range(10))
+
+
+def _chains(short_height: int, tall_height: int):
+    """Две копии одной цепочки: вторая ушла дальше первой"""
+    tall = DAGShard(shard_id=0, finality_depth=2)
+    short = DAGShard(shard_id=0, finality_depth=2)
+    for i in range(tall_height):
+        block = DAGBlock(0, [Transaction("miner", "bob", 1.0, nonce=i)], "miner",
+                         tall.select_parents())
+        tall.add_block(block)
+        if i < short_height:
+            short.add_block(DAGBlock.from_bytes(block.to_bytes()))
+    return [short], [tall]
+
+
+def test_epoch_seed_does_not_depend_on_tip_height():
+    """Две цепочки с разной высотой вершины строят одинаковое расписание эпохи"""
+    validators = [_Validator(f"v{i}") for i in range(4)]
+    weights = [0.1, 0.2, 0.3, 0.4]
+    short, tall = _chains(6, 9)
+
+    # Эпоха 1: высота seed = 1 * 4 - 2 = 2, финализирована на обеих цепочках
+    seed = epoch_seed(short, 1, slots_per_epoch=4, finality_depth=2)
+    assert seed == epoch_seed(tall, 1, slots_per_epoch=4, finality_depth=2)
+    assert (LeaderSchedule(1, seed, validators, weights, 2, 4).slots ==
+            LeaderSchedule(1, epoch_seed(tall, 1, 4, 2), validators, weights, 2, 4).slots)
+    assert seed != epoch_seed(short, 0, slots_per_epoch=4, finality_depth=2)
@@ -0,0 +1,125 @@
+import os
+import time
+
+from consensys.reputation import MetricType, ReputationSystem
+from dag.dag_block import DAGBlock
+from dag.dag_shard import DAGShard
+from storage.journal import StateJournal
+from storage.segment_store import SegmentBlockStore
+from storage.wal import WriteAheadLog
+from transactions.transaction import Transaction, TransactionPool
+
+
+def _fill_shard(shard: DAGShard, count: int):
+    for i in range(count):
+        txs = [Transaction("alice", "bob", float(i), nonce=i)]
+        shard.add_block(DAGBlock(shard.shard_id, txs, f"miner{i % 3}", shard.get_tips()))
+
+
+def test_shard_restarts_from_segment_store(tmp_path):
+    """После перезапуска шард восстанавливает tips, высоты и статистику из индекса"""
+    store = SegmentBlockStore(str(tmp_path), segment_bytes=1024)
+    shard = DAGShard(shard_id=0, store=store, hot_window=4)
+    _fill_shard(shard, 20)
+    stats = shard.get_shard_stats(include_miners=True)
+    tips = shard.get_tips()
+    hashes = shard.blocks.hashes()
+    store.close()
+
+    assert len([n for n in os.listdir(tmp_path) if n.endswith(".dat")]) > 1
+
+    reopened = DAGShard(shard_id=0, store=SegmentBlockStore(str(tmp_path)), hot_window=4)
+
+    assert reopened.get_shard_stats(include_miners=True) == stats
+    assert reopened.get_tips() == tips
+    assert reopened.blocks.hashes() == hashes
+    assert reopened.get_height(tips[0]) == 19
+    first = reopened.get_block(hashes[0])
+    assert first.hash == hashes[0]
+    assert first.transactions[0].amount == 0.0
+
+
+def test_segment_store_drops_torn_index_tail(tmp_path):
+    store = SegmentBlockStore(str(tmp_path))
+    shard = DAGShard(shard_id=0, store=store)
+    _fill_shard(shard, 3)
+    store.close()
+
+    index_path = os.path.join(tmp_path, "segment_000000.idx")
+    with open(index_path, "ab") as f:
+        f.write(b"\x00" * 10)
+
+    reopened = DAGShard(shard_id=0, store=SegmentBlockStore(str(tmp_path)))
+    assert reopened.get_shard_stats()["block_count"] == 3
+    _fill_shard(reopened, 1)
+    assert len(list(SegmentBlockStore(str(tmp_path)).iter_index())) == 4
+
+
+def test_wal_replays_records_after_restart(tmp_path):
+    wal = WriteAheadLog(str(tmp_path))
+    for i in range(100):
+        wal.append(1, i.to_bytes(4, "big"))
+    lsn = wal.append(2, b"last", sync=True)
+    wal.close()
+
+    reopened = WriteAheadLog(str(tmp_path))
+    records = list(reopened.replay(after_lsn=95))
+    assert [r[0] for r in records] == list(range(96, lsn + 1))
+    assert records[-1][1:] == (2, b"last")
+    assert reopened.append(1, b"next") == lsn + 1
+    reopened.close()
+
+
+def test_journal_recovers_pool_and_metrics_from_snapshot_and_log(tmp_path):
+    """Восстановление = снапшот + доигрывание хвоста журнала"""
+    journal = StateJournal(str(tmp_path))
+    pool = TransactionPool(journal=journal)
+    reputation = ReputationSystem(journal=journal)
+
+    txs = [Transaction(f"sender{i}", "bob", 1.0) for i in range(4)]
+    pool.add_transaction(txs[0])
+    pool.add_transaction(txs[1])
+    reputation.record_block_quality("val1", "block1", True, 0.1)
+    journal.snapshot(pool=pool, reputation=reputation)
+
+    pool.add_transaction(txs[2])
+    pool.add_transaction(txs[3])
+    pool.remove_transactions([txs[0].hash])
+    reputation.record_governance_participation("val1", "prop1", True)
+    journal.close()
+
+    recovered_journal = StateJournal(str(tmp_path))
+    recovered_pool = TransactionPool(journal=recovered_journal)
+    recovered_reputation = ReputationSystem(journal=recovered_journal)
+    recovered_journal.recover(pool=recovered_pool, reputation=recovered_reputation)
+
+    assert sorted(tx.hash for tx in recovered_pool.snapshot_transactions()) == \
+        sorted(tx.hash for tx in txs[1:])
+    assert len(recovered_reputation.snapshot_metrics()["val1"]) == 2
+    assert recovered_reputation.get_validator_score("val1") == \
+        reputation.get_validator_score("val1")
+    recovered_journal.close()
+
+
+def test_journal_recovery_keeps_older_metrics_logged_after_snapshot(tmp_path):
+    """Дубликат снимка в журнале отбрасывается, более ранняя метрика другого типа - нет"""
+    journal = StateJournal(str(tmp_path))
+    reputation = ReputationSystem()
+    now = time.time()
+    uptime = reputation.create_metric(MetricType.UPTIME, 1.0, "monitor", now)
+    reputation.restore_metric("val1", "uptime", 1.0, now, "monitor")
+    journal.snapshot(reputation=reputation)
+
+    # Запись попала в журнал уже после фиксации LSN снимка, но состояние её содержит
+    journal.log_metric("val1", uptime)
+    # Метрика пришла с опозданием: её время раньше последней метрики из снимка
+    late = reputation.create_metric(MetricType.BLOCK_QUALITY, 0.5, "block7", now - 10)
+    journal.log_metric("val1", late)
+    journal.close()
+
+    recovered_journal = StateJournal(str(tmp_path))
+    recovered = ReputationSystem()
+    assert recovered_journal.recover(reputation=recovered) == 2
+    assert sorted((m.metric_type.value, m.timestamp) for m in recovered.snapshot_metrics()["val1"]) == \
+        sorted([("uptime", now), ("block_quality", now - 10)])
+    recovered_journal.close()
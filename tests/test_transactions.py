@@ -0,0 +1,191 @@
+import pytest
+from transactions.transaction import (Transaction, TransactionPool, ShardedTransactionPool,
+                                      sender_shard_index)
+
+
+def test_transaction_hash_cached_and_invalidated():
+    """Хэш кэшируется и сбрасывается при изменении хэшируемого поля"""
+    tx = Transaction("alice", "bob", 10.0)
+    first_hash = tx.hash
+    assert tx.hash == first_hash
+
+    tx.add_signature("sphincs", b"sig")
+    assert tx.hash == first_hash
+
+    tx.fee = 0.5
+    assert tx.hash != first_hash
+
+
+def test_transaction_binary_roundtrip():
+    """to_bytes/from_bytes сохраняют поля, подписи и хэш"""
+    tx = Transaction("alice", "bob", 12.5, "stake")
+    tx.add_signature("sphincs", b"\x01" * 64)
+    tx.add_signature("ntru", b"\x02" * 32)
+
+    restored = Transaction.from_bytes(tx.to_bytes())
+
+    assert restored.hash == tx.hash
+    assert restored.to_dict() == tx.to_dict()
+    assert restored.signatures == tx.signatures
+    assert restored.size == tx.size
+
+
+def test_transaction_from_bytes_rejects_trailing_data():
+    tx = Transaction("alice", "bob", 1.0)
+    with pytest.raises(ValueError):
+        Transaction.from_bytes(tx.to_bytes() + b"\x00")
+
+
+def _tx(sender: str, fee: float, nonce: int = 0) -> Transaction:
+    tx = Transaction(sender, "bob", 1.0, nonce=nonce)
+    tx.fee = fee
+    return tx
+
+
+def test_pool_orders_by_fee_and_respects_nonce():
+    """Пул отдаёт транзакции по убыванию комиссии, но не нарушает порядок nonce"""
+    pool = TransactionPool()
+    pool.add_transaction(_tx("alice", 0.01, nonce=1))
+    pool.add_transaction(_tx("alice", 0.001, nonce=0))
+    pool.add_transaction(_tx("carol", 0.005))
+
+    batch = pool.get_batch(3)
+
+    assert [(tx.sender, tx.nonce) for tx in batch] == [("carol", 0), ("alice", 0), ("alice", 1)]
+    assert pool.get_pool_size() == 0
+
+
+def test_pool_rejects_duplicates():
+    pool = TransactionPool()
+    tx = _tx("alice", 0.01)
+    assert pool.add_transaction(tx)
+    assert not pool.add_transaction(tx)
+    assert pool.get_stats()["rejected_duplicate"] == 1
+
+
+def test_pool_evicts_lowest_fee_when_full():
+    """При заполнении пула вытесняется самая дешёвая транзакция"""
+    pool = TransactionPool(max_transactions=2)
+    cheap = _tx("alice", 0.001)
+    pool.add_transaction(cheap)
+    pool.add_transaction(_tx("bob", 0.01))
+
+    assert pool.add_transaction(_tx("carol", 0.005))
+    assert not pool.contains(cheap.hash)
+    assert not pool.add_transaction(_tx("dave", 0.0001))
+
+    stats = pool.get_stats()
+    assert stats["evicted"] == 1
+    assert stats["rejected_underpriced"] == 1
+    assert stats["size"] == 2
+
+
+def test_pool_rejection_leaves_pool_untouched():
+    """Вытеснение не начинается, если новая транзакция всё равно не поместится"""
+    cheap = [_tx("alice", 0.001), _tx("bob", 0.002), _tx("carol", 0.02)]
+    pool = TransactionPool(max_bytes=sum(tx.size for tx in cheap))
+    for tx in cheap:
+        assert pool.add_transaction(tx)
+
+    large = Transaction("dave", "b" * 3 * cheap[0].size, 1.0)
+    large.fee = 0.01  # Дороже двух первых, но для места нужна и третья
+    assert not pool.add_transaction(large)
+    assert pool.get_pool_size() == 3
+    assert pool.get_stats()["evicted"] == 0
+
+    original = _tx("erin", 0.003)
+    pool = TransactionPool(max_bytes=original.size + cheap[2].size)
+    pool.add_transaction(original)
+    pool.add_transaction(cheap[2])
+    replacement = Transaction("erin", "b" * original.size, 1.0)
+    replacement.fee = 0.004  # Выше исходной, но места нет без вытеснения более дорогой
+    assert not pool.add_transaction(replacement)
+    assert pool.contains(original.hash) and pool.get_pool_size() == 2
+
+
+def test_pool_eviction_does_not_leave_nonce_gaps():
+    """Вытесненная голова отправителя уходит вместе с его старшими nonce"""
+    pool = TransactionPool(max_transactions=2)
+    pool.add_transaction(_tx("f", 0.001, nonce=0))
+    pool.add_transaction(_tx("f", 0.01, nonce=1))
+    assert pool.add_transaction(_tx("g", 0.005))
+
+    assert [(tx.sender, tx.nonce) for tx in pool.get_batch(10)] == [("g", 0)]
+    assert pool.get_stats()["evicted"] == 2
+
+
+def test_pool_eviction_from_deep_sender_queue():
+    """Вытеснение из середины длинной очереди уносит ровно старшие nonce"""
+    small = _tx("deep", 0.01, nonce=100).size
+    pool = TransactionPool(max_bytes=1_000 * small)
+    for nonce in range(1_000):
+        # Самые дешёвые - nonce 600 и 500: второй добавляет к уже выбранным старшим 100 nonce
+        fee = {600: 0.0001, 500: 0.0002}.get(nonce, 0.01)
+        pool.add_transaction(_tx("deep", fee, nonce=nonce))
+    big = Transaction("rich", "x" * (450 * small), 1.0)
+    big.fee = 0.001
+    assert pool.add_transaction(big)
+
+    assert pool.get_stats()["evicted"] == 500
+    batch = pool.get_batch(1_000)
+    assert [tx.nonce for tx in batch if tx.sender == "deep"] == list(range(500))
+    assert big in batch
+
+
+def test_sharded_pool_routes_by_sender():
+    """Все транзакции отправителя попадают в одну партицию"""
+    pool = ShardedTransactionPool(shard_count=4)
+    txs = [Transaction(f"sender{i % 5}", "bob", 1.0, nonce=i // 5) for i in range(20)]
+    for tx in txs:
+        pool.add_transaction(tx)
+
+    assert pool.get_pool_size() == len(txs)
+    assert pool.contains(txs[7].hash) and pool.get_transaction(txs[7].hash) is not None
+    for shard_id in range(4):
+        batch = pool.get_batch(shard_id, 100)
+        assert all(sender_shard_index(tx.sender, 4) == shard_id for tx in batch)
+        # Порядок nonce каждого отправителя сохраняется
+        for sender in {tx.sender for tx in batch}:
+            nonces = [tx.nonce for tx in batch if tx.sender == sender]
+            assert nonces == sorted(nonces) == list(range(4))
+    assert pool.get_pool_size() == 0
+
+
+def test_sharded_pool_removes_by_hash_across_partitions():
+    pool = ShardedTransactionPool(shard_count=4)
+    txs = [Transaction(f"sender{i}", "bob", 1.0) for i in range(20)]
+    for tx in txs:
+        pool.add_transaction(tx)
+    assert pool.remove_transactions([tx.hash for tx in txs[:10]] + ["00" * 32]) == 10
+    assert pool.get_pool_size() == 10
+    assert not pool.contains(txs[0].hash) and pool.get_transaction(txs[0].hash) is None
+
+
+def test_pool_batch_respects_byte_ceiling():
+    """Транзакция, не помещающаяся в max_bytes, остаётся в пуле"""
+    pool = TransactionPool()
+    txs = [_tx(f"sender{i}", 0.01 - i * 0.001) for i in range(3)]
+    for tx in txs:
+        pool.add_transaction(tx)
+
+    batch = pool.get_batch(10, max_bytes=txs[0].size + txs[1].size)
+
+    assert batch == txs[:2]
+    assert pool.contains(txs[2].hash)
+
+
+def test_pool_iteration_skips_transactions_removed_midway():
+    """iter_transactions не держит блокировку между пачками"""
+    pool = TransactionPool()
+    txs = [_tx(f"sender{i}", 0.01) for i in range(10)]
+    for tx in txs:
+        pool.add_transaction(tx)
+
+    seen = []
+    for tx in pool.iter_transactions(chunk_size=4):
+        if not seen:
+            pool.remove_transactions([t.hash for t in txs[5:]])
+            pool.add_transaction(_tx("late", 0.01))
+        seen.append(tx)
+
+    assert seen == txs[:5]
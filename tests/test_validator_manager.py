@@ -0,0 +1,78 @@
+from consensys.validator import ValidatorManager
+
+
+def _manager(*stakes):
+    """Менеджер без фонового влияния репутации: порядок задают только стейк и активность"""
+    manager = ValidatorManager(min_stake=100)
+    manager.running = False
+    manager.reputation_system.score_listener = None
+    for i, stake in enumerate(stakes):
+        manager.add_validator(f"val{i}", None, None, stake)
+    return manager
+
+
+def test_selection_follows_stake_penalty_and_deactivation():
+    manager = _manager(500, 400, 300)
+    assert manager.select_validator().address == "val0"
+
+    manager.reward_validator("val2", 400)  # 700 > 500
+    assert manager.select_validator().address == "val2"
+
+    manager.penalize_validator("val2", "double sign", penalty_severity=0.5)  # 350
+    assert manager.get_validator("val2").stake == 350
+    assert manager.select_validator().address == "val0"
+
+    manager.record_uptime("val0", False)
+    assert manager.select_validator().address == "val1"
+    manager.record_uptime("val0", True)
+    assert manager.select_validator().address == "val0"
+
+
+def test_reputation_change_reorders_validators():
+    manager = _manager(500, 400)
+    manager._on_reputation_change("val1", 0.9)
+    assert manager.select_validator().address == "val1"
+
+
+def test_equal_scores_break_ties_by_registration_order():
+    manager = _manager(500, 500, 500)
+    assert manager.select_validator().address == "val0"
+    manager.record_uptime("val0", False)
+    assert manager.select_validator().address == "val1"
+    # Повторная переиндексация не меняет место в порядке регистрации
+    manager.reward_validator("val2", 0)
+    assert manager.select_validator().address == "val1"
+
+
+def test_heap_is_rebuilt_after_stale_entries_pile_up():
+    manager = _manager(500, 400)
+    for _ in range(5_000):
+        manager.reward_validator("val1", 0)
+    # Порог перестройки: 2 * число валидаторов + 1024 записей
+    assert len(manager._heap) <= 2 * 2 + 1024
+    manager.reward_validator("val1", 200)
+    assert manager.select_validator().address == "val1"
+    assert {entry[3] for entry in manager._heap} == {"val0", "val1"}
+
+
+def test_get_validator_lookups():
+    manager = _manager(500)
+    validator = manager.get_validator("val0")
+    assert validator is manager.validators[0]
+    assert manager.get_validator("unknown") is None
+    assert manager.get_validator_stats("val0")["stake"] == 500
+    assert manager.get_validator_stats("unknown") == {}
+    manager.penalize_validator("unknown", "noop")  # Неизвестный адрес игнорируется
+    assert manager.get_stakes() == {"val0": 500}
+
+
+def test_schedule_weights_ignore_local_reputation_and_liveness():
+    """Расписание строится по стейку: локальные репутация и аптайм на него не влияют"""
+    first, second = _manager(500, 400, 300), _manager(500, 400, 300)
+    second._on_reputation_change("val2", 0.9)
+    second.record_uptime("val0", False)
+
+    schedule = first.build_schedule(1, b"seed", shard_count=2, slots_per_epoch=100)
+    other = second.build_schedule(1, b"seed", shard_count=2, slots_per_epoch=100)
+    assert ([[v.address for v in shard] for shard in schedule.slots] ==
+            [[v.address for v in shard] for shard in other.slots])
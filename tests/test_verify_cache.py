@@ -0,0 +1,25 @@
+from crypto.verify_cache import VerificationCache
+
+
+def test_verification_cache_lru_and_metrics():
+    """Кэш ограничен по размеру и считает попадания, промахи и вытеснения"""
+    cache = VerificationCache(max_entries=2)
+    keys = [cache.make_key(b"block%d" % i, b"sig", b"pk", "sphincs") for i in range(3)]
+
+    assert not cache.contains(keys[0])
+    cache.add(keys[0])
+    cache.add(keys[1])
+    assert cache.contains(keys[0])
+    cache.add(keys[2])  # Вытесняет keys[1] как давно не использованный
+
+    assert cache.contains(keys[0])
+    assert not cache.contains(keys[1])
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 2, 1, 2)
+
+
+def test_verification_cache_key_covers_all_inputs():
+    base = VerificationCache.make_key(b"msg", b"sig", b"pk", "sphincs")
+    assert base != VerificationCache.make_key(b"msg", b"sig", b"pk", "ntru")
+    assert base != VerificationCache.make_key(b"msg", b"sig", b"other", "sphincs")
+    assert base != VerificationCache.make_key(b"msgs", b"ig", b"pk", "sphincs")
@@ -1,11 +1,49 @@
 import hashlib
-import json
+import heapq
+import itertools
+import struct
 import time
-from typing import List, Dict
+from bisect import bisect_left, insort
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 import threading
 
+# Формат бинарной кодировки транзакции (версия, поля с префиксом длины)
+TX_ENCODING_VERSION = 1
+
+_U8 = struct.Struct(">B")
+_U16 = struct.Struct(">H")
+_U32 = struct.Struct(">I")
+_NUMERIC = struct.Struct(">dddQ")  # amount, timestamp, fee, nonce
+
+# Поля, входящие в хэш: их изменение сбрасывает закэшированный хэш
+_HASHED_FIELDS = frozenset(("sender", "receiver", "amount", "tx_type", "timestamp", "fee", "nonce"))
+
+
+def _encode_str(value: str) -> bytes:
+    raw = value.encode()
+    return _U16.pack(len(raw)) + raw
+
+
+def _decode_str(view: memoryview, offset: int) -> Tuple[str, int]:
+    (length,) = _U16.unpack_from(view, offset)
+    raw, offset = _read_bytes(view, offset + _U16.size, length)
+    return raw.decode(), offset
+
+
+def _read_bytes(view: memoryview, offset: int, length: int) -> Tuple[bytes, int]:
+    """Срез длины length; ValueError, если буфер короче префикса длины"""
+    end = offset + length
+    if end > len(view):
+        raise ValueError(f"Truncated field: need {length} bytes at offset {offset}")
+    return bytes(view[offset:end]), end
+
+
 class Transaction:
-    def __init__(self, sender: str, receiver: str, amount: float, tx_type: str = "transfer"):
+    __slots__ = ("sender", "receiver", "amount", "tx_type", "timestamp",
+                 "signatures", "fee", "nonce", "_body", "_hash")
+
+    def __init__(self, sender: str, receiver: str, amount: float, tx_type: str = "transfer",
+                 nonce: int = 0):
         self.sender = sender
         self.receiver = receiver
         self.amount = amount
@@ -13,22 +51,92 @@ class Transaction:
         self.timestamp = time.time()
         self.signatures: Dict[str, bytes] = {}
         self.fee = 0.001  # Базовая комиссия
+        self.nonce = nonce  # Порядковый номер транзакции отправителя
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in _HASHED_FIELDS:
+            object.__setattr__(self, "_body", None)
+            object.__setattr__(self, "_hash", None)
+
+    def signing_bytes(self) -> bytes:
+        """Каноническая бинарная кодировка хэшируемых полей (используется для хэша и подписи)"""
+        body = self._body
+        if body is None:
+            body = b"".join((
+                _U8.pack(TX_ENCODING_VERSION),
+                _encode_str(self.sender),
+                _encode_str(self.receiver),
+                _encode_str(self.tx_type),
+                _NUMERIC.pack(self.amount, self.timestamp, self.fee, self.nonce),
+            ))
+            object.__setattr__(self, "_body", body)
+        return body
 
     @property
     def hash(self) -> str:
-        data = json.dumps({
-            "sender": self.sender,
-            "receiver": self.receiver,
-            "amount": self.amount,
-            "tx_type": self.tx_type,
-            "timestamp": self.timestamp,
-            "fee": self.fee
-        }, sort_keys=True).encode()
-        return hashlib.sha3_256(data).hexdigest()
+        tx_hash = self._hash
+        if tx_hash is None:
+            tx_hash = hashlib.sha3_256(self.signing_bytes()).hexdigest()
+            object.__setattr__(self, "_hash", tx_hash)
+        return tx_hash
+
+    @property
+    def size(self) -> int:
+        """Размер транзакции в бинарной кодировке (байт)"""
+        return len(self.to_bytes())
 
     def add_signature(self, algorithm: str, signature: bytes):
         self.signatures[algorithm] = signature
 
+    def to_bytes(self) -> bytes:
+        """Сериализует транзакцию вместе с подписями для передачи по сети"""
+        parts = [self.signing_bytes(), _U8.pack(len(self.signatures))]
+        for algorithm in sorted(self.signatures):
+            signature = self.signatures[algorithm]
+            parts.append(_encode_str(algorithm))
+            parts.append(_U32.pack(len(signature)))
+            parts.append(signature)
+        return b"".join(parts)
+
+    @classmethod
+    def decode(cls, data, offset: int = 0) -> Tuple["Transaction", int]:
+        """Декодирует транзакцию из буфера, возвращает её и смещение после неё"""
+        view = memoryview(data)
+        try:
+            (version,) = _U8.unpack_from(view, offset)
+            if version != TX_ENCODING_VERSION:
+                raise ValueError(f"Unsupported transaction encoding version: {version}")
+            offset += _U8.size
+
+            tx = cls.__new__(cls)
+            tx.sender, offset = _decode_str(view, offset)
+            tx.receiver, offset = _decode_str(view, offset)
+            tx.tx_type, offset = _decode_str(view, offset)
+            tx.amount, tx.timestamp, tx.fee, tx.nonce = _NUMERIC.unpack_from(view, offset)
+            offset += _NUMERIC.size
+
+            signatures: Dict[str, bytes] = {}
+            (sig_count,) = _U8.unpack_from(view, offset)
+            offset += _U8.size
+            for _ in range(sig_count):
+                algorithm, offset = _decode_str(view, offset)
+                (length,) = _U32.unpack_from(view, offset)
+                offset += _U32.size
+                signatures[algorithm], offset = _read_bytes(view, offset, length)
+        except struct.error as e:
+            raise ValueError(f"Truncated transaction: {e}") from e
+        tx.signatures = signatures
+        return tx, offset
+
+    @classmethod
+    def from_bytes(cls, data) -> "Transaction":
+        """Восстанавливает транзакцию из результата to_bytes()"""
+        tx, offset = cls.decode(data)
+        if offset != len(data):
+            raise ValueError("Trailing bytes after transaction")
+        return tx
+
     def to_dict(self) -> Dict:
         return {
             "hash": self.hash,
@@ -37,28 +145,371 @@ class Transaction:
             "amount": self.amount,
             "tx_type": self.tx_type,
             "timestamp": self.timestamp,
-            "fee": self.fee
+            "fee": self.fee,
+            "nonce": self.nonce
         }
 
+
+class _PoolEntry:
+    """Запись пула: транзакция и служебные поля для кучи/индексов"""
+    __slots__ = ("tx", "tx_hash", "fee", "seq", "size", "removed")
+
+    def __init__(self, tx: Transaction, seq: int):
+        self.tx = tx
+        self.tx_hash = tx.hash
+        self.fee = tx.fee
+        self.seq = seq
+        self.size = tx.size
+        self.removed = False
+
+
 class TransactionPool:
-    def __init__(self):
-        self.pool: List[Transaction] = []
+    """Мемпул с приоритетом по комиссии.
+
+    Готовые к включению транзакции (по одной на отправителя - с минимальным
+    nonce) лежат в max-куче по (fee, возраст). Индекс по хэшу отсекает
+    дубликаты, min-куча по комиссии используется для вытеснения при
+    превышении лимитов по количеству и байтам. Удаление из куч ленивое.
+    Если задан journal (storage.StateJournal), приём и удаление транзакций
+    журналируются для восстановления после сбоя.
+    """
+
+    def __init__(self, max_transactions: int = 1_000_000, max_bytes: int = 512 * 1024 * 1024,
+                 journal=None):
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.journal = journal
         self.lock = threading.Lock()
 
-    def add_transaction(self, tx: Transaction):
+        self._by_hash: Dict[str, _PoolEntry] = {}
+        self._by_sender_nonce: Dict[Tuple[str, int], _PoolEntry] = {}
+        self._sender_nonces: Dict[str, List[int]] = {}  # Отсортированные nonce отправителя
+        self._sender_heads: Dict[str, _PoolEntry] = {}
+        self._ready: List[Tuple[float, float, int, _PoolEntry]] = []
+        self._eviction: List[Tuple[float, int, _PoolEntry]] = []
+        self._seq = itertools.count()
+        self._bytes = 0
+
+        self.stats = {
+            "admitted": 0,
+            "rejected_duplicate": 0,
+            "rejected_underpriced": 0,
+            "replaced": 0,
+            "evicted": 0,
+        }
+
+    def add_transaction(self, tx: Transaction) -> bool:
+        """Добавляет транзакцию в пул. Возвращает False, если она отклонена"""
+        with self.lock:
+            tx_hash = tx.hash
+            if tx_hash in self._by_hash:
+                self.stats["rejected_duplicate"] += 1
+                return False
+
+            # Замена транзакции с тем же nonce только при более высокой комиссии
+            existing = self._by_sender_nonce.get((tx.sender, tx.nonce))
+            if existing is not None and tx.fee <= existing.fee:
+                self.stats["rejected_underpriced"] += 1
+                return False
+
+            # Сначала решаем, принимается ли транзакция, и только потом удаляем
+            entry = _PoolEntry(tx, next(self._seq))
+            victims = self._plan_evictions(entry, existing)
+            if victims is None:
+                self.stats["rejected_underpriced"] += 1
+                return False
+
+            removed: List[str] = []
+            if existing is not None:
+                self._remove_entry(existing)
+                removed.append(existing.tx_hash)
+                self.stats["replaced"] += 1
+            # Старшие nonce отправителя удаляются раньше младших: голова не продвигается
+            for victim in sorted(victims, key=lambda e: -e.tx.nonce):
+                self._remove_entry(victim)
+                removed.append(victim.tx_hash)
+            self.stats["evicted"] += len(victims)
+            if self.journal is not None:
+                self.journal.log_tx_remove(removed)
+
+            self._by_hash[tx_hash] = entry
+            self._by_sender_nonce[(tx.sender, tx.nonce)] = entry
+            self._bytes += entry.size
+            heapq.heappush(self._eviction, (entry.fee, -entry.seq, entry))
+
+            nonces = self._sender_nonces.setdefault(tx.sender, [])
+            insort(nonces, tx.nonce)
+            if nonces[0] == tx.nonce:
+                self._set_head(tx.sender, entry)
+
+            self.stats["admitted"] += 1
+            if self.journal is not None:
+                self.journal.log_tx_admit(tx)
+            self._compact_heaps()
+            return True
+
+    def get_batch(self, size: int, max_bytes: Optional[int] = None) -> List[Transaction]:
+        """Извлекает до size транзакций с наибольшей комиссией, соблюдая порядок nonce.
+
+        Если задан max_bytes, сборка останавливается на первой транзакции,
+        которая не помещается в этот объём (она остаётся в пуле).
+        """
+        batch = []
+        batch_bytes = 0
+        with self.lock:
+            while len(batch) < size and self._ready:
+                entry = self._ready[0][3]
+                if entry.removed or self._sender_heads.get(entry.tx.sender) is not entry:
+                    heapq.heappop(self._ready)
+                    continue
+                if max_bytes is not None and batch_bytes + entry.size > max_bytes:
+                    break
+                heapq.heappop(self._ready)
+                self._remove_entry(entry)
+                batch.append(entry.tx)
+                batch_bytes += entry.size
+            if self.journal is not None:
+                self.journal.log_tx_remove([tx.hash for tx in batch])
+            self._compact_heaps()
+        return batch
+
+    def remove_transactions(self, tx_hashes: List[str]) -> int:
+        """Удаляет транзакции по хэшу (например, уже включённые в чужой блок)"""
+        return len(self.remove_hashes(tx_hashes))
+
+    def remove_hashes(self, tx_hashes: Iterable[str]) -> List[str]:
+        """Как remove_transactions, но возвращает хэши, которые нашлись в пуле"""
+        with self.lock:
+            removed = []
+            for tx_hash in tx_hashes:
+                entry = self._by_hash.get(tx_hash)
+                if entry is not None:
+                    self._remove_entry(entry)
+                    removed.append(tx_hash)
+            if self.journal is not None:
+                self.journal.log_tx_remove(removed)
+            return removed
+
+    def snapshot_transactions(self) -> List[Transaction]:
+        """Копия списка ожидающих транзакций (для снапшота)"""
+        with self.lock:
+            return [entry.tx for entry in self._by_hash.values()]
+
+    def iter_transactions(self, chunk_size: int = 1024) -> Iterator[Transaction]:
+        """Перебор ожидающих транзакций без удержания блокировки на всё время.
+
+        Под блокировкой копируются только ключи индекса, затем записи
+        разрешаются пачками по chunk_size; транзакции, удалённые во время
+        перебора, пропускаются, добавленные после начала - не видны.
+        """
+        with self.lock:
+            hashes = list(self._by_hash)
+        for start in range(0, len(hashes), chunk_size):
+            with self.lock:
+                by_hash = self._by_hash
+                chunk = [by_hash.get(tx_hash) for tx_hash in hashes[start:start + chunk_size]]
+            for entry in chunk:
+                if entry is not None:
+                    yield entry.tx
+
+    def contains(self, tx_hash: str) -> bool:
         with self.lock:
-            self.pool.append(tx)
+            return tx_hash in self._by_hash
 
-    def get_batch(self, size: int) -> List[Transaction]:
+    def get_transaction(self, tx_hash: str) -> Optional[Transaction]:
         with self.lock:
-            batch = self.pool[:size]
-            self.pool = self.pool[size:]
-            return batch
+            entry = self._by_hash.get(tx_hash)
+            return entry.tx if entry else None
 
     def get_pool_size(self) -> int:
         with self.lock:
-            return len(self.pool)
+            return len(self._by_hash)
+
+    def get_pool_bytes(self) -> int:
+        with self.lock:
+            return self._bytes
+
+    def get_stats(self) -> Dict:
+        """Счётчики пула: принятые, отклонённые, вытесненные транзакции"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._by_hash)
+            stats["bytes"] = self._bytes
+            return stats
 
     def clear_pool(self):
         with self.lock:
-            self.pool.clear()
+            self._by_hash.clear()
+            self._by_sender_nonce.clear()
+            self._sender_nonces.clear()
+            self._sender_heads.clear()
+            self._ready.clear()
+            self._eviction.clear()
+            self._bytes = 0
+
+    def _plan_evictions(self, entry: _PoolEntry,
+                        replaced: Optional[_PoolEntry]) -> Optional[List[_PoolEntry]]:
+        """Подбирает самые дешёвые транзакции, вытеснение которых освободит место для entry.
+
+        Пул не изменяется; None - если места не хватит даже после вытеснения
+        всех более дешёвых транзакций. Вместе с транзакцией вытесняются
+        старшие nonce её отправителя, иначе в готовые попал бы nonce с
+        пропуском. Младшие nonce отправителя самой entry не вытесняются по
+        той же причине.
+        """
+        count = len(self._by_hash) + 1 - (replaced is not None)
+        size = self._bytes + entry.size - (replaced.size if replaced is not None else 0)
+        victims: Dict[int, _PoolEntry] = {}
+        lowest_victim: Dict[str, int] = {}  # Младший вытесняемый nonce отправителя
+        popped = []
+        admitted = True
+        while count > self.max_transactions or size > self.max_bytes:
+            if not self._eviction:
+                admitted = False
+                break
+            item = heapq.heappop(self._eviction)
+            cheapest = item[2]
+            if cheapest.removed:
+                continue
+            popped.append(item)
+            if cheapest is replaced or id(cheapest) in victims:
+                continue
+            if cheapest.fee >= entry.fee:
+                admitted = False
+                break
+            if cheapest.tx.sender == entry.tx.sender and cheapest.tx.nonce < entry.tx.nonce:
+                continue
+            sender = cheapest.tx.sender
+            # Старшие nonce выше уже выбранного младшего вытеснены раньше
+            for victim in self._nonce_slice(sender, cheapest.tx.nonce, lowest_victim.get(sender)):
+                if victim is not replaced:
+                    victims[id(victim)] = victim
+                    count -= 1
+                    size -= victim.size
+            lowest_victim[sender] = cheapest.tx.nonce
+        for item in popped:
+            heapq.heappush(self._eviction, item)
+        return list(victims.values()) if admitted else None
+
+    def _nonce_slice(self, sender: str, low: int, high: Optional[int]) -> List[_PoolEntry]:
+        """Транзакции отправителя с nonce в [low, high) - бисекцией по отсортированным nonce"""
+        nonces = self._sender_nonces[sender]
+        start = bisect_left(nonces, low)
+        stop = len(nonces) if high is None else bisect_left(nonces, high, lo=start)
+        by_sender_nonce = self._by_sender_nonce
+        return [by_sender_nonce[(sender, nonce)] for nonce in nonces[start:stop]]
+
+    def _compact_heaps(self):
+        """Перестраивает кучи, когда устаревших записей становится больше живых"""
+        live = len(self._by_hash)
+        if len(self._eviction) > 2 * live + 1024:
+            self._eviction = [item for item in self._eviction if not item[2].removed]
+            heapq.heapify(self._eviction)
+        if len(self._ready) > 2 * len(self._sender_heads) + 1024:
+            self._ready = [item for item in self._ready
+                           if self._sender_heads.get(item[3].tx.sender) is item[3]]
+            heapq.heapify(self._ready)
+
+    def _set_head(self, sender: str, entry: _PoolEntry):
+        self._sender_heads[sender] = entry
+        heapq.heappush(self._ready, (-entry.fee, entry.tx.timestamp, entry.seq, entry))
+
+    def _remove_entry(self, entry: _PoolEntry):
+        entry.removed = True
+        tx = entry.tx
+        del self._by_hash[entry.tx_hash]
+        del self._by_sender_nonce[(tx.sender, tx.nonce)]
+        self._bytes -= entry.size
+
+        nonces = self._sender_nonces[tx.sender]
+        del nonces[bisect_left(nonces, tx.nonce)]
+        if self._sender_heads.get(tx.sender) is not entry:
+            return
+
+        # Продвигаем голову очереди отправителя к следующему nonce
+        if nonces:
+            self._set_head(tx.sender, self._by_sender_nonce[(tx.sender, nonces[0])])
+        else:
+            del self._sender_nonces[tx.sender]
+            del self._sender_heads[tx.sender]
+
+
+def sender_shard_index(sender: str, shard_count: int) -> int:
+    """Детерминированный номер партиции по отправителю"""
+    digest = hashlib.blake2b(sender.encode(), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+class ShardedTransactionPool:
+    """Мемпул, разбитый на партиции по отправителю; партиция i наполняет блоки шарда i.
+
+    У каждой партиции свой TransactionPool со своей блокировкой, поэтому
+    приём транзакций и сборка блоков конкурируют только внутри одного шарда.
+    Все транзакции отправителя попадают в одну партицию, поэтому порядок
+    nonce и замена по nonce работают так же, как в одном пуле. Поиск по
+    хэшу обходит партиции (их немного).
+    """
+
+    def __init__(self, shard_count: int, max_transactions: int = 1_000_000,
+                 max_bytes: int = 512 * 1024 * 1024, journal=None):
+        self.shard_count = shard_count
+        self.shards = [
+            TransactionPool(max(1, max_transactions // shard_count),
+                            max(1, max_bytes // shard_count), journal)
+            for _ in range(shard_count)
+        ]
+
+    def shard_for(self, sender: str) -> int:
+        return sender_shard_index(sender, self.shard_count)
+
+    def get_shard_pool(self, shard_id: int) -> TransactionPool:
+        return self.shards[shard_id]
+
+    def add_transaction(self, tx: Transaction) -> bool:
+        return self.shards[self.shard_for(tx.sender)].add_transaction(tx)
+
+    def get_batch(self, shard_id: int, size: int,
+                  max_bytes: Optional[int] = None) -> List[Transaction]:
+        return self.shards[shard_id].get_batch(size, max_bytes)
+
+    def remove_transactions(self, tx_hashes: List[str]) -> int:
+        remaining = set(tx_hashes)
+        removed = 0
+        for pool in self.shards:
+            if not remaining:
+                break
+            found = pool.remove_hashes(remaining)
+            remaining.difference_update(found)
+            removed += len(found)
+        return removed
+
+    def snapshot_transactions(self) -> List[Transaction]:
+        transactions: List[Transaction] = []
+        for pool in self.shards:
+            transactions.extend(pool.snapshot_transactions())
+        return transactions
+
+    def contains(self, tx_hash: str) -> bool:
+        return any(pool.contains(tx_hash) for pool in self.shards)
+
+    def get_transaction(self, tx_hash: str) -> Optional[Transaction]:
+        for pool in self.shards:
+            tx = pool.get_transaction(tx_hash)
+            if tx is not None:
+                return tx
+        return None
+
+    def get_pool_size(self) -> int:
+        return sum(pool.get_pool_size() for pool in self.shards)
+
+    def get_stats(self) -> Dict:
+        """Суммарные счётчики по всем партициям"""
+        totals: Dict[str, int] = {}
+        for pool in self.shards:
+            for key, value in pool.get_stats().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def clear_pool(self):
+        for pool in self.shards:
+            pool.clear_pool()